@@ -6,7 +6,7 @@ Script para verificar el total de datos en la base de datos
 from src.models.database import get_session
 from src.models.product import Product
 from src.models.review import Review
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 def check_total_data():
     with get_session() as session:
@@ -20,18 +20,28 @@ def check_total_data():
         
         # Reviews por producto
         print("\n📋 Reviews por producto:")
-        products = session.query(Product).all()
-        for product in products:
-            product_reviews = session.query(func.count(Review.id)).filter(Review.product_id == product.id).scalar()
-            print(f"  {product.id}: {product_reviews} reviews")
-            print(f"    Título: {product.title[:50]}...")
+        # Un solo GROUP BY en lugar de un COUNT por producto
+        counts = dict(
+            session.query(Review.product_id, func.count(Review.id))
+            .group_by(Review.product_id)
+            .all()
+        )
+        products = session.execute(
+            select(Product.id, Product.title).execution_options(yield_per=1000)
+        )
+        for product_id, title in products:
+            product_reviews = counts.get(product_id, 0)
+            print(f"  {product_id}: {product_reviews} reviews")
+            print(f"    Título: {title[:50]}...")
         
         # Mostrar algunos reviews de ejemplo
         print("\n📝 Algunos reviews de ejemplo:")
-        reviews = session.query(Review).filter(Review.content != '').limit(5).all()
-        for i, review in enumerate(reviews, 1):
-            print(f"  {i}. Rating: {review.rate}/5")
-            print(f"     Contenido: {review.content[:100]}...")
+        reviews = session.execute(
+            select(Review.rate, Review.content).where(Review.content != '').limit(5)
+        )
+        for i, (rate, content) in enumerate(reviews, 1):
+            print(f"  {i}. Rating: {rate}/5")
+            print(f"     Contenido: {content[:100]}...")
             print()
 
 if __name__ == "__main__":
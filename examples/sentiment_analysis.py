@@ -8,7 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.services.sentiment_analyzer import (
-    analyze_sentiment, 
+    analyze_sentiments, 
     get_reviews_to_process, 
     process_reviews_batch
 )
@@ -26,8 +26,7 @@ def example_analyze_text():
         "Pésimo servicio, no lo recomiendo para nada"
     ]
     
-    for text in texts:
-        score, label = analyze_sentiment(text)
+    for text, (score, label) in zip(texts, analyze_sentiments(texts)):
         print(f"  '{text}' -> {label} ({score:.3f})")
 
 def example_get_reviews():
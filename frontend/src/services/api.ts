@@ -86,8 +86,12 @@ export interface ProductsResponse {
   count: number;
   limit: number;
   offset: number;
+  next_after_id?: string | null;
 }
 
+// Tamaño máximo de página que acepta la API (limit <= 200)
+const MAX_PAGE_SIZE = 200;
+
 export interface ReviewsResponse {
   reviews: Review[];
   count: number;
@@ -118,16 +122,30 @@ export const apiService = {
 
   // ===== NUEVOS ENDPOINTS DE PRODUCTOS =====
   
-  // Obtener todos los productos
+  // Obtener productos; sin limit recorre todas las páginas por cursor (after_id)
   async getProducts(options: {
     limit?: number;
     offset?: number;
     marca?: string;
+    after_id?: string;
   } = {}): Promise<ProductsResponse> {
+    if (!options.limit) {
+      const products: Product[] = [];
+      let afterId: string | undefined = options.after_id;
+      for (;;) {
+        const page: ProductsResponse = await this.getProducts({ ...options, limit: MAX_PAGE_SIZE, after_id: afterId });
+        products.push(...page.products);
+        if (!page.next_after_id) break;
+        afterId = page.next_after_id;
+      }
+      return { products, count: products.length, limit: products.length, offset: 0 };
+    }
+
     const params = new URLSearchParams();
-    if (options.limit) params.append('limit', options.limit.toString());
+    params.append('limit', options.limit.toString());
     if (options.offset) params.append('offset', options.offset.toString());
     if (options.marca) params.append('marca', options.marca);
+    if (options.after_id) params.append('after_id', options.after_id);
 
     const response = await api.get(`/api/products?${params}`);
     return response.data;
@@ -166,19 +184,36 @@ export const apiService = {
     return response.data;
   },
 
-  // Obtener reviews de un producto específico
+  // Obtener reviews de un producto específico; sin limit recorre todas las páginas por cursor
   async getProductReviews(
     productId: string,
     options: {
       limit?: number;
       offset?: number;
       order_by?: 'date_created' | 'rate' | 'sentiment_score';
+      cursor?: string;
     } = {}
-  ): Promise<{ product_id: string; reviews: Review[]; count: number; limit: number; offset: number; order_by: string }> {
+  ): Promise<{ product_id: string; reviews: Review[]; count: number; limit: number; offset: number; order_by: string; next_cursor?: string | null }> {
+    if (!options.limit) {
+      const reviews: Review[] = [];
+      let cursor: string | undefined = options.cursor;
+      let orderBy = options.order_by ?? 'date_created';
+      for (;;) {
+        const page = await this.getProductReviews(productId, { ...options, limit: MAX_PAGE_SIZE, cursor });
+        reviews.push(...page.reviews);
+        orderBy = page.order_by as typeof orderBy;
+        // El cursor solo existe ordenando por fecha
+        if (!page.next_cursor) break;
+        cursor = page.next_cursor;
+      }
+      return { product_id: productId, reviews, count: reviews.length, limit: reviews.length, offset: 0, order_by: orderBy };
+    }
+
     const params = new URLSearchParams();
-    if (options.limit) params.append('limit', options.limit.toString());
+    params.append('limit', options.limit.toString());
     if (options.offset) params.append('offset', options.offset.toString());
     if (options.order_by) params.append('order_by', options.order_by);
+    if (options.cursor) params.append('cursor', options.cursor);
 
     const response = await api.get(`/api/products/${productId}/reviews?${params}`);
     return response.data;
@@ -190,6 +225,12 @@ export const apiService = {
     return response.data;
   },
 
+  // Obtener estadísticas de reviews de varios productos (hasta 500) en un solo request
+  async getProductsReviewsStatsBatch(productIds: string[]): Promise<Record<string, ReviewStats>> {
+    const response = await api.post('/api/products/stats:batch', { ids: productIds });
+    return response.data.stats;
+  },
+
   // Obtener estadísticas generales de reviews
   async getReviewsStats(): Promise<ReviewStats> {
     const response = await api.get('/api/reviews/stats');
@@ -3,14 +3,95 @@
 Script para ejecutar migraciones en Railway Production
 """
 import os
-from sqlalchemy import create_engine
-from src.models.database import Base
+import re
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from src.models.database import Base, engine, init_db
+from src.models.product import Product  # noqa: F401  (registra la tabla en Base.metadata)
+from src.models.review import Review  # noqa: F401
+from src.models.review_raw import ReviewRaw  # noqa: F401
 
 def load_env():
     """Carga variables de entorno"""
     # En Railway, las variables ya están disponibles automáticamente
     pass
 
+def create_missing_indexes(engine):
+    """
+    Crea los índices del modelo que falten en tablas ya existentes
+    
+    En PostgreSQL usa CREATE INDEX CONCURRENTLY para no bloquear escrituras.
+    """
+    concurrently = engine.dialect.name == "postgresql"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                if concurrently:
+                    ddl = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl)
+                conn.execute(text(ddl))
+
+
+# Índices reemplazados: por versiones con id al final (paginación por cursor) y el de
+# product_id (index=True original) por ix_reviews_product_id_covering
+SUPERSEDED_INDEXES = (
+    "ix_reviews_product_date",
+    "ix_reviews_rate_date",
+    "ix_reviews_sentiment_date",
+    "ix_reviews_product_id",
+)
+
+
+def drop_superseded_indexes(engine):
+    """Elimina los índices que ya cubre otro del modelo (correr después de create_missing_indexes)"""
+    concurrently = " CONCURRENTLY" if engine.dialect.name == "postgresql" else ""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX{concurrently} IF EXISTS {name}"))
+
+
+def migrate_review_raw(engine):
+    """
+    Mueve reviews.raw_json a la tabla review_raw y elimina la columna
+    
+    En PostgreSQL además comprime el JSONB con lz4 (PG14+).
+    """
+    columns = {col["name"] for col in inspect(engine).get_columns("reviews")}
+    with engine.begin() as conn:
+        if "raw_json" in columns:
+            print("📦 Moviendo reviews.raw_json a review_raw...")
+            conn.execute(text(
+                "INSERT INTO review_raw (review_id, raw_json) "
+                "SELECT id, raw_json FROM reviews WHERE raw_json IS NOT NULL"
+            ))
+            conn.execute(text("ALTER TABLE reviews DROP COLUMN raw_json"))
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE review_raw ALTER COLUMN raw_json SET COMPRESSION lz4"))
+        except Exception as e:
+            print(f"⚠️  No se pudo activar compresión lz4: {e}")
+
+
+def add_sentiment_processed_at(engine):
+    """
+    Agrega reviews.sentiment_processed_at a tablas existentes
+    
+    Las reviews que el criterio anterior ya daba por procesadas (score distinto de 0 y
+    label distinto de neutral) quedan marcadas; el resto se vuelve a analizar una vez.
+    """
+    columns = {col["name"] for col in inspect(engine).get_columns("reviews")}
+    if "sentiment_processed_at" in columns:
+        return
+    print("🧠 Agregando reviews.sentiment_processed_at...")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE reviews ADD COLUMN sentiment_processed_at TIMESTAMP"))
+        conn.execute(text(
+            "UPDATE reviews SET sentiment_processed_at = CURRENT_TIMESTAMP "
+            "WHERE sentiment_score <> 0.0 AND sentiment_label <> 'neutral'"
+        ))
+
+
 def migrate_database():
     """Crea todas las tablas"""
     load_env()
@@ -25,11 +106,17 @@ def migrate_database():
     print(f"🔗 Conectando a: {database_url.split('@')[1] if '@' in database_url else database_url}")
     
     try:
-        engine = create_engine(database_url)
-        
-        # Crear todas las tablas
+        # Crear las tablas faltantes (reusa el engine de la app, con advisory lock)
         print("📊 Creando tablas de la base de datos...")
-        Base.metadata.create_all(bind=engine)
+        init_db()
+        
+        migrate_review_raw(engine)
+        add_sentiment_processed_at(engine)
+        
+        # create_all no agrega índices nuevos a tablas existentes
+        print("🗂️  Creando índices faltantes...")
+        create_missing_indexes(engine)
+        drop_superseded_indexes(engine)
         
         print("✅ Migración completada exitosamente!")
         print("📋 Tablas creadas:")
@@ -1,22 +1,49 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import os
 import time
+from pathlib import Path
 from typing import Any, Dict, Optional
+from urllib.parse import urlencode
 
+import httpx
+import orjson
 import requests
-from requests import Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src.utils.config import settings
-from .rate_limiter import SimpleRateLimiter
+from .rate_limiter import AsyncRateLimiter, SimpleRateLimiter
+
+# Upper bound for any single backoff, including a server-sent Retry-After
+MAX_RETRY_DELAY_SECONDS = 10.0
+
+
+class _CappedRetry(Retry):
+    """urllib3 Retry that honors Retry-After only up to MAX_RETRY_DELAY_SECONDS."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_DELAY_SECONDS)
 
 
 class MercadoLibreClient:
     """
     Minimal MercadoLibre public API client using requests.
     - Adds simple rate limit delay between requests
-    - Retries with exponential backoff on 429 and 5xx
+    - Reuses pooled keep-alive connections to the API host
+    - Retries with exponential backoff on 429 and 5xx (handled by urllib3)
+    - Optionally caches JSON responses on disk (ML_CACHE_DIR) for CACHE_EXPIRY_HOURS
+    - Async variants (a*) share an HTTP/2 httpx.AsyncClient for high fan-out
     """
 
+    POOL_SIZE = 16
+    ASYNC_MAX_CONNECTIONS = 32
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
     def __init__(
         self,
         base_url: Optional[str] = None,
@@ -24,134 +51,224 @@ class MercadoLibreClient:
         max_retries: int = 3,
         timeout_seconds: float = 15.0,
         session: Optional[requests.Session] = None,
+        cache_dir: Optional[str] = None,
     ) -> None:
         self.base_url: str = (base_url or settings.ML_API_BASE_URL).rstrip("/")
         self.timeout_seconds: float = float(timeout_seconds)
         self.max_retries: int = int(max_retries)
         min_delay = request_delay_seconds if request_delay_seconds is not None else settings.REQUEST_DELAY_SECONDS
         self._limiter = SimpleRateLimiter(min_delay_seconds=float(min_delay))
-        self.session = session or requests.Session()
+        self._async_limiter = AsyncRateLimiter(min_delay_seconds=float(min_delay))
+        self._aclient: Optional[httpx.AsyncClient] = None
+        # Resolved once: token and offline mode do not change during the client's lifetime
+        token = getattr(settings, "ML_ACCESS_TOKEN", "") or ""
+        self._offline: bool = bool(getattr(settings, "ML_OFFLINE_MODE", False)) or not token
+        self._default_headers: Dict[str, str] = {"Authorization": f"Bearer {token}"} if token else {}
+        # Injected sessions get the same pooled, retrying adapter (replacing their default ones)
+        session = session if session is not None else requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_SIZE,
+            pool_maxsize=self.POOL_SIZE,
+            max_retries=self._build_retry(self.max_retries),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.session = session
+        cache_dir = cache_dir if cache_dir is not None else settings.ML_CACHE_DIR
+        self._cache_dir: Optional[Path] = Path(cache_dir) if cache_dir else None
+        self._cache_ttl_seconds: float = settings.CACHE_EXPIRY_HOURS * 3600.0
 
     # -------------- public methods --------------
     def get_product_info(self, item_id: str) -> Dict[str, Any]:
-        if self._is_offline():
-            return self._offline_get_product_info(item_id)
+        if self._offline:
+            return _offline_get_product_info(item_id)
         return self._get(f"/items/{item_id}")
 
     def get_product_reviews(self, item_id: str, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
-        if self._is_offline():
-            return self._offline_get_product_reviews(item_id, limit=limit, offset=offset)
+        if self._offline:
+            return _offline_get_product_reviews(item_id, limit=limit, offset=offset)
         params = {"limit": max(1, min(50, int(limit))), "offset": max(0, int(offset))}
         # Reviews endpoint may vary by site. Using /reviews/item/ endpoint used publicly
         return self._get(f"/reviews/item/{item_id}", params=params)
 
     def search_products(self, query: str, site_id: str = "MLA", limit: int = 50, offset: int = 0) -> Dict[str, Any]:
-        if self._is_offline():
-            return self._offline_search_products(query=query, site_id=site_id, limit=limit, offset=offset)
+        if self._offline:
+            return _offline_search_products(query=query, site_id=site_id, limit=limit, offset=offset)
         params = {"q": query, "limit": max(1, min(50, int(limit))), "offset": max(0, int(offset))}
         return self._get(f"/sites/{site_id}/search", params=params)
 
+    # -------------- async public methods --------------
+    async def aget_product_info(self, item_id: str) -> Dict[str, Any]:
+        if self._offline:
+            return _offline_get_product_info(item_id)
+        return await self._aget(f"/items/{item_id}")
+
+    async def aget_product_reviews(self, item_id: str, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        if self._offline:
+            return _offline_get_product_reviews(item_id, limit=limit, offset=offset)
+        params = {"limit": max(1, min(50, int(limit))), "offset": max(0, int(offset))}
+        return await self._aget(f"/reviews/item/{item_id}", params=params)
+
+    async def asearch_products(self, query: str, site_id: str = "MLA", limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        if self._offline:
+            return _offline_search_products(query=query, site_id=site_id, limit=limit, offset=offset)
+        params = {"q": query, "limit": max(1, min(50, int(limit))), "offset": max(0, int(offset))}
+        return await self._aget(f"/sites/{site_id}/search", params=params)
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    def close(self) -> None:
+        self.session.close()
+
     # -------------- internal helpers --------------
     def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
-        last_error: Optional[Exception] = None
+        cache_path = self._cache_path(url, params)
+        if cache_path is not None:
+            cached = self._read_cache(cache_path)
+            if cached is not None:
+                return cached
+        # The limiter paces calls, not attempts: retries on network errors, 429 and 5xx happen
+        # inside the adapter, already spaced by its backoff (0.5s, 1s, 2s, ...)
+        self._limiter.acquire()
+        response = self.session.get(url, params=params, headers=self._default_headers, timeout=self.timeout_seconds)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        if cache_path is not None:
+            self._write_cache(cache_path, data)
+        return data
+
+    def _get_aclient(self) -> httpx.AsyncClient:
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                http2=True,
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self.ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=self.ASYNC_MAX_CONNECTIONS,
+                ),
+                # Connection-level retries; status retries are handled in _aget
+                transport=httpx.AsyncHTTPTransport(http2=True, retries=self.max_retries),
+            )
+        return self._aclient
+
+    async def _aget(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        cache_path = self._cache_path(url, params)
+        if cache_path is not None:
+            cached = self._read_cache(cache_path)
+            if cached is not None:
+                return cached
+        client = self._get_aclient()
         for attempt in range(self.max_retries + 1):
-            self._limiter.acquire()
-            try:
-                headers: Dict[str, str] = {}
-                if settings.ML_ACCESS_TOKEN:
-                    headers["Authorization"] = f"Bearer {settings.ML_ACCESS_TOKEN}"
-                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout_seconds)
-                if self._is_retryable_status(response.status_code):
-                    self._maybe_sleep_backoff(attempt, response)
-                    last_error = self._http_error(response)
-                    continue
-                response.raise_for_status()
-                return response.json()
-            except requests.RequestException as exc:
-                last_error = exc
-                # Network or timeout: backoff and retry
-                self._maybe_sleep_backoff(attempt)
-        # Exhausted retries
-        if last_error:
-            raise last_error
-        raise RuntimeError("Unexpected request failure without exception")
+            await self._async_limiter.acquire()
+            response = await client.get(url, params=params, headers=self._default_headers)
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, response.headers.get("Retry-After")))
+                continue
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            if cache_path is not None:
+                self._write_cache(cache_path, data)
+            return data
+        raise RuntimeError("Unexpected request failure without response")
 
     @staticmethod
-    def _is_retryable_status(status_code: int) -> bool:
-        return status_code == 429 or 500 <= status_code < 600
-
-    def _maybe_sleep_backoff(self, attempt: int, response: Optional[Response] = None) -> None:
-        if attempt >= self.max_retries:
-            return
-        # Exponential backoff with jitter
-        base = 0.5
-        delay = base * (2 ** attempt)
-        # Respect Retry-After if present
-        if response is not None:
-            retry_after = response.headers.get("Retry-After")
-            if retry_after:
-                try:
-                    delay = max(delay, float(retry_after))
-                except ValueError:
-                    pass
-        time.sleep(min(delay, 10.0))
+    def _retry_delay(attempt: int, retry_after: Optional[str]) -> float:
+        # Same policy as the sync Retry: 0.5s, 1s, 2s, ... unless Retry-After says more
+        delay = 0.5 * (2 ** attempt)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return min(delay, MAX_RETRY_DELAY_SECONDS)
 
-    @staticmethod
-    def _http_error(response: Response) -> requests.HTTPError:
-        try:
-            detail = response.json()
-        except Exception:
-            detail = response.text
-        return requests.HTTPError(f"HTTP {response.status_code}: {detail}", response=response)
+    @classmethod
+    def _build_retry(cls, max_retries: int) -> Retry:
+        # Exponential backoff (0.5s, 1s, 2s, ...) respecting a capped Retry-After. Once retries
+        # run out the last response is returned, so raise_for_status() still raises HTTPError
+        return _CappedRetry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=cls.RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            allowed_methods=["GET"],
+        )
 
-    # -------------- offline helpers --------------
-    @staticmethod
-    def _is_offline() -> bool:
-        # Offline if explicitly enabled or if there is no token available
-        return bool(getattr(settings, "ML_OFFLINE_MODE", False)) or not bool(getattr(settings, "ML_ACCESS_TOKEN", ""))
+    # -------------- disk cache helpers --------------
+    def _cache_path(self, url: str, params: Optional[Dict[str, Any]]) -> Optional[Path]:
+        if self._cache_dir is None:
+            return None
+        key = url + "?" + urlencode(sorted((params or {}).items()))
+        return self._cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
 
-    @staticmethod
-    def _offline_search_products(query: str, site_id: str, limit: int, offset: int) -> Dict[str, Any]:
-        # Simple deterministic fixture for local development
-        base_results = [
-            {"id": f"{site_id}TEST1", "title": f"{query.title()} Test 1", "price": 1000, "site_id": site_id},
-            {"id": f"{site_id}TEST2", "title": f"{query.title()} Test 2", "price": 2000, "site_id": site_id},
-            {"id": f"{site_id}TEST3", "title": f"{query.title()} Test 3", "price": 3000, "site_id": site_id},
-            {"id": f"{site_id}TEST4", "title": f"{query.title()} Test 4", "price": 4000, "site_id": site_id},
-            {"id": f"{site_id}TEST5", "title": f"{query.title()} Test 5", "price": 5000, "site_id": site_id},
-        ]
-        start = max(0, int(offset))
-        end = start + max(1, min(50, int(limit)))
-        sliced = base_results[start:end]
-        return {
-            "site_id": site_id,
-            "query": query,
-            "paging": {"total": len(base_results), "offset": start, "limit": len(sliced), "primary_results": len(sliced)},
-            "results": sliced,
-        }
+    def _read_cache(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            if time.time() - path.stat().st_mtime > self._cache_ttl_seconds:
+                return None
+            return orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
 
     @staticmethod
-    def _offline_get_product_info(item_id: str) -> Dict[str, Any]:
-        return {
-            "id": item_id,
-            "title": f"Offline {item_id}",
-            "price": 1234,
-            "currency_id": "ARS",
-            "available_quantity": 10,
-            "sold_quantity": 5,
-            "condition": "new",
-        }
+    def _write_cache(path: Path, data: Dict[str, Any]) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(orjson.dumps(data))
+            # Atomic swap so concurrent readers never see a partial file
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
 
-    @staticmethod
-    def _offline_get_product_reviews(item_id: str, limit: int, offset: int) -> Dict[str, Any]:
-        dummy = [
-            {"id": f"R{item_id}1", "rate": 5, "title": "Excelente", "content": "Muy bueno", "date_created": "2024-01-01T00:00:00Z"},
-            {"id": f"R{item_id}2", "rate": 3, "title": "Normal", "content": "Cumple", "date_created": "2024-02-01T00:00:00Z"},
-        ]
-        start = max(0, int(offset))
-        end = start + max(1, min(50, int(limit)))
-        sliced = dummy[start:end]
-        return {"paging": {"total": len(dummy), "offset": start, "limit": len(sliced)}, "reviews": sliced}
 
+# -------------- offline fixtures --------------
+# Cached: repeated offline calls (paging loops in dev/tests) reuse the same dicts.
+# Callers only read the returned payloads.
+@functools.lru_cache(maxsize=256)
+def _offline_search_products(query: str, site_id: str, limit: int, offset: int) -> Dict[str, Any]:
+    # Simple deterministic fixture for local development
+    base_results = [
+        {"id": f"{site_id}TEST1", "title": f"{query.title()} Test 1", "price": 1000, "site_id": site_id},
+        {"id": f"{site_id}TEST2", "title": f"{query.title()} Test 2", "price": 2000, "site_id": site_id},
+        {"id": f"{site_id}TEST3", "title": f"{query.title()} Test 3", "price": 3000, "site_id": site_id},
+        {"id": f"{site_id}TEST4", "title": f"{query.title()} Test 4", "price": 4000, "site_id": site_id},
+        {"id": f"{site_id}TEST5", "title": f"{query.title()} Test 5", "price": 5000, "site_id": site_id},
+    ]
+    start = max(0, int(offset))
+    end = start + max(1, min(50, int(limit)))
+    sliced = base_results[start:end]
+    return {
+        "site_id": site_id,
+        "query": query,
+        "paging": {"total": len(base_results), "offset": start, "limit": len(sliced), "primary_results": len(sliced)},
+        "results": sliced,
+    }
+
+@functools.lru_cache(maxsize=256)
+def _offline_get_product_info(item_id: str) -> Dict[str, Any]:
+    return {
+        "id": item_id,
+        "title": f"Offline {item_id}",
+        "price": 1234,
+        "currency_id": "ARS",
+        "available_quantity": 10,
+        "sold_quantity": 5,
+        "condition": "new",
+    }
 
+@functools.lru_cache(maxsize=256)
+def _offline_get_product_reviews(item_id: str, limit: int, offset: int) -> Dict[str, Any]:
+    dummy = [
+        {"id": f"R{item_id}1", "rate": 5, "title": "Excelente", "content": "Muy bueno", "date_created": "2024-01-01T00:00:00Z"},
+        {"id": f"R{item_id}2", "rate": 3, "title": "Normal", "content": "Cumple", "date_created": "2024-02-01T00:00:00Z"},
+    ]
+    start = max(0, int(offset))
+    end = start + max(1, min(50, int(limit)))
+    sliced = dummy[start:end]
+    return {"paging": {"total": len(dummy), "offset": start, "limit": len(sliced)}, "reviews": sliced}
@@ -1,6 +1,6 @@
+import asyncio
 import threading
 import time
-from typing import Optional
 
 
 class SimpleRateLimiter:
@@ -9,26 +9,45 @@ class SimpleRateLimiter:
 
     It is process-local and thread-safe. Use for client-side politeness and to
     smooth bursts. For strict per-hour quotas, prefer a token bucket.
+
+    Each caller atomically claims the next free time slot and then sleeps
+    outside the lock, so concurrent callers are spaced min_delay_seconds apart
+    without serializing on the sleep itself.
     """
 
     def __init__(self, min_delay_seconds: float = 0.0) -> None:
         self._min_delay_seconds: float = max(0.0, float(min_delay_seconds))
         self._lock = threading.Lock()
-        self._last_request_monotonic: Optional[float] = None
+        self._next_slot: float = 0.0
+
+    def _claim_slot(self) -> float:
+        """Reserves the next slot and returns how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._min_delay_seconds
+        return slot - now
 
     def acquire(self) -> None:
         """Blocks to ensure at least min_delay_seconds since last acquire."""
         if self._min_delay_seconds <= 0:
             return
-        with self._lock:
-            now = time.monotonic()
-            if self._last_request_monotonic is None:
-                self._last_request_monotonic = now
-                return
-            elapsed = now - self._last_request_monotonic
-            sleep_for = self._min_delay_seconds - elapsed
-            if sleep_for > 0:
-                time.sleep(sleep_for)
-            self._last_request_monotonic = time.monotonic()
+        sleep_for = self._claim_slot()
+        if sleep_for > 0:
+            time.sleep(sleep_for)
 
 
+class AsyncRateLimiter(SimpleRateLimiter):
+    """
+    asyncio counterpart of SimpleRateLimiter.
+
+    Waiting coroutines yield to the event loop instead of blocking the thread.
+    """
+
+    async def acquire(self) -> None:  # type: ignore[override]
+        """Waits to ensure at least min_delay_seconds since last acquire."""
+        if self._min_delay_seconds <= 0:
+            return
+        sleep_for = self._claim_slot()
+        if sleep_for > 0:
+            await asyncio.sleep(sleep_for)
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Any, Iterator, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, make_url, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
 
 from src.utils.config import settings
@@ -13,20 +14,105 @@ class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    future=True,
-    echo=bool(settings.DEBUG),
-)
+def _engine_kwargs(database_url: str) -> dict:
+    kwargs = {
+        "future": True,
+        # Logging every statement is costly; opt in explicitly with SQL_ECHO
+        "echo": bool(settings.SQL_ECHO),
+        "query_cache_size": 1200,
+    }
+    if not database_url.startswith("sqlite"):
+        kwargs.update(
+            pool_size=20,
+            max_overflow=40,
+            pool_timeout=30,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+        )
+    return kwargs
+
+
+def create_db_engine(database_url: str) -> Engine:
+    """Sync engine with the project's pool and statement-cache settings (for scripts with their own URL)."""
+    return create_engine(database_url, **_engine_kwargs(database_url))
+
+
+engine = create_db_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True, expire_on_commit=False)
 
 
+def async_database_url(database_url: str) -> str:
+    """Same database through its async driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_db_engine() -> AsyncEngine:
+    """Async engine for the web app; create it once per process and share its pool."""
+    kwargs = _engine_kwargs(settings.DATABASE_URL)
+    if "pool_size" in kwargs:
+        # 10 connections kept open, up to 50 under load
+        kwargs.update(pool_size=10, max_overflow=40)
+    return create_async_engine(async_database_url(settings.DATABASE_URL), **kwargs)
+
+
+def dialect_insert(session: Session, model: Any) -> Any:
+    """INSERT for the session's dialect, exposing on_conflict_do_update/do_nothing."""
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+# Arbitrary key for the advisory lock that serializes schema DDL across workers
+SCHEMA_LOCK_ID = 728491
+# Same for refreshes of the product_review_stats materialized view
+REVIEW_STATS_LOCK_ID = 728492
+
+
 def init_db() -> None:
     # Local import to avoid circulars
     from .product import Product  # noqa: F401
-    from .review import Review  # noqa: F401
+    from .review import PRODUCT_REVIEW_STATS_DDL, PRODUCT_REVIEW_STATS_INDEX_DDL, Review  # noqa: F401
+    from .review_raw import ReviewRaw  # noqa: F401
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Only one worker runs DDL; the rest wait and then find the tables in place
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_ID})
+            # Operadores de trigramas para ix_products_marca_trgm
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        Base.metadata.create_all(bind=conn, checkfirst=True)
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(PRODUCT_REVIEW_STATS_DDL))
+            conn.execute(text(PRODUCT_REVIEW_STATS_INDEX_DDL))
+
+
+def refresh_review_stats(bind: Optional[Engine] = None, skip_if_busy: bool = False) -> bool:
+    """
+    Recomputes the product_review_stats materialized view; no-op outside PostgreSQL.
 
-    Base.metadata.create_all(bind=engine)
+    With skip_if_busy, returns False right away when another refresh is running
+    instead of queueing behind it. Returns whether this call refreshed the view.
+    """
+    bind = bind if bind is not None else engine
+    if bind.dialect.name != "postgresql":
+        return False
+    with bind.begin() as conn:
+        if skip_if_busy:
+            if not conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": REVIEW_STATS_LOCK_ID}):
+                return False
+        else:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": REVIEW_STATS_LOCK_ID})
+        # CONCURRENTLY: readers keep seeing the previous contents while it recomputes
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY product_review_stats"))
+    return True
 
 
 @contextmanager
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import String, Integer, Float, Text
+from sqlalchemy import String, Integer, Float, Text, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from typing import Optional, Dict, Any
@@ -27,4 +27,14 @@ class Product(Base):
     # Información adicional de MercadoLibre
     ml_additional_info: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
 
+    __table_args__ = (
+        # Búsqueda por marca con ILIKE '%...%': índice de trigramas (requiere pg_trgm)
+        Index(
+            "ix_products_marca_trgm",
+            "marca",
+            postgresql_using="gin",
+            postgresql_ops={"marca": "gin_trgm_ops"},
+        ),
+    )
+
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import String, Integer, Float, DateTime, Text, Index
+from sqlalchemy import String, Integer, Float, DateTime, Text, Index, column, table, text
 from sqlalchemy.dialects.postgresql import JSONB
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Mapped, mapped_column
@@ -13,7 +13,7 @@ class Review(Base):
     __tablename__ = "reviews"
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
-    product_id: Mapped[str] = mapped_column(String(32), index=True)
+    product_id: Mapped[str] = mapped_column(String(32))
     rate: Mapped[int] = mapped_column(Integer)
     title: Mapped[str] = mapped_column(String(255), default="")
     content: Mapped[str] = mapped_column(Text)
@@ -23,16 +23,81 @@ class Review(Base):
     dislikes: Mapped[int] = mapped_column(Integer, default=0)
     sentiment_score: Mapped[float] = mapped_column(Float, default=0.0)
     sentiment_label: Mapped[str] = mapped_column(String(16), default="neutral")
+    # NULL hasta que sentiment_analyzer procesa la review (distingue "neutral" de "sin procesar")
+    sentiment_processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     # Nuevos campos
     api_review_id: Mapped[str] = mapped_column(String(64), default="")
     date_text: Mapped[str] = mapped_column(String(64), default="")
     source: Mapped[str] = mapped_column(String(16), default="api")
     media: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
-    raw_json: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+    # El payload original vive en review_raw (ver ReviewRaw)
 
     __table_args__ = (
-        Index("ix_reviews_product_date", "product_id", "date_created"),
+        # Filtro por igualdad + ORDER BY date_created DESC, id DESC (keyset): el índice se
+        # recorre hacia atrás y el cursor (date_created, id) es un seek, sin sort
+        Index("ix_reviews_product_date_id", "product_id", "date_created", "id"),
+        Index("ix_reviews_rate_date_id", "rate", "date_created", "id"),
+        Index("ix_reviews_sentiment_date_id", "sentiment_label", "date_created", "id"),
+        # Reviews recientes sin filtro (y /api/reviews/stream)
+        Index("ix_reviews_date_id", "date_created", "id"),
+        # Conteos por producto resueltos solo con el índice (index-only scan)
+        Index("ix_reviews_product_id_covering", "product_id", postgresql_include=["id"]),
+        Index("ix_reviews_nonempty_content", "product_id", postgresql_where=text("content <> ''")),
+        # Solo las pendientes de sentimiento, ya ordenadas por fecha: crece con lo pendiente, no con la tabla
+        Index(
+            "ix_reviews_pending_sentiment",
+            "date_created",
+            postgresql_where=text("sentiment_processed_at IS NULL"),
+            sqlite_where=text("sentiment_processed_at IS NULL"),
+        ),
     )
 
 
+# Columnas que devuelven las lecturas de la web (review_to_dict, ReviewOut): se seleccionan
+# como tuplas, sin hidratar el ORM ni traer columnas internas como sentiment_processed_at
+REVIEW_READ_COLUMNS = (
+    Review.id,
+    Review.product_id,
+    Review.rate,
+    Review.title,
+    Review.content,
+    Review.date_created,
+    Review.reviewer_id,
+    Review.likes,
+    Review.dislikes,
+    Review.sentiment_score,
+    Review.sentiment_label,
+    Review.api_review_id,
+    Review.date_text,
+    Review.source,
+    Review.media,
+)
+
+
+# Estadísticas de reviews por producto, precalculadas (solo PostgreSQL). Se crea en init_db
+# y se refresca con refresh_review_stats() al terminar cada carga o análisis de reviews
+PRODUCT_REVIEW_STATS_DDL = (
+    "CREATE MATERIALIZED VIEW IF NOT EXISTS product_review_stats AS "
+    "SELECT product_id, count(*) AS total_reviews, sum(rate) AS rate_sum, "
+    + "".join(f"count(*) FILTER (WHERE rate = {i}) AS rate_{i}, " for i in range(1, 6))
+    + "count(*) FILTER (WHERE sentiment_label = 'positive') AS positive, "
+    "count(*) FILTER (WHERE sentiment_label = 'negative') AS negative, "
+    "count(*) FILTER (WHERE sentiment_label = 'neutral') AS neutral "
+    "FROM reviews GROUP BY product_id"
+)
+# Índice único: requisito de REFRESH MATERIALIZED VIEW CONCURRENTLY (y lookup por PK)
+PRODUCT_REVIEW_STATS_INDEX_DDL = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_product_review_stats_product ON product_review_stats (product_id)"
+)
+
+product_review_stats = table(
+    "product_review_stats",
+    column("product_id"),
+    column("total_reviews"),
+    column("rate_sum"),
+    *(column(f"rate_{i}") for i in range(1, 6)),
+    column("positive"),
+    column("negative"),
+    column("neutral"),
+)
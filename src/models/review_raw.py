@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from sqlalchemy import String, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from typing import Optional, Dict, Any
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .database import Base
+
+
+class ReviewRaw(Base):
+    """Payload original de una review, separado para mantener angosta la tabla reviews."""
+
+    __tablename__ = "review_raw"
+
+    review_id: Mapped[str] = mapped_column(String(64), ForeignKey("reviews.id", ondelete="CASCADE"), primary_key=True)
+    raw_json: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import argparse
-from typing import List
+import asyncio
+from typing import Any, Dict, List, Tuple
 
 from src.api.ml_client import MercadoLibreClient
-from src.models.database import get_session, init_db
+from src.models.database import get_session, init_db, refresh_review_stats
 from src.services.review_scraper import ReviewCacheService
 
 
@@ -14,23 +15,55 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--count", type=int, default=100, help="Total reviews to fetch per item (default: 100)")
     parser.add_argument("--page-size", type=int, default=50, help="Page size per request (<=50)")
     parser.add_argument("--offset", type=int, default=0, help="Initial offset")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent page requests (default: 8)")
     return parser.parse_args()
 
 
-def run(items: List[str], count: int, page_size: int, offset: int) -> None:
+def build_pages(items: List[str], count: int, page_size: int, offset: int) -> List[Tuple[str, int, int]]:
+    """Splits the requested range of every item into (item_id, offset, limit) pages."""
+    pages: List[Tuple[str, int, int]] = []
+    for item_id in items:
+        remaining = max(0, count)
+        current_offset = max(0, offset)
+        while remaining > 0:
+            limit = min(page_size, remaining, 50)
+            pages.append((item_id, current_offset, limit))
+            current_offset += limit
+            remaining -= limit
+    return pages
+
+
+async def fetch_pages(client: MercadoLibreClient, pages: List[Tuple[str, int, int]], workers: int) -> List[Dict[str, Any]]:
+    """Fetches all pages concurrently over the client's async HTTP/2 connection pool."""
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def fetch_page(item_id: str, page_offset: int, limit: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await client.aget_product_reviews(item_id, limit=limit, offset=page_offset)
+
+    try:
+        return await asyncio.gather(*(fetch_page(*page) for page in pages))
+    finally:
+        await client.aclose()
+
+
+def run(items: List[str], count: int, page_size: int, offset: int, workers: int = 8) -> None:
     init_db()
     client = MercadoLibreClient()
     svc = ReviewCacheService(client)
+    pages = build_pages(items, count, page_size, offset)
+    # Network fan-out happens concurrently; DB writes stay in a single session
+    payloads = asyncio.run(fetch_pages(client, pages, workers))
     with get_session() as db:
         for item_id in items:
-            svc.get_or_fetch_product(db, item_id)
-            remaining = max(0, count)
-            current_offset = max(0, offset)
-            while remaining > 0:
-                limit = min(page_size, remaining, 50)
-                svc.fetch_and_store_reviews(db, item_id, limit=limit, offset=current_offset)
-                current_offset += limit
-                remaining -= limit
+            svc.ensure_product(db, item_id)
+        payloads_by_item: Dict[str, List[Dict[str, Any]]] = {}
+        for (item_id, _, _), payload in zip(pages, payloads):
+            payloads_by_item.setdefault(item_id, []).append(payload)
+        for item_id, item_payloads in payloads_by_item.items():
+            svc.store_review_pages(db, item_id, item_payloads)
+    # One refresh of the precomputed stats for the whole batch
+    refresh_review_stats()
 
 
 def main() -> None:
@@ -38,7 +71,7 @@ def main() -> None:
     items = [s.strip() for s in args.items.split(",") if s.strip()]
     if not items:
         raise SystemExit("No items provided")
-    run(items=items, count=args.count, page_size=args.page_size, offset=args.offset)
+    run(items=items, count=args.count, page_size=args.page_size, offset=args.offset, workers=args.workers)
 
 
 if __name__ == "__main__":
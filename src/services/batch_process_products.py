@@ -5,14 +5,15 @@ para reprocesar si es necesario (extraer más información o reviews)
 """
 
 import os
-import sys
 import argparse
 from datetime import datetime
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
 from sqlalchemy.orm import sessionmaker
-from src.models.database import Base
+from src.models.database import Base, refresh_review_stats
 from src.models.product import Product
 from src.models.review import Review
+from src.services.scrape_final import extract_product_code, extract_hints, run_for_item
+from src.services.sentiment_analyzer import iter_reviews_to_process, process_reviews_batch
 
 
 def load_env():
@@ -35,16 +36,29 @@ def get_db_session():
     return SessionLocal()
 
 
-def get_all_products(session):
-    """Obtiene todos los productos de la base de datos"""
-    products = session.query(Product).all()
-    return products
-
-
-def get_product_review_count(session, product_id):
-    """Obtiene el número de reviews de un producto"""
-    count = session.query(Review).filter(Review.product_id == product_id).count()
-    return count
+def get_products_with_review_counts(session, product_id=None):
+    """
+    Obtiene los productos con su URL y número de reviews en una sola consulta
+    
+    Solo trae las columnas necesarias y extrae la URL del JSONB en la DB.
+    Las filas se leen de una vez (son chicas): no queda un cursor abierto durante el
+    procesamiento, que escribe desde otras sesiones.
+    """
+    query = (
+        session.query(
+            Product.id,
+            Product.title,
+            Product.marca,
+            Product.price,
+            Product.ml_additional_info["url"].astext.label("url"),
+            func.count(Review.id).label("review_count"),
+        )
+        .outerjoin(Review, Review.product_id == Product.id)
+        .group_by(Product.id)
+    )
+    if product_id:
+        query = query.filter(Product.id == product_id)
+    return query.all()
 
 
 def process_product_extraction(session, product, force_reprocess=False):
@@ -57,9 +71,7 @@ def process_product_extraction(session, product, force_reprocess=False):
     from src.services.extract_product_simple import process_single_url
     
     # Obtener URL del producto
-    url = None
-    if product.ml_additional_info and 'url' in product.ml_additional_info:
-        url = product.ml_additional_info['url']
+    url = product.url
     
     if not url:
         print(f"❌ No se encontró URL para el producto {product.id}")
@@ -80,36 +92,25 @@ def process_product_reviews(session, product, min_reviews=50):
     print(f"📝 Procesando reviews de producto: {product.id}")
     
     # Obtener URL del producto
-    url = None
-    if product.ml_additional_info and 'url' in product.ml_additional_info:
-        url = product.ml_additional_info['url']
+    url = product.url
     
     if not url:
         print(f"❌ No se encontró URL para el producto {product.id}")
         return False
     
     # Verificar si ya tiene suficientes reviews
-    current_reviews = get_product_review_count(session, product.id)
+    current_reviews = product.review_count
     if current_reviews >= min_reviews:
         print(f"✅ Producto {product.id} ya tiene {current_reviews} reviews (mínimo: {min_reviews})")
         return True
     
     try:
-        # Importar y usar scrape_final
-        import subprocess
-        cmd = [
-            sys.executable, '-m', 'src.services.scrape_final',
-            '--url', url,
-            '--count', str(min_reviews)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"✅ Reviews extraídas exitosamente para {product.id}")
-            return True
-        else:
-            print(f"❌ Error extrayendo reviews para {product.id}: {result.stderr}")
-            return False
+        # Llamar a scrape_final en el mismo proceso (sin subprocess por producto)
+        item_id = extract_product_code(url)
+        site_id_hint, title_hint = extract_hints(url, item_id)
+        run_for_item(item_id, min_reviews, site_id_hint, title_hint)
+        print(f"✅ Reviews extraídas exitosamente para {product.id}")
+        return True
             
     except Exception as e:
         print(f"❌ Error procesando reviews de {product.id}: {e}")
@@ -123,19 +124,13 @@ def analyze_sentiment_for_product(session, product_id):
     print(f"🧠 Analizando sentimiento para producto: {product_id}")
     
     try:
-        # Importar y usar sentiment_analyzer
-        import subprocess
-        cmd = [
-            sys.executable, '-m', 'src.services.sentiment_analyzer',
-            '--product-id', product_id
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
+        # Llamar a sentiment_analyzer en el mismo proceso (sin subprocess por producto)
+        stats = process_reviews_batch(iter_reviews_to_process(product_id=product_id))
+        if stats["errors"] == 0:
             print(f"✅ Sentimiento analizado para {product_id}")
             return True
         else:
-            print(f"❌ Error analizando sentimiento para {product_id}: {result.stderr}")
+            print(f"❌ Error analizando sentimiento para {product_id}: {stats['errors']} errores")
             return False
             
     except Exception as e:
@@ -172,20 +167,20 @@ def main():
     
     try:
         # Obtener productos
-        if args.product_id:
-            products = session.query(Product).filter(Product.id == args.product_id).all()
-            if not products:
-                print(f"❌ No se encontró producto con ID: {args.product_id}")
-                return
-        else:
-            products = get_all_products(session)
+        products = get_products_with_review_counts(session, args.product_id)
+        # Cerrar la transacción de lectura antes de empezar a escribir
+        session.commit()
+        total_products = len(products)
+        if args.product_id and not total_products:
+            print(f"❌ No se encontró producto con ID: {args.product_id}")
+            return
         
-        print(f"📊 Total de productos a procesar: {len(products)}")
+        print(f"📊 Total de productos a procesar: {total_products}")
         print()
         
         # Estadísticas
         stats = {
-            'total': len(products),
+            'total': total_products,
             'extract_success': 0,
             'extract_failed': 0,
             'reviews_success': 0,
@@ -197,18 +192,17 @@ def main():
         
         # Procesar cada producto
         for i, product in enumerate(products, 1):
-            print(f"\n🔍 PRODUCTO {i}/{len(products)}: {product.id}")
+            print(f"\n🔍 PRODUCTO {i}/{total_products}: {product.id}")
             print("-" * 50)
             print(f"Título: {product.title[:80]}...")
             print(f"Marca: {product.marca}")
             print(f"Precio: ${product.price:,.2f}")
             
             # Obtener URL
-            url = product.ml_additional_info.get('url', 'N/A') if product.ml_additional_info else 'N/A'
-            print(f"URL: {url}")
+            print(f"URL: {product.url or 'N/A'}")
             
-            # Obtener número de reviews actual
-            current_reviews = get_product_review_count(session, product.id)
+            # Número de reviews actual (ya viene en la consulta)
+            current_reviews = product.review_count
             print(f"Reviews actuales: {current_reviews}")
             
             # Ejecutar acciones según el parámetro
@@ -234,6 +228,10 @@ def main():
                     print(f"⏭️  Saltando análisis de sentimiento (sin reviews)")
                     stats['skipped'] += 1
         
+        if args.action in ['reviews', 'sentiment', 'all']:
+            # Un solo refresco de las estadísticas precalculadas al final del lote
+            refresh_review_stats(session.get_bind())
+        
         # Resumen final
         print("\n" + "=" * 60)
         print("📊 RESUMEN FINAL:")
@@ -4,15 +4,80 @@ Servicio de datos para consultas web
 Proporciona métodos para obtener productos y reviews desde la base de datos
 """
 
-from typing import List, Optional, Dict, Any
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Iterator
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
-from datetime import datetime
+from sqlalchemy import desc, asc, func, distinct, select, bindparam, cast, Text, case, exists, tuple_
+from datetime import datetime, timedelta
 import os
+import orjson
 
 from src.models.database import get_session
 from src.models.product import Product
-from src.models.review import Review
+from src.models.review import REVIEW_READ_COLUMNS, Review, product_review_stats
+
+
+# Columnas que consume _product_to_dict: se seleccionan como tuplas, sin hidratar el ORM
+_PRODUCT_COLUMNS = (
+    Product.id,
+    Product.title,
+    Product.price,
+    Product.site_id,
+    Product.currency_id,
+    Product.sold_quantity,
+    Product.available_quantity,
+    Product.marca,
+    Product.modelo,
+    Product.caracteristicas,
+    Product.ml_additional_info,
+)
+
+# Sentencias fijas: el patrón y el límite van como bindparam para reutilizar la compilación cacheada
+_BRAND_STMT = (
+    select(*_PRODUCT_COLUMNS)
+    .where(Product.marca.ilike(bindparam("marca")))
+    .order_by(desc(Product.id))
+)
+_BRAND_STMT_LIMITED = _BRAND_STMT.limit(bindparam("lim"))
+_BRAND_STMT_AFTER = _BRAND_STMT.where(Product.id < bindparam("after_id")).limit(bindparam("lim"))
+
+# Mismo contenido que _product_to_dict, pero serializado a JSON por PostgreSQL
+_PRODUCT_JSON = cast(
+    func.json_build_object(
+        "id", Product.id,
+        "title", Product.title,
+        "price", Product.price,
+        "site_id", Product.site_id,
+        "currency_id", Product.currency_id,
+        "sold_quantity", Product.sold_quantity,
+        "available_quantity", Product.available_quantity,
+        "marca", Product.marca,
+        "modelo", Product.modelo,
+        "caracteristicas", Product.caracteristicas,
+        "ml_additional_info", Product.ml_additional_info,
+        "url", Product.ml_additional_info["url"],
+    ),
+    Text,
+)
+
+
+_SENTIMENTS = ("positive", "negative", "neutral")
+
+# Columnas de product_review_stats en el orden que espera _stats_from_counts
+_STATS_VIEW_COUNTS = (
+    product_review_stats.c.total_reviews,
+    product_review_stats.c.rate_sum,
+    *(product_review_stats.c[f"rate_{i}"] for i in range(1, 6)),
+    *(product_review_stats.c[s] for s in _SENTIMENTS),
+)
+
+# Cursor de reviews: (date_created, id) de la última review de la página anterior
+ReviewCursor = tuple[datetime, str]
+
+
+def _after_review(cursor: ReviewCursor):
+    """Keyset: reviews que siguen a cursor en orden (date_created DESC, id DESC)"""
+    return tuple_(Review.date_created, Review.id) < tuple_(*cursor)
 
 
 class DataService:
@@ -23,27 +88,56 @@ class DataService:
     
     # ===== MÉTODOS DE PRODUCTOS =====
     
-    def get_all_products(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    def get_all_products(self, limit: Optional[int] = None, offset: int = 0,
+                         after_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Obtiene todos los productos con paginación
         
         Args:
             limit: Número máximo de productos a retornar
             offset: Número de productos a saltar
+            after_id: Cursor (keyset): último id de la página anterior; si se pasa, offset se ignora
             
         Returns:
             Lista de diccionarios con información de productos
         """
-        query = self.session.query(Product).order_by(desc(Product.id))
+        stmt = self._paginate_products(select(*_PRODUCT_COLUMNS), limit, offset, after_id)
         
-        if offset > 0:
-            query = query.offset(offset)
+        rows = self.session.execute(stmt.execution_options(yield_per=1000))
+        
+        return [self._product_to_dict(row) for row in rows]
+    
+    @staticmethod
+    def _paginate_products(stmt, limit: Optional[int], offset: int, after_id: Optional[str]):
+        """Ordena por id descendente y pagina por cursor (id < after_id) o, si no hay, por OFFSET"""
+        stmt = stmt.order_by(desc(Product.id))
+        
+        if after_id:
+            # Seek sobre la PK: costo constante sin importar qué tan profunda sea la página
+            stmt = stmt.where(Product.id < after_id)
+        elif offset > 0:
+            stmt = stmt.offset(offset)
         if limit:
-            query = query.limit(limit)
+            stmt = stmt.limit(limit)
+        return stmt
+    
+    def get_all_products_json(self, limit: Optional[int] = None, offset: int = 0,
+                              after_id: Optional[str] = None) -> List[str]:
+        """
+        Igual que get_all_products, pero cada producto ya serializado como JSON
+        
+        En PostgreSQL el JSON lo arma la base (json_build_object), sin pasar por
+        dicts de Python; en otros motores se serializa con orjson.
+        
+        Returns:
+            Lista de strings JSON, uno por producto
+        """
+        if self.session.get_bind().dialect.name != "postgresql":
+            return [orjson.dumps(product).decode() for product in self.get_all_products(limit, offset, after_id)]
         
-        products = query.all()
+        stmt = self._paginate_products(select(_PRODUCT_JSON), limit, offset, after_id)
         
-        return [self._product_to_dict(product) for product in products]
+        return list(self.session.scalars(stmt))
     
     def get_product_by_id(self, product_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -61,25 +155,30 @@ class DataService:
             return self._product_to_dict(product)
         return None
     
-    def get_products_by_brand(self, marca: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def get_products_by_brand(self, marca: str, limit: Optional[int] = None,
+                              after_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Obtiene productos filtrados por marca
         
         Args:
             marca: Nombre de la marca
             limit: Número máximo de productos a retornar
+            after_id: Cursor (keyset): último id de la página anterior; requiere limit
             
         Returns:
             Lista de diccionarios con productos de la marca
         """
-        query = self.session.query(Product).filter(Product.marca.ilike(f"%{marca}%")).order_by(desc(Product.id))
-        
+        params = {"marca": f"%{marca}%"}
+        stmt = _BRAND_STMT
         if limit:
-            query = query.limit(limit)
+            stmt = _BRAND_STMT_AFTER if after_id else _BRAND_STMT_LIMITED
+            params["lim"] = limit
+            if after_id:
+                params["after_id"] = after_id
         
-        products = query.all()
+        rows = self.session.execute(stmt, params)
         
-        return [self._product_to_dict(product) for product in products]
+        return [self._product_to_dict(row) for row in rows]
     
     def get_products_stats(self) -> Dict[str, Any]:
         """
@@ -88,124 +187,159 @@ class DataService:
         Returns:
             Diccionario con estadísticas
         """
-        total_products = self.session.query(Product).count()
+        # Total, marcas únicas y precio promedio en una sola consulta
+        total_products, unique_brands, avg_price_value = self.session.query(
+            func.count(Product.id),
+            func.count(distinct(Product.marca)).filter(Product.marca != ""),
+            func.avg(Product.price).filter(Product.price > 0),
+        ).one()
         
         # Productos con reviews
-        products_with_reviews = self.session.query(Product).join(Review, Product.id == Review.product_id).distinct().count()
-        
-        # Marcas únicas
-        unique_brands = self.session.query(Product.marca).filter(Product.marca != "").distinct().count()
-        
-        # Precio promedio
-        avg_price = self.session.query(Product.price).filter(Product.price > 0).all()
-        avg_price_value = sum(p[0] for p in avg_price) / len(avg_price) if avg_price else 0
+        products_with_reviews = self.session.query(func.count(distinct(Review.product_id))).scalar() or 0
         
         return {
             "total_products": total_products,
             "products_with_reviews": products_with_reviews,
             "unique_brands": unique_brands,
-            "average_price": round(avg_price_value, 2)
+            "average_price": round(float(avg_price_value or 0), 2)
         }
     
     # ===== MÉTODOS DE REVIEWS =====
     
     def get_reviews_by_product(self, product_id: str, limit: Optional[int] = None, 
-                             offset: int = 0, order_by: str = "date_created") -> List[Dict[str, Any]]:
+                             offset: int = 0, order_by: str = "date_created",
+                             cursor: Optional[ReviewCursor] = None,
+                             require_product: bool = False) -> Optional[List[Dict[str, Any]]]:
         """
         Obtiene reviews de un producto específico
         
         Args:
             product_id: ID del producto
             limit: Número máximo de reviews a retornar
-            offset: Número de reviews a saltar
+            offset: Número de reviews a saltar (obsoleto: usar cursor)
             order_by: Campo por el cual ordenar (date_created, rate, sentiment_score)
+            cursor: (date_created, id) de la última review de la página anterior; solo
+                aplica al ordenar por date_created y reemplaza a offset
+            require_product: si es True y el producto no existe, devuelve None
             
         Returns:
             Lista de diccionarios con información de reviews
         """
-        # Validar que el producto existe
-        product = self.session.query(Product).filter(Product.id == product_id).first()
-        if not product:
-            return []
+        # reviews.product_id no tiene FK a products: tener reviews no prueba que el producto
+        # exista, así que require_product siempre lo verifica (lookup por PK, index-only)
+        if require_product and not self._product_exists(product_id):
+            return None
         
-        # Construir query
-        query = self.session.query(Review).filter(Review.product_id == product_id)
+        query = self.session.query(*REVIEW_READ_COLUMNS).filter(Review.product_id == product_id)
         
         # Ordenamiento
         if order_by == "date_created":
-            query = query.order_by(desc(Review.date_created))
+            # id como desempate para que el cursor sea estable
+            query = query.order_by(desc(Review.date_created), desc(Review.id))
         elif order_by == "rate":
             query = query.order_by(desc(Review.rate))
         elif order_by == "sentiment_score":
             query = query.order_by(desc(Review.sentiment_score))
         
-        # Paginación
-        if offset > 0:
+        # Paginación: por cursor (seek en ix_reviews_product_date_id) o por OFFSET
+        if cursor and order_by == "date_created":
+            query = query.filter(_after_review(cursor))
+        elif offset > 0:
             query = query.offset(offset)
         if limit:
             query = query.limit(limit)
         
         reviews = query.all()
         
-        return [self._review_to_dict(review) for review in reviews]
+        return [self.review_to_dict(review) for review in reviews]
     
-    def get_reviews_by_rating(self, rating: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def _product_exists(self, product_id: str) -> bool:
+        return bool(self.session.scalar(select(exists().where(Product.id == product_id))))
+    
+    def get_reviews_by_rating(self, rating: int, limit: Optional[int] = None,
+                              cursor: Optional[ReviewCursor] = None) -> List[Dict[str, Any]]:
         """
         Obtiene reviews filtradas por calificación
         
         Args:
             rating: Calificación (1-5)
             limit: Número máximo de reviews a retornar
+            cursor: (date_created, id) de la última review de la página anterior
             
         Returns:
             Lista de diccionarios con reviews de la calificación especificada
         """
-        query = self.session.query(Review).filter(Review.rate == rating).order_by(desc(Review.date_created))
+        query = (
+            self.session.query(*REVIEW_READ_COLUMNS)
+            .filter(Review.rate == rating)
+            .order_by(desc(Review.date_created), desc(Review.id))
+        )
         
+        if cursor:
+            query = query.filter(_after_review(cursor))
         if limit:
             query = query.limit(limit)
         
         reviews = query.all()
         
-        return [self._review_to_dict(review) for review in reviews]
+        return [self.review_to_dict(review) for review in reviews]
     
-    def get_reviews_by_sentiment(self, sentiment: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def get_reviews_by_sentiment(self, sentiment: str, limit: Optional[int] = None,
+                                 cursor: Optional[ReviewCursor] = None) -> List[Dict[str, Any]]:
         """
         Obtiene reviews filtradas por sentimiento
         
         Args:
             sentiment: Sentimiento (positive, negative, neutral)
             limit: Número máximo de reviews a retornar
+            cursor: (date_created, id) de la última review de la página anterior
             
         Returns:
             Lista de diccionarios con reviews del sentimiento especificado
         """
-        query = self.session.query(Review).filter(Review.sentiment_label == sentiment).order_by(desc(Review.date_created))
+        query = (
+            self.session.query(*REVIEW_READ_COLUMNS)
+            .filter(Review.sentiment_label == sentiment)
+            .order_by(desc(Review.date_created), desc(Review.id))
+        )
         
+        if cursor:
+            query = query.filter(_after_review(cursor))
         if limit:
             query = query.limit(limit)
         
         reviews = query.all()
         
-        return [self._review_to_dict(review) for review in reviews]
+        return [self.review_to_dict(review) for review in reviews]
     
-    def get_reviews_stats(self, product_id: Optional[str] = None) -> Dict[str, Any]:
+    def get_reviews_stats(self, product_id: Optional[str] = None,
+                          require_product: bool = False) -> Optional[Dict[str, Any]]:
         """
         Obtiene estadísticas de reviews
         
         Args:
             product_id: ID del producto (opcional, si no se especifica son estadísticas globales)
+            require_product: si es True y el producto no existe, devuelve None
             
         Returns:
             Diccionario con estadísticas de reviews
         """
-        # Query base
-        query = self.session.query(Review)
-        if product_id:
-            query = query.filter(Review.product_id == product_id)
-        
-        # Total de reviews
-        total_reviews = query.count()
+        if self._is_postgres():
+            return self._reviews_stats_from_view(product_id, require_product)
+        return self._reviews_stats_live(product_id, require_product)
+    
+    def _reviews_stats_live(self, product_id: Optional[str], require_product: bool) -> Optional[Dict[str, Any]]:
+        """get_reviews_stats agregando directamente sobre reviews"""
+        filters = [Review.product_id == product_id] if product_id else []
+        
+        # Total y rating promedio (y, si se pide, si el producto existe) en una sola consulta
+        columns = [func.count(Review.id), func.avg(Review.rate)]
+        if require_product:
+            columns.append(exists().where(Product.id == product_id))
+        head = self.session.query(*columns).filter(*filters).one()
+        total_reviews, avg_rating_value = head[0], head[1]
+        if require_product and not head[2]:
+            return None
         
         if total_reviews == 0:
             return {
@@ -215,40 +349,120 @@ class DataService:
                 "sentiment_distribution": {}
             }
         
-        # Rating promedio
-        avg_rating = query.with_entities(Review.rate).all()
-        avg_rating_value = sum(r[0] for r in avg_rating) / len(avg_rating) if avg_rating else 0
-        
-        # Distribución de ratings
-        rating_dist = {}
-        for i in range(1, 6):
-            count = query.filter(Review.rate == i).count()
-            rating_dist[f"{i}_stars"] = count
-        
-        # Distribución de sentimientos
-        sentiment_dist = {}
-        for sentiment in ["positive", "negative", "neutral"]:
-            count = query.filter(Review.sentiment_label == sentiment).count()
-            sentiment_dist[sentiment] = count
+        # Distribución de ratings (un GROUP BY)
+        rating_counts = dict(
+            self.session.query(Review.rate, func.count(Review.id)).filter(*filters).group_by(Review.rate).all()
+        )
+        rating_dist = {f"{i}_stars": rating_counts.get(i, 0) for i in range(1, 6)}
+        
+        # Distribución de sentimientos (un GROUP BY)
+        sentiment_counts = dict(
+            self.session.query(Review.sentiment_label, func.count(Review.id))
+            .filter(*filters)
+            .group_by(Review.sentiment_label)
+            .all()
+        )
+        sentiment_dist = {
+            sentiment: sentiment_counts.get(sentiment, 0)
+            for sentiment in ["positive", "negative", "neutral"]
+        }
         
         return {
             "total_reviews": total_reviews,
-            "average_rating": round(avg_rating_value, 2),
+            "average_rating": round(float(avg_rating_value or 0), 2),
             "rating_distribution": rating_dist,
             "sentiment_distribution": sentiment_dist
         }
 
+    def get_reviews_stats_bulk(self, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Estadísticas de reviews de varios productos en una sola consulta (GROUP BY product_id)
+        
+        Args:
+            product_ids: IDs de los productos
+            
+        Returns:
+            {product_id: estadísticas} con el mismo formato que get_reviews_stats;
+            los productos sin reviews (o inexistentes) quedan con totales en cero
+        """
+        stats = {product_id: self._stats_from_counts(0, 0, (), ()) for product_id in product_ids}
+        live_ids = product_ids
+        if self._is_postgres():
+            # Filas ya agregadas de la vista: lookup por su índice único
+            view_stmt = (
+                select(product_review_stats.c.product_id, *_STATS_VIEW_COUNTS)
+                .where(product_review_stats.c.product_id.in_(product_ids))
+            )
+            in_view = self._collect_stats(view_stmt, stats)
+            # Los que faltan en la vista (cargados después del último refresh) se agregan en vivo,
+            # igual que en get_reviews_stats
+            live_ids = [product_id for product_id in product_ids if product_id not in in_view]
+        if live_ids:
+            live_stmt = (
+                select(
+                    Review.product_id,
+                    func.count(Review.id),
+                    func.sum(Review.rate),
+                    *(func.sum(case((Review.rate == i, 1), else_=0)) for i in range(1, 6)),
+                    *(func.sum(case((Review.sentiment_label == s, 1), else_=0)) for s in _SENTIMENTS),
+                )
+                .where(Review.product_id.in_(live_ids))
+                .group_by(Review.product_id)
+            )
+            self._collect_stats(live_stmt, stats)
+        return stats
+    
+    def _collect_stats(self, stmt, stats: Dict[str, Dict[str, Any]]) -> set:
+        """Vuelca en stats las filas (product_id, total, rate_sum, 5 ratings, 3 sentimientos); devuelve los ids vistos"""
+        seen = set()
+        for product_id, *counts in self.session.execute(stmt):
+            stats[product_id] = self._stats_from_counts(counts[0], counts[1], counts[2:7], counts[7:10])
+            seen.add(product_id)
+        return seen
+    
+    def _is_postgres(self) -> bool:
+        return self.session.get_bind().dialect.name == "postgresql"
+    
+    def _reviews_stats_from_view(self, product_id: Optional[str], require_product: bool) -> Optional[Dict[str, Any]]:
+        """get_reviews_stats sobre la vista materializada product_review_stats (PostgreSQL)"""
+        if product_id:
+            row = self.session.execute(
+                select(*_STATS_VIEW_COUNTS).where(product_review_stats.c.product_id == product_id)
+            ).first()
+            if row is not None and require_product and not self._product_exists(product_id):
+                # Reviews huérfanas (sin FK): el producto ya no existe
+                return None
+            if row is None:
+                # Sin fila en la vista: producto inexistente, sin reviews o cargado después del
+                # último refresh; se calcula en vivo (es un solo producto, por índice)
+                return self._reviews_stats_live(product_id, require_product)
+        else:
+            row = self.session.execute(select(*(func.sum(col) for col in _STATS_VIEW_COUNTS))).one()
+        return self._stats_from_counts(row[0], row[1], row[2:7], row[7:10])
+    
+    @staticmethod
+    def _stats_from_counts(total_reviews, rate_sum, rating_counts, sentiment_counts) -> Dict[str, Any]:
+        """Formato de get_reviews_stats a partir de totales: (1..5 estrellas) y (positive, negative, neutral)"""
+        if not total_reviews:
+            return {
+                "total_reviews": 0,
+                "average_rating": 0,
+                "rating_distribution": {},
+                "sentiment_distribution": {}
+            }
+        return {
+            "total_reviews": int(total_reviews),
+            "average_rating": round(float(rate_sum or 0) / int(total_reviews), 2),
+            "rating_distribution": {f"{i}_stars": int(count or 0) for i, count in enumerate(rating_counts, 1)},
+            "sentiment_distribution": {s: int(count or 0) for s, count in zip(_SENTIMENTS, sentiment_counts)}
+        }
+
     def get_reviews_timeline(self, product_id: Optional[str] = None, days: int = 30, marca: Optional[str] = None) -> List[Dict[str, Any]]:
         """Obtiene datos temporales de reviews para gráficos de evolución"""
-        from datetime import datetime, timedelta
-        from sqlalchemy import func, extract
-        from src.models.product import Product
-        
         # Calcular fecha de inicio
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Query base
-        from sqlalchemy import case
         query = self.session.query(
             func.date(Review.date_created).label('date'),
             func.count(Review.id).label('total_reviews'),
@@ -272,47 +486,99 @@ class DataService:
         results = query.group_by(func.date(Review.date_created)).order_by('date').all()
         
         # Procesar resultados
-        timeline_data = []
-        for result in results:
-            total = result.total_reviews or 0
-            positive = result.positive_count or 0
-            negative = result.negative_count or 0
-            neutral = result.neutral_count or 0
-            
+        return [
+            self.timeline_point(
+                result.date, result.total_reviews, result.avg_rating,
+                result.positive_count, result.negative_count, result.neutral_count
+            )
+            for result in results
+        ]
+    
+    @staticmethod
+    def timeline_point(date, total, avg_rating, positive, negative, neutral) -> Dict[str, Any]:
+        """Un día del timeline: totales y porcentajes de sentimiento"""
+        total = total or 0
+        positive = positive or 0
+        negative = negative or 0
+        neutral = neutral or 0
+        
+        return {
+            "date": date.strftime('%Y-%m-%d'),
+            "total_reviews": total,
+            "avg_rating": float(avg_rating or 0),
             # Calcular porcentajes de sentimiento
-            positive_pct = (positive / total * 100) if total > 0 else 0
-            negative_pct = (negative / total * 100) if total > 0 else 0
-            neutral_pct = (neutral / total * 100) if total > 0 else 0
-            
-            timeline_data.append({
-                "date": result.date.strftime('%Y-%m-%d'),
-                "total_reviews": total,
-                "avg_rating": float(result.avg_rating or 0),
-                "sentiment_positive": positive_pct,
-                "sentiment_negative": negative_pct,
-                "sentiment_neutral": neutral_pct
-            })
-        
-        return timeline_data
+            "sentiment_positive": (positive / total * 100) if total > 0 else 0,
+            "sentiment_negative": (negative / total * 100) if total > 0 else 0,
+            "sentiment_neutral": (neutral / total * 100) if total > 0 else 0
+        }
     
-    def get_recent_reviews(self, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_recent_reviews(self, limit: int = 10, cursor: Optional[ReviewCursor] = None) -> List[Dict[str, Any]]:
         """
         Obtiene las reviews más recientes
         
         Args:
             limit: Número máximo de reviews a retornar
+            cursor: (date_created, id) de la última review de la página anterior
             
         Returns:
             Lista de diccionarios con las reviews más recientes
         """
-        reviews = self.session.query(Review).order_by(desc(Review.date_created)).limit(limit).all()
+        return list(self.iter_recent_reviews(limit, cursor))
+    
+    def iter_recent_reviews(self, limit: int = 10, cursor: Optional[ReviewCursor] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Itera las reviews más recientes sin materializar todo el resultado
+        
+        Usa un cursor del lado del servidor y trae las filas de a 500, así que la
+        memoria no crece con limit.
+        
+        Args:
+            limit: Número máximo de reviews a retornar
+            cursor: (date_created, id) de la última review de la página anterior
+            
+        Yields:
+            Diccionarios con las reviews, de la más reciente a la más antigua
+        """
+        stmt = (
+            select(*REVIEW_READ_COLUMNS)
+            .order_by(desc(Review.date_created), desc(Review.id))
+            .limit(limit)
+            .execution_options(stream_results=True, yield_per=500)
+        )
+        if cursor:
+            stmt = stmt.where(_after_review(cursor))
+        
+        for review in self.session.execute(stmt):
+            yield self.review_to_dict(review)
+    
+    @staticmethod
+    def stream_reviews_stmt(product_id: Optional[str] = None, rating: Optional[int] = None,
+                            sentiment: Optional[str] = None, limit: Optional[int] = None):
+        """
+        Consulta de reviews para recorrer con AsyncSession.stream, de la más reciente a la más antigua
         
-        return [self._review_to_dict(review) for review in reviews]
+        Selecciona columnas (no entidades ORM) para que las filas ya enviadas no
+        queden retenidas en la identity map de la sesión.
+        """
+        stmt = (
+            select(*REVIEW_READ_COLUMNS)
+            .order_by(desc(Review.date_created), desc(Review.id))
+            .execution_options(yield_per=200)
+        )
+        if product_id:
+            stmt = stmt.where(Review.product_id == product_id)
+        if rating:
+            stmt = stmt.where(Review.rate == rating)
+        if sentiment:
+            stmt = stmt.where(Review.sentiment_label == sentiment)
+        if limit:
+            stmt = stmt.limit(limit)
+        return stmt
     
     # ===== MÉTODOS AUXILIARES =====
     
     def _product_to_dict(self, product: Product) -> Dict[str, Any]:
-        """Convierte un objeto Product a diccionario"""
+        """Convierte un objeto Product (o una fila con sus columnas) a diccionario"""
         return {
             "id": product.id,
             "title": product.title,
@@ -328,8 +594,9 @@ class DataService:
             "url": product.ml_additional_info.get("url") if product.ml_additional_info else None
         }
     
-    def _review_to_dict(self, review: Review) -> Dict[str, Any]:
-        """Convierte un objeto Review a diccionario"""
+    @staticmethod
+    def review_to_dict(review: Review) -> Dict[str, Any]:
+        """Convierte un objeto Review (o una fila con sus columnas) a diccionario"""
         return {
             "id": review.id,
             "product_id": review.product_id,
@@ -345,44 +612,130 @@ class DataService:
             "api_review_id": review.api_review_id,
             "date_text": review.date_text,
             "source": review.source,
-            "media": review.media,
-            "raw_json": review.raw_json
+            "media": review.media
         }
 
 
+# ===== CONSULTAS DIRECTAS CON ASYNCPG (POSTGRESQL) =====
+# Los dos caminos de lectura más usados por la web, sin ORM: SQL fijo por combinación de
+# filtros (asyncpg lo prepara y cachea por conexión) y filas decodificadas en C.
+
+_PG_REVIEW_COLUMNS = (
+    "id, product_id, rate, title, content, date_created, reviewer_id, likes, dislikes, "
+    "sentiment_score, sentiment_label, api_review_id, date_text, source, media::text AS media"
+)
+
+_PG_REVIEW_ORDER = {
+    "date_created": "date_created DESC, id DESC",
+    "rate": "rate DESC",
+    "sentiment_score": "sentiment_score DESC",
+}
+
+
+async def pg_reviews_by_product(conn, product_id: str, limit: Optional[int] = None, offset: int = 0,
+                                order_by: str = "date_created",
+                                cursor: Optional[ReviewCursor] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Igual que DataService.get_reviews_by_product(..., require_product=True), sobre una
+    conexión asyncpg
+    
+    Returns:
+        Lista de diccionarios con reviews, o None si el producto no existe
+    """
+    # Sin FK de reviews a products: la existencia del producto se verifica siempre
+    if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM products WHERE id = $1)", product_id):
+        return None
+    
+    sql = f"SELECT {_PG_REVIEW_COLUMNS} FROM reviews WHERE product_id = $1"
+    args: List[Any] = [product_id]
+    if cursor and order_by == "date_created":
+        sql += " AND (date_created, id) < ($2, $3)"
+        args.extend(cursor)
+    sql += f" ORDER BY {_PG_REVIEW_ORDER[order_by]}"
+    if not (cursor and order_by == "date_created") and offset > 0:
+        args.append(offset)
+        sql += f" OFFSET ${len(args)}"
+    if limit:
+        args.append(limit)
+        sql += f" LIMIT ${len(args)}"
+    
+    rows = await conn.fetch(sql, *args)
+    
+    reviews = []
+    for row in rows:
+        review = dict(row)
+        review["date_created"] = review["date_created"].isoformat() if review["date_created"] else None
+        review["media"] = orjson.loads(review["media"]) if review["media"] is not None else None
+        reviews.append(review)
+    return reviews
+
+
+async def pg_reviews_timeline(conn, product_id: Optional[str] = None, days: int = 30,
+                              marca: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Igual que DataService.get_reviews_timeline, sobre una conexión asyncpg"""
+    sql = (
+        "SELECT r.date_created::date AS date, count(*) AS total, avg(r.rate) AS avg_rating, "
+        "count(*) FILTER (WHERE r.sentiment_label = 'positive') AS positive, "
+        "count(*) FILTER (WHERE r.sentiment_label = 'negative') AS negative, "
+        "count(*) FILTER (WHERE r.sentiment_label = 'neutral') AS neutral "
+        "FROM reviews r"
+    )
+    args: List[Any] = [datetime.utcnow() - timedelta(days=days)]
+    if marca:
+        args.append(marca)
+        sql += f" JOIN products p ON p.id = r.product_id AND p.marca = ${len(args)}"
+    sql += " WHERE r.date_created >= $1"
+    if product_id:
+        args.append(product_id)
+        sql += f" AND r.product_id = ${len(args)}"
+    sql += " GROUP BY 1 ORDER BY 1"
+    
+    rows = await conn.fetch(sql, *args)
+    return [DataService.timeline_point(*row) for row in rows]
+
+
 # ===== FUNCIONES DE CONVENIENCIA =====
+# Todas aceptan session=... para reutilizar la sesión del request; sin ella abren una propia.
+
+@contextmanager
+def _data_service(session: Optional[Session]) -> Iterator[DataService]:
+    """DataService sobre la sesión recibida o, si no hay, sobre una sesión nueva"""
+    if session is not None:
+        yield DataService(session)
+        return
+    with get_session() as own_session:
+        yield DataService(own_session)
+
 
-def get_all_products(limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+def get_all_products(limit: Optional[int] = None, offset: int = 0,
+                     after_id: Optional[str] = None, *, session: Optional[Session] = None) -> List[Dict[str, Any]]:
     """Función de conveniencia para obtener todos los productos"""
-    with get_session() as session:
-        service = DataService(session)
-        return service.get_all_products(limit, offset)
+    with _data_service(session) as service:
+        return service.get_all_products(limit, offset, after_id)
 
 
-def get_product_by_id(product_id: str) -> Optional[Dict[str, Any]]:
+def get_product_by_id(product_id: str, *, session: Optional[Session] = None) -> Optional[Dict[str, Any]]:
     """Función de conveniencia para obtener un producto por ID"""
-    with get_session() as session:
-        service = DataService(session)
+    with _data_service(session) as service:
         return service.get_product_by_id(product_id)
 
 
 def get_reviews_by_product(product_id: str, limit: Optional[int] = None, 
-                          offset: int = 0, order_by: str = "date_created") -> List[Dict[str, Any]]:
+                          offset: int = 0, order_by: str = "date_created",
+                          cursor: Optional[ReviewCursor] = None,
+                          *, session: Optional[Session] = None) -> List[Dict[str, Any]]:
     """Función de conveniencia para obtener reviews de un producto"""
-    with get_session() as session:
-        service = DataService(session)
-        return service.get_reviews_by_product(product_id, limit, offset, order_by)
+    with _data_service(session) as service:
+        return service.get_reviews_by_product(product_id, limit, offset, order_by, cursor)
 
 
-def get_products_stats() -> Dict[str, Any]:
+def get_products_stats(*, session: Optional[Session] = None) -> Dict[str, Any]:
     """Función de conveniencia para obtener estadísticas de productos"""
-    with get_session() as session:
-        service = DataService(session)
+    with _data_service(session) as service:
         return service.get_products_stats()
 
 
-def get_reviews_stats(product_id: Optional[str] = None) -> Dict[str, Any]:
+def get_reviews_stats(product_id: Optional[str] = None, *, session: Optional[Session] = None) -> Dict[str, Any]:
     """Función de conveniencia para obtener estadísticas de reviews"""
-    with get_session() as session:
-        service = DataService(session)
+    with _data_service(session) as service:
         return service.get_reviews_stats(product_id)
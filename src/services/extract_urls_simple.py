@@ -1,174 +1,183 @@
 #!/usr/bin/env python3
 """
 Extractor simple de URLs de productos desde páginas de listado de MercadoLibre.
-Usa requests + BeautifulSoup (más ligero que Playwright).
+Usa httpx (páginas en paralelo) + un regex sobre el HTML (más ligero que Playwright).
 
 Uso:
     python src/services/extract_urls_simple.py "https://listado.mercadolibre.com.ar/aires-acondicionados"
 """
 
 import argparse
+import asyncio
+import logging
+import os
+import random
 import re
 import sys
 import time
-from typing import List, Set
-from urllib.parse import urljoin, urlparse
+from typing import BinaryIO, List, Optional, Set, Union
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'es-ES,es;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# IDs de producto (/p/MLA...) en enlaces o JSON embebido; se busca sobre los bytes sin parsear
+PRODUCT_ID_RE = re.compile(rb'/p/([A-Z0-9]{8,})')
+
+# Progreso por página: formateo diferido, solo se emite con --verbose
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Bytes del final de cada chunk que se vuelven a escanear con el siguiente (un ID cortado)
+ID_OVERLAP = 32
+
+
+def product_url(product_id: str) -> str:
+    """URL canónica de un producto a partir de su ID."""
+    return f"https://www.mercadolibre.com.ar/p/{product_id}"
 
 
 class SimpleURLExtractor:
-    def __init__(self, max_pages: int = 5, delay: float = 2.0):
+    POOL_SIZE = 32
+    MAX_RETRIES = 3
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    def __init__(self, max_pages: int = 5, delay: float = 2.0, concurrency: int = 8):
         self.max_pages = max_pages
         self.delay = delay
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
-        self.extracted_urls: Set[str] = set()
+        self.concurrency = max(1, concurrency)
+        # Se deduplica por ID de producto (8-12 caracteres), no por la URL completa
+        self.seen_ids: Set[str] = set()
     
-    def extract_from_url(self, listado_url: str) -> List[str]:
+    def extract_from_url(self, listado_url: str, sink: Optional[BinaryIO] = None) -> List[str]:
         """
         Extrae URLs de productos desde una URL de listado de MercadoLibre.
+        
+        Las páginas del listado se piden en paralelo y se procesan en orden; la
+        extracción termina en la primera página que falla o no aporta URLs nuevas.
+        Devuelve solo las URLs nuevas de este listado; si se pasa `sink`, además se
+        escriben ahí página por página (una por línea).
         """
-        print(f"🔍 Extrayendo URLs desde: {listado_url}")
+        log.info("🔍 Extrayendo URLs desde: %s", listado_url)
+        
+        page_urls = self._build_page_urls(listado_url)
+        pages = asyncio.run(self._fetch_pages(page_urls))
         
         page_num = 1
-        total_extracted = 0
+        listing_urls: List[str] = []
         
-        while page_num <= self.max_pages:
-            print(f"📄 Procesando página {page_num}...")
-            
-            # Construir URL de la página
-            if page_num == 1:
-                current_url = listado_url
-            else:
-                # MercadoLibre usa _Desde para paginación
-                offset = (page_num - 1) * 50  # 50 productos por página
-                if '?' in listado_url:
-                    current_url = f"{listado_url}&_Desde={offset}"
-                else:
-                    current_url = f"{listado_url}?_Desde={offset}"
+        for current_url, found_ids in zip(page_urls, pages):
+            log.info("📄 Procesando página %d: %s", page_num, current_url)
             
-            print(f"   🌐 URL: {current_url}")
+            if isinstance(found_ids, Exception):
+                log.error("   ❌ Error obteniendo página %d: %s", page_num, found_ids)
+                break
             
             try:
-                # Obtener la página
-                response = self.session.get(current_url, timeout=30)
-                response.raise_for_status()
-                
-                # Parsear HTML
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Extraer URLs de productos
-                page_urls = self._extract_product_urls_from_soup(soup, current_url)
-                new_urls = 0
+                log.info("   ✅ %d URLs únicas encontradas en esta página", len(found_ids))
+                fresh_urls = [product_url(product_id) for product_id in sorted(found_ids - self.seen_ids)]
+                self.seen_ids.update(found_ids)
+                new_urls = len(fresh_urls)
                 
-                for url in page_urls:
-                    if url not in self.extracted_urls:
-                        self.extracted_urls.add(url)
-                        new_urls += 1
-                
-                total_extracted += new_urls
-                print(f"   ✅ {new_urls} URLs nuevas encontradas (Total: {len(self.extracted_urls)})")
+                if sink is not None and fresh_urls:
+                    sink.write("".join(f"{url}\n" for url in fresh_urls).encode())
+                listing_urls.extend(fresh_urls)
+                log.info("   ✅ %d URLs nuevas encontradas (Total: %d)", new_urls, len(self.seen_ids))
                 
                 if new_urls == 0:
-                    print("   ⚠️ No se encontraron URLs nuevas. Fin de la extracción.")
+                    log.info("   ⚠️ No se encontraron URLs nuevas. Fin de la extracción.")
                     break
                 
-                # Delay entre requests
-                if page_num < self.max_pages:
-                    print(f"   ⏳ Esperando {self.delay}s antes de la siguiente página...")
-                    time.sleep(self.delay)
-                
                 page_num += 1
                 
-            except requests.RequestException as e:
-                print(f"   ❌ Error obteniendo página {page_num}: {e}")
-                break
             except Exception as e:
-                print(f"   ❌ Error procesando página {page_num}: {e}")
+                log.error("   ❌ Error procesando página %d: %s", page_num, e)
                 break
         
-        print(f"\n🎉 Extracción completada!")
-        print(f"   📊 Total de URLs únicas extraídas: {len(self.extracted_urls)}")
-        print(f"   📄 Páginas procesadas: {page_num - 1}")
+        log.info("🎉 Extracción completada: %d URLs únicas, %d páginas procesadas", len(self.seen_ids), page_num - 1)
         
-        return list(self.extracted_urls)
+        return listing_urls
     
-    def _extract_product_urls_from_soup(self, soup: BeautifulSoup, base_url: str) -> List[str]:
+    def _build_page_urls(self, listado_url: str) -> List[str]:
         """
-        Extrae URLs de productos desde el HTML parseado.
+        Construye las URLs de las max_pages páginas del listado.
         """
-        urls = set()
-        
-        # Buscar enlaces que contengan /p/ (productos)
-        links = soup.find_all('a', href=True)
-        print(f"   📊 Encontrados {len(links)} enlaces totales")
-        
-        for link in links:
-            href = link.get('href')
-            if href and ('/p/' in href or 'MLA' in href):
-                # Limpiar y normalizar la URL
-                clean_url = self._clean_product_url(href, base_url)
-                if clean_url:
-                    urls.add(clean_url)
-        
-        # Buscar también en atributos data o JavaScript
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string:
-                # Buscar URLs en JavaScript
-                js_urls = re.findall(r'https?://[^\s"\']*mercadolibre\.com\.ar/p/[A-Z0-9]+', script.string)
-                for js_url in js_urls:
-                    clean_url = self._clean_product_url(js_url, base_url)
-                    if clean_url:
-                        urls.add(clean_url)
-        
-        print(f"   ✅ {len(urls)} URLs únicas encontradas en esta página")
-        return list(urls)
+        page_urls = [listado_url]
+        for page_num in range(2, self.max_pages + 1):
+            # MercadoLibre usa _Desde para paginación
+            offset = (page_num - 1) * 50  # 50 productos por página
+            separator = '&' if '?' in listado_url else '?'
+            page_urls.append(f"{listado_url}{separator}_Desde={offset}")
+        return page_urls
     
-    def _clean_product_url(self, url: str, base_url: str) -> str:
-        """
-        Limpia y normaliza una URL de producto.
+    async def _fetch_pages(self, page_urls: List[str]) -> List[Union[Set[str], Exception]]:
         """
-        if not url:
-            return None
+        Descarga las páginas en paralelo (hasta `concurrency` a la vez).
         
-        # Convertir URL relativa a absoluta si es necesario
-        if url.startswith('/'):
-            url = urljoin(base_url, url)
-        elif not url.startswith('http'):
-            url = urljoin(base_url, url)
-        
-        # Remover fragmentos y parámetros innecesarios
-        parsed = urlparse(url)
-        
-        # Verificar que sea una URL de MercadoLibre
-        if 'mercadolibre.com.ar' not in parsed.netloc:
-            return None
-        
-        # Verificar que tenga un ID de producto
-        if '/p/' not in parsed.path:
-            return None
-        
-        # Extraer el ID del producto
-        product_id_match = re.search(r'/p/([A-Z0-9]+)', parsed.path)
-        if not product_id_match:
-            return None
-        
-        product_id = product_id_match.group(1)
-        
-        # Construir URL limpia
-        clean_url = f"https://www.mercadolibre.com.ar/p/{product_id}"
+        Devuelve los IDs de producto de cada página, o la excepción si falló, en el mismo orden.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def fetch(client: httpx.AsyncClient, url: str) -> Set[str]:
+            async with semaphore:
+                for attempt in range(self.MAX_RETRIES + 1):
+                    async with client.stream("GET", url) as response:
+                        if response.status_code not in self.RETRY_STATUSES or attempt == self.MAX_RETRIES:
+                            response.raise_for_status()
+                            product_ids = await self._read_product_ids(response)
+                            break
+                    # Backoff exponencial (0.5s, 1s, 2s) ante 429/5xx
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+                # Pausa aleatoria dentro del semáforo para no castigar al sitio
+                if self.delay > 0:
+                    await asyncio.sleep(random.uniform(0, self.delay))
+                return product_ids
+        
+        # Pool de conexiones keep-alive; el transporte reintenta errores de conexión
+        limits = httpx.Limits(max_connections=self.POOL_SIZE, max_keepalive_connections=self.POOL_SIZE)
+        transport = httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=self.MAX_RETRIES)
+        async with httpx.AsyncClient(
+            headers=HEADERS,
+            http2=True,
+            follow_redirects=True,
+            timeout=30.0,
+            transport=transport
+        ) as client:
+            return await asyncio.gather(*(fetch(client, url) for url in page_urls), return_exceptions=True)
+    
+    @staticmethod
+    async def _read_product_ids(response: httpx.Response) -> Set[str]:
+        """
+        Extrae los IDs de productos del HTML a medida que llega, sin armar el body completo.
         
-        return clean_url
+        Un solo regex sobre los bytes de cada chunk (ya descomprimido) encuentra los
+        /p/<ID> tanto en enlaces como en el JavaScript embebido, sin construir el DOM.
+        Los últimos ID_OVERLAP bytes se reescanean junto con el chunk siguiente.
+        """
+        product_ids: Set[str] = set()
+        tail = b""
+        async for chunk in response.aiter_bytes(65536):
+            buffer = tail + chunk
+            keep_from = max(len(buffer) - ID_OVERLAP, 0)
+            for match in PRODUCT_ID_RE.finditer(buffer):
+                if match.start() >= keep_from:
+                    # Queda en el solapamiento: se encuentra con el próximo chunk
+                    break
+                if match.end() == len(buffer):
+                    # El ID puede seguir en el próximo chunk
+                    keep_from = match.start()
+                    break
+                product_ids.add(match.group(1).decode())
+            tail = buffer[keep_from:]
+        product_ids.update(match.group(1).decode() for match in PRODUCT_ID_RE.finditer(tail))
+        return product_ids
 
 
 def main():
@@ -177,15 +186,18 @@ def main():
     parser.add_argument('--urls-file', help='Archivo con URLs de listados (una por línea)')
     parser.add_argument('--max-pages', type=int, default=5, help='Número máximo de páginas a procesar')
     parser.add_argument('--output', '-o', default='extracted_urls_simple.txt', help='Archivo de salida')
-    parser.add_argument('--delay', type=float, default=2.0, help='Delay entre requests (segundos)')
+    parser.add_argument('--delay', type=float, default=2.0, help='Delay máximo (aleatorio) tras cada request, en segundos')
+    parser.add_argument('--concurrency', type=int, default=8, help='Páginas descargadas en paralelo')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Mostrar el progreso página por página')
     
     args = parser.parse_args()
+    logging.basicConfig(format='%(message)s', level=logging.INFO if args.verbose else logging.WARNING)
     
     if not args.url and not args.urls_file:
         parser.print_help()
         return
     
-    extractor = SimpleURLExtractor(max_pages=args.max_pages, delay=args.delay)
+    extractor = SimpleURLExtractor(max_pages=args.max_pages, delay=args.delay, concurrency=args.concurrency)
     
     if args.urls_file:
         # Procesar múltiples URLs desde archivo
@@ -195,43 +207,38 @@ def main():
         except FileNotFoundError:
             print(f"❌ Archivo no encontrado: {args.urls_file}")
             return
-        
-        all_urls = set()
+    else:
+        # Procesar una sola URL
+        listado_urls = [args.url]
+    
+    # Las URLs se escriben a medida que aparecen: en memoria quedan solo los IDs vistos
+    examples: List[str] = []
+    with open(args.output, 'wb') as output:
         for i, listado_url in enumerate(listado_urls, 1):
-            print(f"\n{'='*60}")
-            print(f"📋 Procesando listado {i}/{len(listado_urls)}")
-            print(f"{'='*60}")
+            if len(listado_urls) > 1:
+                log.info("📋 Procesando listado %d/%d", i, len(listado_urls))
             
-            urls = extractor.extract_from_url(listado_url)
-            all_urls.update(urls)
+            urls = extractor.extract_from_url(listado_url, sink=output)
+            examples.extend(urls[:5 - len(examples)])
             
             # Pequeña pausa entre extracciones
             if i < len(listado_urls):
                 time.sleep(2)
-        
-        urls = list(all_urls)
-    else:
-        # Procesar una sola URL
-        urls = extractor.extract_from_url(args.url)
     
-    # Guardar resultados
-    if urls:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            for url in sorted(urls):
-                f.write(f"{url}\n")
-        
-        print(f"\n💾 {len(urls)} URLs guardadas en: {args.output}")
+    total = len(extractor.seen_ids)
+    if total:
+        print(f"\n💾 {total} URLs guardadas en: {args.output}")
         
         # Mostrar algunas URLs de ejemplo
         print(f"\n📋 Ejemplos de URLs extraídas:")
-        for i, url in enumerate(sorted(urls)[:5], 1):
+        for i, url in enumerate(examples, 1):
             print(f"   {i}. {url}")
         
-        if len(urls) > 5:
-            print(f"   ... y {len(urls) - 5} más")
+        if total > len(examples):
+            print(f"   ... y {total - len(examples)} más")
     else:
+        os.remove(args.output)
         print("❌ No se extrajeron URLs")
 
-
 if __name__ == "__main__":
     main()
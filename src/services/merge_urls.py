@@ -7,42 +7,64 @@ Uso:
 """
 
 import argparse
+import mmap
 import re
-from typing import Set
+from typing import Dict, List, Optional, Tuple
 
 
-def extract_product_id(url: str) -> str:
+PRODUCT_ID_RE = re.compile(r'/p/([A-Z0-9]+)')
+BARE_ID_RE = re.compile(r'[A-Z0-9]+')
+
+# Primer token de cada línea: se saltean las vacías y los comentarios ('#'), y lo que
+# sigue a '#' es fragmento
+_LINE_TOKEN_RE = re.compile(rb'^[ \t]*([^\s#]+)', re.MULTILINE)
+
+SITE_URL = "https://www.mercadolibre.com.ar"
+
+
+def extract_product_id(url: str) -> Optional[str]:
     """
     Extrae el ID del producto de una URL de MercadoLibre.
     """
-    match = re.search(r'/p/([A-Z0-9]+)', url)
+    match = PRODUCT_ID_RE.search(url)
     return match.group(1) if match else None
 
 
-def load_urls_from_file(filename: str) -> Set[str]:
+def load_urls_from_file(filename: str) -> Tuple[Dict[str, str], List[str]]:
     """
-    Carga URLs desde un archivo y las normaliza.
+    Carga las URLs de un archivo, agrupadas por ID de producto.
+    
+    El archivo se mapea en memoria y un regex sobre los bytes encuentra el primer token
+    de cada línea, sin strip/startswith por línea en Python. Las rutas relativas y los
+    IDs sueltos se completan como URLs de MercadoLibre.
+    
+    Returns:
+        ({ID: primera URL original con ese ID}, líneas sin ID de producto, sin cambios)
     """
-    urls = set()
+    urls_by_id: Dict[str, str] = {}
+    other_lines: List[str] = []
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line in f:
-                url = line.strip()
-                if url and not url.startswith('#'):
-                    # Normalizar URL
+        with open(filename, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Archivo vacío: no se puede mapear
+                return urls_by_id, other_lines
+            with data:
+                for match in _LINE_TOKEN_RE.finditer(data):
+                    url = match.group(1).decode('utf-8')
                     if url.startswith('/'):
-                        url = f"https://www.mercadolibre.com.ar{url}"
-                    elif not url.startswith('http'):
-                        url = f"https://www.mercadolibre.com.ar/p/{url}"
-                    
-                    # Limpiar fragmentos
-                    url = url.split('#')[0]
-                    
-                    urls.add(url)
+                        url = f"{SITE_URL}{url}"
+                    elif BARE_ID_RE.fullmatch(url):
+                        url = f"{SITE_URL}/p/{url}"
+                    product_id = extract_product_id(url)
+                    if product_id is None:
+                        other_lines.append(url)
+                    else:
+                        urls_by_id.setdefault(product_id, url)
     except FileNotFoundError:
         print(f"⚠️ Archivo no encontrado: {filename}")
-    
-    return urls
+    return urls_by_id, other_lines
 
 
 def main():
@@ -56,45 +78,43 @@ def main():
     
     # Cargar URLs
     print("📂 Cargando URLs...")
-    new_urls = load_urls_from_file(args.input)
-    print(f"   ✅ {len(new_urls)} URLs cargadas desde {args.input}")
+    new_by_id, new_other = load_urls_from_file(args.input)
+    print(f"   ✅ {len(new_by_id)} productos (+{len(new_other)} otras URLs) cargados desde {args.input}")
     
-    existing_urls = set()
+    existing_by_id: Dict[str, str] = {}
+    existing_other: List[str] = []
     if args.existing:
-        existing_urls = load_urls_from_file(args.existing)
-        print(f"   ✅ {len(existing_urls)} URLs cargadas desde {args.existing}")
-    
-    # Combinar y eliminar duplicados
-    all_urls = new_urls.union(existing_urls)
+        existing_by_id, existing_other = load_urls_from_file(args.existing)
+        print(f"   ✅ {len(existing_by_id)} productos (+{len(existing_other)} otras URLs) cargados desde {args.existing}")
     
-    # Eliminar duplicados por ID de producto
-    unique_urls = set()
-    seen_ids = set()
-    
-    for url in all_urls:
-        product_id = extract_product_id(url)
-        if product_id and product_id not in seen_ids:
-            unique_urls.add(url)
-            seen_ids.add(product_id)
+    # Combinar y eliminar duplicados por ID de producto: queda la primera URL vista
+    # (conserva slug y dominio del sitio); las URLs sin ID pasan tal cual
+    merged_by_id = dict(new_by_id)
+    for product_id, url in existing_by_id.items():
+        merged_by_id.setdefault(product_id, url)
+    total_ids = len(new_by_id) + len(existing_by_id)
+    other_urls = list(dict.fromkeys(new_other + existing_other))
+    unique_urls = sorted(merged_by_id.values()) + other_urls
     
     # Guardar resultado
     with open(args.output, 'w', encoding='utf-8') as f:
-        for url in sorted(unique_urls):
+        for url in unique_urls:
             f.write(f"{url}\n")
     
     # Estadísticas
     print(f"\n📊 Estadísticas:")
-    print(f"   📄 URLs nuevas: {len(new_urls)}")
-    print(f"   📄 URLs existentes: {len(existing_urls)}")
-    print(f"   📄 Total combinadas: {len(all_urls)}")
-    print(f"   📄 URLs únicas (por ID): {len(unique_urls)}")
-    print(f"   📄 Duplicados eliminados: {len(all_urls) - len(unique_urls)}")
+    print(f"   📄 Productos nuevos: {len(new_by_id)}")
+    print(f"   📄 Productos existentes: {len(existing_by_id)}")
+    print(f"   📄 IDs combinados (con repetidos): {total_ids}")
+    print(f"   📄 URLs únicas (por ID): {len(merged_by_id)}")
+    print(f"   📄 Duplicados eliminados: {total_ids - len(merged_by_id)}")
+    print(f"   📄 Otras URLs (sin ID, sin cambios): {len(other_urls)}")
     print(f"   💾 Guardadas en: {args.output}")
     
     # Mostrar ejemplos
     if unique_urls:
         print(f"\n📋 Ejemplos de URLs combinadas:")
-        for i, url in enumerate(sorted(unique_urls)[:5], 1):
+        for i, url in enumerate(unique_urls[:5], 1):
             print(f"   {i}. {url}")
         
         if len(unique_urls) > 5:
@@ -103,4 +123,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -4,15 +4,20 @@ Script para reprocesar productos que fallaron en la extracción.
 """
 
 import asyncio
+import random
+import re
 import sys
 import os
-from typing import List, Dict, Any
-from playwright.async_api import async_playwright
+from typing import List, Dict, Any, Set
+import httpx
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from selectolax.parser import HTMLParser
 
 # Agregar el directorio src al path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from models.database import get_session, init_db
+from api.rate_limiter import AsyncRateLimiter
+from models.database import dialect_insert, get_session, init_db
 from models.product import Product
 
 
@@ -30,12 +35,56 @@ FAILED_URLS = [
     "https://www.mercadolibre.com.ar/p/MLA54142126",
 ]
 
+PRODUCT_ID_RE = re.compile(r'/p/([A-Z0-9]+)')
 
-async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
-    """
-    Extrae información de producto con el JavaScript corregido.
-    """
-    product_data = {
+# Páginas procesadas en paralelo sobre el mismo browser
+CONCURRENCY = 8
+
+# Productos acumulados por commit: un fsync por lote en lugar de uno por fila
+BATCH_SIZE = 50
+
+# Reintentos ante errores transitorios (timeouts, 429/5xx): backoff exponencial con jitter
+MAX_ATTEMPTS = 4
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 15.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Tope de requests por segundo entre todos los workers
+MAX_REQUESTS_PER_SECOND = 4.0
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+
+TITLE_SELECTORS = [
+    'h1[data-testid="product-title"]',
+    'h1.ui-pdp-title',
+    '.ui-pdp-title',
+    'h1',
+]
+
+PRICE_SELECTORS = [
+    '.ui-pdp-price .andes-money-amount__fraction',
+    '.ui-pdp-price .andes-money-amount',
+    '.ui-pdp-price',
+    '[data-testid="price"]',
+    '.price-tag-fraction',
+    '.andes-money-amount__fraction',
+]
+
+# Marcas conocidas
+MARCAS = ['lg', 'samsung', 'bgh', 'philco', 'electra', 'midea', 'sansei', 'candy', 'comfee', 'siam', 'hyundai', 'hisense', 'surrey', 'daihatsu', 'conqueror', 'likon']
+
+# Una sola pasada sobre el título encuentra la marca y dónde empieza el modelo
+MARCA_RE = re.compile(r'\b(' + '|'.join(MARCAS) + r')\b', re.IGNORECASE)
+
+NON_DIGITS_RE = re.compile(r'[^\d]')
+
+
+def _backoff_delay(attempt: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** (attempt - 1)) + random.uniform(0, 1)
+
+
+def _empty_product_data() -> Dict[str, Any]:
+    return {
         "id": "",
         "title": "",
         "price": 0.0,
@@ -43,28 +92,124 @@ async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
         "modelo": "",
         "success": False
     }
+
+
+def _extract_brand_and_model(product_data: Dict[str, Any]) -> None:
+    """
+    Completa marca y modelo a partir del título.
+    
+    Marca: la primera marca conocida que aparece como palabra en el título (o su
+    primera palabra); modelo: las cinco palabras que siguen a la marca.
+    """
+    title = product_data["title"].lower()
+    match = MARCA_RE.search(title)
+    if match:
+        product_data["marca"] = match.group(1).upper()
+        product_data["modelo"] = " ".join(title[match.end():].split()[:5])
+        return
+    
+    # Si no se encontró marca conocida, usar fallback
+    words = product_data["title"].split(" ")
+    if words:
+        product_data["marca"] = words[0].upper()
+
+
+def _report(product_data: Dict[str, Any]) -> None:
+    if product_data["title"]:
+        print(f"✅ Título: {product_data['title'][:60]}...")
+    if product_data["price"] > 0:
+        print(f"✅ Precio: ${product_data['price']:,.2f}")
+    if product_data["marca"]:
+        print(f"✅ Marca: {product_data['marca']}")
+    if product_data["modelo"]:
+        print(f"✅ Modelo: {product_data['modelo']}")
+
+
+async def extract_product_http(client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+    """
+    Extrae información de producto con un GET y el parser de selectolax, sin browser.
+    
+    Devuelve success=False si la respuesta no trae un título válido (p.ej. una página
+    de challenge), para que el llamador reintente con Playwright.
+    """
+    product_data = _empty_product_data()
     
     try:
         print(f"🔍 Accediendo a: {url}")
+        response = await client.get(url)
+        if response.status_code != 200:
+            product_data["error"] = f"Error HTTP: {response.status_code}"
+            product_data["retryable"] = response.status_code in RETRY_STATUSES
+            return product_data
+        
+        id_match = PRODUCT_ID_RE.search(url)
+        if id_match:
+            product_data["id"] = id_match.group(1)
+        
+        tree = HTMLParser(response.content)
+        
+        # Título: meta tag primero (más rápido), luego el DOM
+        title = ""
+        meta = tree.css_first('meta[property="og:title"]')
+        if meta is not None:
+            title = meta.attributes.get("content") or ""
+        if not title:
+            for selector in TITLE_SELECTORS:
+                node = tree.css_first(selector)
+                text = node.text().strip() if node is not None else ""
+                if len(text) > 10:
+                    title = text
+                    break
+        if not title:
+            product_data["error"] = "Título no encontrado en el HTML"
+            return product_data
+        product_data["title"] = title
+        
+        for selector in PRICE_SELECTORS:
+            node = tree.css_first(selector)
+            numbers = NON_DIGITS_RE.sub('', node.text()) if node is not None else ""
+            if len(numbers) > 2:
+                product_data["price"] = int(numbers)
+                break
+        
+        _extract_brand_and_model(product_data)
+        _report(product_data)
+        product_data["success"] = True
+        
+    except httpx.TransportError as e:
+        # Timeouts y errores de conexión: vale la pena reintentar
+        product_data["error"] = str(e)
+        product_data["retryable"] = True
+    except Exception as e:
+        product_data["error"] = str(e)
+    
+    return product_data
+
+
+async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
+    """
+    Extrae información de producto renderizando la página con Playwright.
+    """
+    product_data = _empty_product_data()
+    
+    try:
+        print(f"🔍 Accediendo con browser a: {url}")
         
         # Navegar con timeout corto
         await page.goto(url, wait_until="domcontentloaded", timeout=10000)
         
         # Extraer ID del producto desde la URL
-        import re
-        id_match = re.search(r'/p/([A-Z0-9]+)', url)
+        id_match = PRODUCT_ID_RE.search(url)
         if id_match:
             product_data["id"] = id_match.group(1)
             print(f"✅ ID: {product_data['id']}")
         
-        # Extraer datos usando JavaScript corregido
+        # Título y precio en el browser; marca y modelo se derivan en Python
         data = await page.evaluate('''
-            () => {
+            ({titleSelectors, priceSelectors}) => {
                 const result = {
                     title: "",
-                    price: 0,
-                    marca: "",
-                    modelo: ""
+                    price: 0
                 };
                 
                 // Buscar título en meta tags primero (más rápido)
@@ -75,13 +220,6 @@ async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
                 
                 // Si no hay meta title, buscar en el DOM
                 if (!result.title) {
-                    const titleSelectors = [
-                        'h1[data-testid="product-title"]',
-                        'h1.ui-pdp-title',
-                        '.ui-pdp-title',
-                        'h1'
-                    ];
-                    
                     for (let selector of titleSelectors) {
                         const el = document.querySelector(selector);
                         if (el && el.textContent && el.textContent.trim().length > 10) {
@@ -92,15 +230,6 @@ async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
                 }
                 
                 // Buscar precio
-                const priceSelectors = [
-                    '.ui-pdp-price .andes-money-amount__fraction',
-                    '.ui-pdp-price .andes-money-amount',
-                    '.ui-pdp-price',
-                    '[data-testid="price"]',
-                    '.price-tag-fraction',
-                    '.andes-money-amount__fraction'
-                ];
-                
                 for (let selector of priceSelectors) {
                     const el = document.querySelector(selector);
                     if (el && el.textContent) {
@@ -113,52 +242,22 @@ async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
                     }
                 }
                 
-                // Extraer marca y modelo del título
-                if (result.title) {
-                    const title = result.title.toLowerCase();
-                    
-                    // Buscar marca conocida
-                    const marcas = ['lg', 'samsung', 'bgh', 'philco', 'electra', 'midea', 'sansei', 'candy', 'comfee', 'siam', 'hyundai', 'hisense', 'surrey', 'daihatsu', 'conqueror', 'likon'];
-                    for (let marca of marcas) {
-                        if (title.includes(marca)) {
-                            result.marca = marca.toUpperCase();
-                            
-                            // Extraer modelo (texto después de la marca) - CORREGIDO
-                            const marcaIndex = title.indexOf(marca);
-                            const afterMarca = title.substring(marcaIndex + marca.length).trim();
-                            const words = afterMarca.split(' ').slice(0, 5); // Primeras 5 palabras
-                            result.modelo = words.join(' ').trim(); // CORREGIDO: join(' ') en lugar de join()
-                            break;
-                        }
-                    }
-                    
-                    // Si no se encontró marca conocida, usar fallback
-                    if (!result.marca) {
-                        const words = result.title.split(' ');
-                        if (words.length > 0) {
-                            result.marca = words[0].toUpperCase();
-                        }
-                    }
-                }
-                
                 return result;
             }
-        ''')
+        ''', {"titleSelectors": TITLE_SELECTORS, "priceSelectors": PRICE_SELECTORS})
         
         # Actualizar datos del producto
         product_data.update(data)
-        
         if product_data["title"]:
-            print(f"✅ Título: {product_data['title'][:60]}...")
-        if product_data["price"] > 0:
-            print(f"✅ Precio: ${product_data['price']:,.2f}")
-        if product_data["marca"]:
-            print(f"✅ Marca: {product_data['marca']}")
-        if product_data["modelo"]:
-            print(f"✅ Modelo: {product_data['modelo']}")
+            _extract_brand_and_model(product_data)
+        _report(product_data)
         
         product_data["success"] = True
         
+    except PlaywrightTimeoutError as e:
+        print(f"❌ Timeout: {e}")
+        product_data["error"] = str(e)
+        product_data["retryable"] = True
     except Exception as e:
         print(f"❌ Error: {e}")
         product_data["error"] = str(e)
@@ -166,72 +265,179 @@ async def extract_product_fixed(page, url: str) -> Dict[str, Any]:
     return product_data
 
 
-async def retry_failed_products():
+def _existing_product_ids(product_ids: List[str]) -> Set[str]:
+    # Una sola consulta IN (...) en lugar de un SELECT por URL
+    with get_session() as session:
+        return {row[0] for row in session.query(Product.id).filter(Product.id.in_(product_ids))}
+
+
+def _urls_by_product_id(urls: List[str]) -> Dict[str, str]:
+    """
+    Asocia cada ID de producto con su primera URL, descartando URLs repetidas o sin ID.
+    """
+    urls_by_id: Dict[str, str] = {}
+    for url in urls:
+        id_match = PRODUCT_ID_RE.search(url)
+        if id_match:
+            urls_by_id.setdefault(id_match.group(1), url)
+        else:
+            print(f"⚠️ URL sin ID de producto: {url}")
+    return urls_by_id
+
+
+def _product_row(product_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": product_data["id"],
+        "title": product_data["title"],
+        "price": float(product_data["price"]),
+        "marca": product_data["marca"],
+        "modelo": product_data["modelo"],
+        "site_id": "MLA",
+        "currency_id": "ARS",
+    }
+
+
+def _save_products(rows: List[Dict[str, Any]]) -> int:
+    """
+    Inserta el lote con INSERT ... ON CONFLICT (id) DO NOTHING
+    
+    Un producto insertado por otro proceso después del chequeo inicial se saltea sin
+    deshacer el resto del lote. Devuelve cuántos se insertaron.
+    """
+    # Deduplicar por id: un mismo INSERT no puede tocar dos veces la misma fila
+    rows_by_id = {row["id"]: row for row in rows}
+    # get_session hace un único commit al salir del bloque
+    with get_session() as session:
+        stmt = (
+            dialect_insert(session, Product)
+            .values(list(rows_by_id.values()))
+            .on_conflict_do_nothing(index_elements=[Product.id])
+            .returning(Product.id)
+        )
+        return len(session.scalars(stmt).all())
+
+
+async def retry_failed_products(concurrency: int = CONCURRENCY):
     """
     Reprocesa los productos que fallaron.
+    
+    Cada URL se intenta primero con un GET + parseo del HTML y solo si eso falla se
+    renderiza con Playwright. Hasta `concurrency` URLs se procesan a la vez;
+    las consultas a la DB (síncronas) corren en threads para no frenar el event loop.
+    Los productos extraídos se guardan en lotes de `BATCH_SIZE` con un solo commit.
     """
     print(f"🚀 Reprocesando {len(FAILED_URLS)} productos que fallaron...")
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
+    # Deduplicar por ID y descartar de entrada los que ya están en la base de datos
+    urls_by_id = _urls_by_product_id(FAILED_URLS)
+    existing_ids = await asyncio.to_thread(_existing_product_ids, list(urls_by_id))
+    for product_id in sorted(existing_ids):
+        print(f"⚠️ Producto {product_id} ya existe. Saltando...")
+    urls_to_crawl = [url for product_id, url in urls_by_id.items() if product_id not in existing_ids]
+    if not urls_to_crawl:
+        print("✅ No quedan productos por reprocesar")
+        return
+    
+    async with httpx.AsyncClient(
+        http2=True,
+        headers={"User-Agent": USER_AGENT},
+        follow_redirects=True,
+        timeout=30.0
+    ) as client, async_playwright() as p:
+        # El browser se lanza solo si alguna URL necesita el fallback con Playwright
+        browser = None
+        context = None
+        browser_lock = asyncio.Lock()
         
-        # Crear context con configuración optimizada
-        context = await browser.new_context(
-            viewport={"width": 1280, "height": 720},
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-        )
+        async def get_context():
+            nonlocal browser, context
+            async with browser_lock:
+                if context is None:
+                    browser = await p.chromium.launch(headless=True)
+                    context = await browser.new_context(
+                        viewport={"width": 1280, "height": 720},
+                        user_agent=USER_AGENT
+                    )
+            return context
         
-        successful = 0
-        failed = 0
+        stats = {"successful": 0, "failed": 0}
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        pending: List[Dict[str, Any]] = []
         
-        for url in FAILED_URLS:
-            page = await context.new_page()
+        async def flush() -> None:
+            # Se toma el lote antes del await para que otros workers sigan acumulando
+            batch = pending[:]
+            pending.clear()
+            if not batch:
+                return
             try:
-                # Verificar si ya existe en la base de datos
-                import re
-                id_match = re.search(r'/p/([A-Z0-9]+)', url)
-                if id_match:
-                    product_id = id_match.group(1)
-                    with get_session() as session:
-                        existing = session.query(Product).filter(Product.id == product_id).first()
-                        if existing:
-                            print(f"⚠️ Producto {product_id} ya existe. Saltando...")
-                            continue
-                
-                # Extraer datos del producto
-                product_data = await extract_product_fixed(page, url)
-                
-                if product_data["success"] and product_data["id"]:
-                    # Guardar en la base de datos
-                    with get_session() as session:
-                        product = Product(
-                            id=product_data["id"],
-                            title=product_data["title"],
-                            price=float(product_data["price"]),
-                            marca=product_data["marca"],
-                            modelo=product_data["modelo"],
-                            site_id="MLA",
-                            currency_id="ARS"
-                        )
-                        session.add(product)
-                        session.commit()
-                        print(f"✅ Producto {product_data['id']} guardado en la DB")
-                        successful += 1
-                else:
-                    print(f"❌ Falló: {product_data.get('error', 'Error desconocido')}")
-                    failed += 1
-                    
+                inserted = await asyncio.to_thread(_save_products, batch)
+                print(f"💾 {inserted} productos guardados en la DB")
+                stats["successful"] += len(batch)
             except Exception as e:
-                print(f"❌ Error procesando {url}: {e}")
-                failed += 1
+                print(f"❌ Error guardando lote de {len(batch)} productos: {e}")
+                stats["failed"] += len(batch)
+        
+        # Compartido entre workers: espacia las requests para no superar MAX_REQUESTS_PER_SECOND
+        rate_limiter = AsyncRateLimiter(min_delay_seconds=1.0 / MAX_REQUESTS_PER_SECOND)
+        
+        async def extract_once(url: str) -> Dict[str, Any]:
+            await rate_limiter.acquire()
+            product_data = await extract_product_http(client, url)
+            if product_data["success"]:
+                return product_data
+            if product_data.get("retryable"):
+                # 429/5xx o timeout: el sitio está limitando; el browser contra el mismo host
+                # solo duplicaría la carga. Se vuelve a extract(), que espera con backoff
+                return product_data
+            print(f"↪️  HTML sin datos suficientes ({product_data['error']}), usando browser: {url}")
+            page = await (await get_context()).new_page()
+            try:
+                await rate_limiter.acquire()
+                return await extract_product_fixed(page, url)
             finally:
                 await page.close()
         
-        await browser.close()
+        async def extract(url: str) -> Dict[str, Any]:
+            for attempt in range(MAX_ATTEMPTS):
+                if attempt:
+                    delay = _backoff_delay(attempt)
+                    print(f"🔁 Reintento {attempt}/{MAX_ATTEMPTS - 1} en {delay:.1f}s: {url}")
+                    await asyncio.sleep(delay)
+                product_data = await extract_once(url)
+                if product_data["success"] or not product_data.get("retryable"):
+                    break
+            return product_data
+        
+        async def worker(url: str) -> None:
+            async with semaphore:
+                try:
+                    # Extraer datos del producto
+                    product_data = await extract(url)
+                    
+                    if product_data["success"] and product_data["id"]:
+                        # Acumular para el próximo commit por lotes
+                        pending.append(_product_row(product_data))
+                        if len(pending) >= BATCH_SIZE:
+                            await flush()
+                    else:
+                        print(f"❌ Falló: {product_data.get('error', 'Error desconocido')}")
+                        stats["failed"] += 1
+                        
+                except Exception as e:
+                    print(f"❌ Error procesando {url}: {e}")
+                    stats["failed"] += 1
+        
+        try:
+            await asyncio.gather(*(worker(url) for url in urls_to_crawl))
+        finally:
+            await flush()
+            if browser is not None:
+                await browser.close()
         
         print(f"\n📊 Estadísticas del retry:")
-        print(f"   ✅ Exitosos: {successful}")
-        print(f"   ❌ Fallidos: {failed}")
+        print(f"   ✅ Exitosos: {stats['successful']}")
+        print(f"   ❌ Fallidos: {stats['failed']}")
         print(f"   📄 Total: {len(FAILED_URLS)}")
 
 
@@ -1,43 +1,157 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple, TypeVar
 
+import ciso8601
+import httpx
+from sqlalchemy import case, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from src.api.ml_client import MercadoLibreClient
-from src.models.review import Review
+from src.models.database import dialect_insert
+from src.models.review import REVIEW_READ_COLUMNS, Review
+from src.models.review_raw import ReviewRaw
 from src.models.product import Product
 
 
+# Product ids known to be stored, shared by every service instance in the process.
+# Only ids are kept (never ORM instances), so nothing is tied to a closed session.
+_KNOWN_PRODUCTS_TTL = 300.0
+_KNOWN_PRODUCTS_MAX = 10_000
+_known_products: "OrderedDict[str, float]" = OrderedDict()
+_known_products_lock = threading.Lock()
+
+
+def _is_known_product(item_id: str) -> bool:
+    with _known_products_lock:
+        expires_at = _known_products.get(item_id)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del _known_products[item_id]
+            return False
+        return True
+
+
+def _remember_product(item_id: str) -> None:
+    with _known_products_lock:
+        _known_products[item_id] = time.monotonic() + _KNOWN_PRODUCTS_TTL
+        _known_products.move_to_end(item_id)
+        while len(_known_products) > _KNOWN_PRODUCTS_MAX:
+            _known_products.popitem(last=False)
+
+
+# Ids the API answered 404 for: short negative cache so repeated lookups skip the call
+_MISSING_PRODUCTS_TTL = 60.0
+_MISSING_PRODUCTS_MAX = 10_000
+_missing_products: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _is_missing_product(item_id: str) -> bool:
+    expires_at = _missing_products.get(item_id)
+    if expires_at is None:
+        return False
+    if expires_at < time.monotonic():
+        del _missing_products[item_id]
+        return False
+    return True
+
+
+def _remember_missing_product(item_id: str) -> None:
+    _missing_products[item_id] = time.monotonic() + _MISSING_PRODUCTS_TTL
+    _missing_products.move_to_end(item_id)
+    while len(_missing_products) > _MISSING_PRODUCTS_MAX:
+        _missing_products.popitem(last=False)
+
+
+class ProductNotFoundError(LookupError):
+    """The MercadoLibre API has no item with this id."""
+
+
+T = TypeVar("T")
+
+
 class ReviewCacheService:
     def __init__(self, client: MercadoLibreClient) -> None:
         self.client = client
+        # API calls in flight per key (async path): concurrent callers share one request
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def _single_flight(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: a caller that gets cancelled does not cancel the others' request
+        return await asyncio.shield(future)
+
+    def ensure_product(self, db: Session, item_id: str) -> None:
+        """Makes sure the product row exists; skips the DB entirely for recently seen ids."""
+        if not _is_known_product(item_id):
+            self.get_or_fetch_product(db, item_id)
 
     def get_or_fetch_product(self, db: Session, item_id: str, site_id_hint: str | None = None, title_hint: str | None = None) -> Product:
         prod = db.get(Product, item_id)
         if prod is not None:
+            _remember_product(item_id)
             return prod
         data = self.client.get_product_info(item_id)
-        prod = Product(
-            id=data.get("id", item_id),
-            title=(data.get("title") or title_hint or f"Item {item_id}"),
-            price=float(data.get("price") or 0.0),
-            site_id=(data.get("site_id") or site_id_hint or "MLA"),
-            currency_id=data.get("currency_id", "ARS"),
-            sold_quantity=int(data.get("sold_quantity") or 0),
-            available_quantity=int(data.get("available_quantity") or 0),
-            marca=data.get("marca", ""),
-            modelo=data.get("modelo", ""),
-            caracteristicas=data.get("caracteristicas"),
+        return self._upsert_product(db, item_id, data, site_id_hint, title_hint)
+
+    async def aensure_product(self, session: AsyncSession, item_id: str) -> None:
+        if not _is_known_product(item_id):
+            await self.aget_or_fetch_product(session, item_id)
+
+    async def aget_or_fetch_product(self, session: AsyncSession, item_id: str, site_id_hint: str | None = None, title_hint: str | None = None) -> Product:
+        """Async variant: the API call awaits the shared httpx client instead of blocking."""
+        prod = await session.get(Product, item_id)
+        if prod is not None:
+            _remember_product(item_id)
+            return prod
+        if _is_missing_product(item_id):
+            raise ProductNotFoundError(item_id)
+        try:
+            data = await self._single_flight(("item", item_id), lambda: self.client.aget_product_info(item_id))
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code == 404:
+                _remember_missing_product(item_id)
+                raise ProductNotFoundError(item_id) from exc
+            raise
+        return await session.run_sync(self._upsert_product, item_id, data, site_id_hint, title_hint)
+
+    def _upsert_product(self, db: Session, item_id: str, data: Dict[str, Any], site_id_hint: str | None, title_hint: str | None) -> Product:
+        row = {
+            "id": data.get("id", item_id),
+            "title": (data.get("title") or title_hint or f"Item {item_id}"),
+            "price": float(data.get("price") or 0.0),
+            "site_id": (data.get("site_id") or site_id_hint or "MLA"),
+            "currency_id": data.get("currency_id", "ARS"),
+            "sold_quantity": int(data.get("sold_quantity") or 0),
+            "available_quantity": int(data.get("available_quantity") or 0),
+            "marca": data.get("marca", ""),
+            "modelo": data.get("modelo", ""),
+            "caracteristicas": data.get("caracteristicas"),
+        }
+        stmt = dialect_insert(db, Product).values(row)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.id],
+            set_={key: stmt.excluded[key] for key in row if key != "id"},
         )
-        db.add(prod)
-        db.flush()
+        prod = db.scalars(stmt.returning(Product), execution_options={"populate_existing": True}).one()
+        _remember_product(item_id)
         return prod
 
-    def get_reviews_cached(self, db: Session, item_id: str, limit: int = 50, offset: int = 0) -> List[Review]:
+    def get_reviews_cached(self, db: Session, item_id: str, limit: int = 50, offset: int = 0) -> List[Any]:
+        # Rows with the ReviewOut columns, not ORM entities (nothing lazy to load per row)
         q = (
-            db.query(Review)
+            db.query(*REVIEW_READ_COLUMNS)
             .filter(Review.product_id == item_id)
             .order_by(Review.date_created.desc())
         )
@@ -45,44 +159,121 @@ class ReviewCacheService:
 
     def fetch_and_store_reviews(self, db: Session, item_id: str, limit: int = 50, offset: int = 0) -> List[Review]:
         payload = self.client.get_product_reviews(item_id, limit=limit, offset=offset)
-        reviews_raw: List[Dict[str, Any]] = payload.get("reviews") or payload.get("results") or []
+        return self.store_reviews(db, item_id, payload)
+
+    async def afetch_and_store_reviews(self, session: AsyncSession, item_id: str, limit: int = 50, offset: int = 0) -> List[Review]:
+        payload = await self._single_flight(
+            ("reviews", item_id, limit, offset),
+            lambda: self.client.aget_product_reviews(item_id, limit=limit, offset=offset),
+        )
+        return await session.run_sync(self.store_reviews, item_id, payload)
+
+    def store_reviews(self, db: Session, item_id: str, payload: Dict[str, Any]) -> List[Review]:
+        rows, raw_rows = _review_rows(item_id, [payload])
+        if not rows:
+            return []
 
-        stored: List[Review] = []
+        # One upsert per page; sentiment already computed for existing rows is kept, but an
+        # edited content marks the review pending again so sentiment_analyzer re-scores it
+        stmt = dialect_insert(db, Review).values(list(rows.values()))
+        set_ = {
+            key: stmt.excluded[key]
+            for key in next(iter(rows.values()))
+            if key not in ("id", "sentiment_score", "sentiment_label")
+        }
+        set_["sentiment_processed_at"] = case(
+            (Review.content.is_distinct_from(stmt.excluded.content), None),
+            else_=Review.sentiment_processed_at,
+        )
+        stmt = stmt.on_conflict_do_update(index_elements=[Review.id], set_=set_)
+        stored = db.scalars(stmt.returning(Review), execution_options={"populate_existing": True}).all()
+
+        if raw_rows:
+            raw_stmt = dialect_insert(db, ReviewRaw).values(list(raw_rows.values()))
+            raw_stmt = raw_stmt.on_conflict_do_update(
+                index_elements=[ReviewRaw.review_id],
+                set_={"raw_json": raw_stmt.excluded.raw_json},
+            )
+            db.execute(raw_stmt)
+        return list(stored)
+
+    def store_review_pages(self, db: Session, item_id: str, payloads: List[Dict[str, Any]]) -> int:
+        """Stores several pages of one item; first loads on PostgreSQL go through execute_values."""
+        if db.get_bind().dialect.name == "postgresql" and not db.scalar(select(exists().where(Review.product_id == item_id))):
+            return self._bulk_load_reviews(db, item_id, payloads)
+        return sum(len(self.store_reviews(db, item_id, payload)) for payload in payloads)
+
+    @staticmethod
+    def _bulk_load_reviews(db: Session, item_id: str, payloads: List[Dict[str, Any]]) -> int:
+        from psycopg2.extras import Json, execute_values
+
+        rows, raw_rows = _review_rows(item_id, payloads)
+        if not rows:
+            return 0
+        columns = list(next(iter(rows.values())))
+        values = [
+            tuple(Json(row[col]) if isinstance(row[col], (dict, list)) else row[col] for col in columns)
+            for row in rows.values()
+        ]
+        # Raw DBAPI cursor on the session's connection: same transaction as the ORM work
+        cursor = db.connection().connection.cursor()
+        try:
+            execute_values(
+                cursor,
+                f"INSERT INTO reviews ({', '.join(columns)}) VALUES %s ON CONFLICT (id) DO NOTHING",
+                values,
+                page_size=500,
+            )
+            if raw_rows:
+                execute_values(
+                    cursor,
+                    "INSERT INTO review_raw (review_id, raw_json) VALUES %s ON CONFLICT (review_id) DO NOTHING",
+                    [(raw["review_id"], Json(raw["raw_json"])) for raw in raw_rows.values()],
+                    page_size=500,
+                )
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+def _review_rows(item_id: str, payloads: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Maps API review payloads to reviews / review_raw rows, deduplicated by id."""
+    # Dedup by id: ON CONFLICT cannot touch the same row twice in one statement
+    rows: Dict[str, Dict[str, Any]] = {}
+    raw_rows: Dict[str, Dict[str, Any]] = {}
+    for payload in payloads:
+        reviews_raw: List[Dict[str, Any]] = payload.get("reviews") or payload.get("results") or []
         for r in reviews_raw:
-            rid = str(r.get("id"))
-            if not rid:
+            # str(None) would be "None": skip reviews without an id before converting
+            if not r.get("id"):
                 continue
-            existing = db.get(Review, rid)
-            if existing:
-                stored.append(existing)
-                continue
-            review = Review(
-                id=rid,
-                product_id=item_id,
-                rate=int(r.get("rate") or 0),
-                title=str(r.get("title") or ""),
-                content=str(r.get("content") or r.get("text") or ""),
-                date_created=_parse_date(r.get("date_created") or r.get("date") or datetime.utcnow().isoformat()),
-                reviewer_id=str(r.get("reviewer_id") or r.get("user_id") or ""),
-                likes=int(r.get("likes") or 0),
-                dislikes=int(r.get("dislikes") or 0),
-                sentiment_score=0.0,
-                sentiment_label="neutral",
-                api_review_id=str(r.get("api_review_id") or ""),
-                date_text=str(r.get("date_text") or ""),
-                source=str(r.get("source") or "api"),
-                media=r.get("media"),
-                raw_json=r.get("raw_json"),
-            )
-            db.add(review)
-            stored.append(review)
-        db.flush()
-        return stored
+            rid = str(r["id"])
+            rows[rid] = {
+                "id": rid,
+                "product_id": item_id,
+                "rate": int(r.get("rate") or 0),
+                "title": str(r.get("title") or ""),
+                "content": str(r.get("content") or r.get("text") or ""),
+                "date_created": _parse_date(r.get("date_created") or r.get("date") or datetime.utcnow().isoformat()),
+                "reviewer_id": str(r.get("reviewer_id") or r.get("user_id") or ""),
+                "likes": int(r.get("likes") or 0),
+                "dislikes": int(r.get("dislikes") or 0),
+                "sentiment_score": 0.0,
+                "sentiment_label": "neutral",
+                "api_review_id": str(r.get("api_review_id") or ""),
+                "date_text": str(r.get("date_text") or ""),
+                "source": str(r.get("source") or "api"),
+                "media": r.get("media"),
+            }
+            if r.get("raw_json"):
+                raw_rows[rid] = {"review_id": rid, "raw_json": r.get("raw_json")}
+    return rows, raw_rows
 
 
 def _parse_date(value: str) -> datetime:
     try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        # C parser; accepts the trailing "Z" without rewriting the string
+        return ciso8601.parse_datetime(value)
     except Exception:
         return datetime.utcnow()
 
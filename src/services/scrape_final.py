@@ -1,28 +1,211 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import atexit
+import inspect
+import logging
+import os
 import re
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Set
+from typing import Dict, List, Optional, Set, Tuple, Union
 from urllib.parse import urlparse
-import json
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+import ciso8601
+import httpx
+import orjson
 
 # MercadoLibrePlaywright eliminado - ya no se usa
-from src.models.database import get_session, init_db
+from src.models.database import dialect_insert, get_session, init_db, refresh_review_stats
 from src.models.product import Product
 from src.models.review import Review
+from src.models.review_raw import ReviewRaw
+from src.utils.config import settings
 from datetime import datetime
 
+# Detalle por comentario del scroll: formateo diferido, solo se emite con --verbose
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+# Segmento con código de item/producto (MLA123...)
+ITEM_CODE_RE = re.compile(r"^[A-Z]{2,4}\d+")
+SITE_ID_RE = re.compile(r"^([A-Z]{3,4})\d+")
+# Segmento de producto en URLs de catálogo: .../p/MLA123
+PRODUCT_PATH_RE = re.compile(r"/p/([A-Z]{2,4}\d[^/?#]*)")
+
+# Texto de cada comentario: calificación, fecha y restos de la UI a limpiar
+RATING_RE = re.compile(r'Calificación (\d+) de 5')
+DATE_RE = re.compile(r'(\d{1,2} \w+\. \d{4})')
+UTIL_MARKER = 'Es útil'
+MAS_OPCIONES_RE = re.compile(r'Más opciones$')
+# Comentario completo en una pasada: calificación, fecha y contenido hasta los botones de la UI
+COMMENT_RE = re.compile(
+    r'Calificación (?P<rate>\d+) de 5.*?(?P<date>\d{1,2} \w+\. \d{4})(?P<content>.*?)(?:Es útil|Más opciones|$)',
+    re.DOTALL,
+)
+RATING_PREFIX_RE = re.compile(r'^Calificación \d+ de 5\s*')
+DATE_PREFIX_RE = re.compile(r'^\d{1,2} \w+\. \d{4}\s*')
+
+# Texto de cada elemento (textContent, como text_content(): no fuerza layout)
+ARTICLE_TEXTS_JS = "els => els.map(el => el.textContent || '')"
+
+# Comentarios visibles, en un solo page.evaluate (un round-trip por scroll). Sin selector
+# se usa el que más elementos encuentra; el elegido se devuelve para reusarlo después
+VISIBLE_COMMENTS_JS = """
+(selector) => {
+  const selectors = selector ? [selector] : [
+    '.ui-review-capability-comments__comment',
+    'article[data-testid="comment-component"]',
+    'article[aria-roledescription="Review"]',
+    '.ui-review-capability-comments article',
+    '.ui-review-capability-comments > div',
+  ];
+  let best = [];
+  let bestSelector = null;
+  for (const candidate of selectors) {
+    const found = document.querySelectorAll(candidate);
+    if (found.length > best.length) {
+      best = found;
+      bestSelector = candidate;
+    }
+  }
+  return {selector: bestSelector, texts: Array.from(best, el => el.textContent || '')};
+}
+"""
+
+
+# Firma de la lista de comentarios (cantidad + inicio del último): cambia cuando el scroll
+# agrega artículos o la virtualización los reemplaza
+COMMENTS_SIGNATURE_JS = """
+(selector) => {
+  const els = document.querySelectorAll(selector);
+  const last = els.length ? (els[els.length - 1].textContent || '').slice(0, 100) : '';
+  return els.length + '|' + last;
+}
+"""
+DEFAULT_COMMENTS_SELECTOR = '.ui-review-capability-comments article'
+
+# Botones del modal en un solo selector compuesto: una consulta por scroll en lugar de
+# una por texto, y :visible filtra en el browser sin un is_visible() por elemento
+LOAD_MORE_TEXTS = (
+    "Cargar más", "Ver más", "Mostrar más", "Cargar más comentarios",
+    "Ver más comentarios", "Mostrar más comentarios", "Cargar más opiniones",
+    "Ver más opiniones", "Mostrar más opiniones", "Ver todas las opiniones",
+)
+LOAD_MORE_SELECTOR = ", ".join(f'button:has-text("{text}"):visible' for text in LOAD_MORE_TEXTS)
+LOAD_MORE_TESTID_SELECTOR = '[data-testid*="load"]:visible, [data-testid*="more"]:visible, [data-testid*="button"]:visible'
+LOAD_MORE_TEXT_RE = re.compile(r'cargar|ver|mostrar|más', re.IGNORECASE)
+NEXT_PAGE_SELECTOR = ", ".join(f'{selector}:visible' for selector in (
+    '.andes-pagination [aria-label="Siguiente"]:not([disabled])',
+    'button[aria-label="Siguiente"]:not([disabled])',
+    'a[aria-label="Siguiente"]',
+    '.ui-pagination__link:has-text("Siguiente")',
+    '.andes-button:has-text("Siguiente")',
+))
+
+# Colector persistente de reviews del modal (evita pérdida por virtualización). Se instala
+# una vez antes de navegar: un MutationObserver procesa solo los artículos que se agregan
+# o cambian, en lugar de recorrer todo el modal en un evaluate por scroll
+SNAPSHOT_OBSERVER_JS = r"""
+(() => {
+  if (window.__mlReviewsObserver) return;
+  window.__mlReviewsSet = new Set();
+  window.__mlReviews = [];
+  const ARTICLE_SELECTOR = 'article[data-testid="comment-component"], article[aria-roledescription="Review"]';
+  const RATING = /Calificación\s+(\d+)\s+de\s+5/i;
+  const DATE = /\d{1,2}\s+\w+\.?\s+\d{4}/;
+  const UTIL = /Es útil\s*\d+.*/i;
+  const MAS_OPCIONES = /Más opciones.*/i;
+  const record = (a) => {
+    if (!a.closest('.andes-modal__content')) return;
+    const text = (a.textContent || '').trim();
+    if (text.length < 50) return;
+    const id = text.slice(0, 120).trim();
+    if (window.__mlReviewsSet.has(id)) return;
+    // Parse rating y fecha simples
+    let rate = 0; const m = text.match(RATING); if (m) rate = parseInt(m[1], 10) || 0;
+    let date = ''; const d = text.match(DATE); if (d) date = d[0];
+    let content = text;
+    if (date) { const parts = text.split(date); content = parts.slice(1).join(' ').trim(); }
+    // Limpiar UI común
+    content = content.replace(UTIL, '').replace(MAS_OPCIONES, '').trim();
+    window.__mlReviewsSet.add(id);
+    window.__mlReviews.push({ id, rate, date, content, extracted_immediately: true });
+  };
+  window.__mlReviewsObserver = new MutationObserver((mutations) => {
+    const touched = new Set();
+    for (const mutation of mutations) {
+      // Artículo que recibió contenido nuevo
+      const target = mutation.target.nodeType === 1 ? mutation.target.closest(ARTICLE_SELECTOR) : null;
+      if (target) touched.add(target);
+      for (const node of mutation.addedNodes) {
+        if (node.nodeType !== 1) continue;
+        if (node.matches(ARTICLE_SELECTOR)) touched.add(node);
+        else for (const a of node.querySelectorAll(ARTICLE_SELECTOR)) touched.add(a);
+      }
+    }
+    for (const a of touched) record(a);
+  });
+  window.__mlReviewsObserver.observe(document, { childList: true, subtree: true });
+})();
+"""
+# Solo las reviews agregadas desde el cursor: cada lectura cruza CDP con lo nuevo, no todo el array
+SNAPSHOT_DELTA_JS = "(cursor) => (window.__mlReviews || []).slice(cursor)"
+
+
+def _parse_comment_text(text: str, comment_id: str) -> dict:
+    """Rating, fecha y contenido a partir del texto de un comentario del DOM."""
+    match = COMMENT_RE.search(text)
+    if match:
+        return {
+            'text': text,
+            'id': comment_id,
+            'rate': int(match['rate']),
+            'date': match['date'],
+            'content': match['content'].strip() or text.strip(),
+            'extracted_immediately': True
+        }
+    
+    # Formatos sin calificación antes de la fecha: búsqueda por partes
+    rating_match = RATING_RE.search(text)
+    rate = int(rating_match.group(1)) if rating_match else 0
+    date_match = DATE_RE.search(text)
+    date_text = date_match.group(1) if date_match else ""
+    # partition corta solo en la primera aparición de la fecha, sin armar una lista
+    _, sep, tail = text.partition(date_text) if date_text else ('', '', '')
+    if sep:
+        content = tail.strip()
+        # Contador de "Es útil" seguido de los botones: se descarta desde ahí
+        head, marker, rest = content.partition(UTIL_MARKER)
+        if marker and rest[:1].isdigit():
+            content = head.strip()
+        content = MAS_OPCIONES_RE.sub('', content).strip()
+    else:
+        content = text.strip()
+    return {
+        'text': text,
+        'id': comment_id,
+        'rate': rate,
+        'date': date_text,
+        'content': content,
+        'extracted_immediately': True
+    }
+
 
 def extract_product_code(url: str) -> str:
+    # Camino rápido para URLs de catálogo, sin pasar por urlparse
+    match = PRODUCT_PATH_RE.search(url)
+    if match:
+        return match.group(1)
+    
     parsed = urlparse(url)
     path = parsed.path or ""
     segments = [seg for seg in path.split("/") if seg]
     candidate = ""
     for seg in segments[::-1]:
-        if re.match(r"^[A-Z]{2,4}\d+", seg):
+        if ITEM_CODE_RE.match(seg):
             candidate = seg
             break
     if not candidate and segments:
@@ -32,7 +215,7 @@ def extract_product_code(url: str) -> str:
 
 def extract_hints(url: str, item_id: str) -> tuple:
     site_id = None
-    m = re.match(r"^([A-Z]{3,4})\d+", item_id)
+    m = SITE_ID_RE.match(item_id)
     if m:
         site_id = m.group(1)
 
@@ -43,833 +226,973 @@ def extract_hints(url: str, item_id: str) -> tuple:
         p_idx = segments.index("p")
         if p_idx > 0:
             candidate = segments[p_idx - 1]
-            if candidate and not re.match(r"^[A-Z]{2,4}\d+", candidate):
+            if candidate and not ITEM_CODE_RE.match(candidate):
                 title_hint = candidate.replace("-", " ").strip().title()
     except ValueError:
         for seg in reversed(segments):
-            if not re.match(r"^[A-Z]{2,4}\d+", seg):
+            if not ITEM_CODE_RE.match(seg):
                 title_hint = seg.replace("-", " ").strip().title()
                 break
 
     return site_id, title_hint
 
 
-def _api_fetch_reviews_page(object_id: str, site_id: str, offset: int, limit: int = 15) -> dict:
-    """Llama al endpoint público de reviews (noindex) y devuelve el JSON."""
-    base_url = f"https://www.mercadolibre.com.ar/noindex/catalog/reviews/{object_id}/search"
+API_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36",
+}
+API_REVIEWS_URL = "https://www.mercadolibre.com.ar/noindex/catalog/reviews/{}/search"
+API_REFERER = "https://www.mercadolibre.com.ar/p/{}"
+# Productos pedidos a la vez a la API (cada uno con hasta API_CONCURRENCY páginas en vuelo)
+SCRAPE_CONCURRENCY = settings.SCRAPE_CONCURRENCY
+# Reviews pedidas por request (el endpoint acepta hasta 50)
+API_PAGE_SIZE = 50
+# Páginas de la API pedidas a la vez
+API_CONCURRENCY = 8
+
+# Event loop y cliente HTTP persistentes: las conexiones keep-alive (y la sesión TLS)
+# se reutilizan entre productos en lugar de abrirse de nuevo en cada scrape
+_api_runner: Optional[asyncio.Runner] = None
+_api_client: Optional[httpx.AsyncClient] = None
+
+
+def _run_api(coro):
+    """Corre coro en el event loop persistente de la API."""
+    global _api_runner
+    if _api_runner is None:
+        _api_runner = asyncio.Runner()
+        atexit.register(_close_api)
+    return _api_runner.run(coro)
+
+
+def _get_api_client() -> httpx.AsyncClient:
+    # Se crea dentro del loop persistente, que es donde vive su pool de conexiones
+    global _api_client
+    if _api_client is None:
+        _api_client = httpx.AsyncClient(
+            http2=True,
+            headers=API_HEADERS,
+            timeout=20.0,
+            limits=httpx.Limits(max_connections=API_CONCURRENCY, max_keepalive_connections=API_CONCURRENCY),
+        )
+    return _api_client
+
+
+def _close_api() -> None:
+    global _api_runner, _api_client
+    if _api_runner is None:
+        return
+    if _api_client is not None:
+        _api_runner.run(_api_client.aclose())
+        _api_client = None
+    _api_runner.close()
+    _api_runner = None
+
+
+async def _api_fetch_reviews_page(client: httpx.AsyncClient, url: str, params: dict, headers: dict, offset: int) -> dict:
+    """
+    Llama al endpoint público de reviews (noindex) y devuelve el JSON.
+    
+    url, params y headers se arman una vez por producto; acá solo cambia el offset.
+    """
+    response = await client.get(url, params={**params, "offset": offset}, headers=headers)
+    response.raise_for_status()
+    # orjson parsea los bytes directamente, sin decode intermedio a str
+    return orjson.loads(response.content)
+
+
+async def _api_fetch_reviews_pages(object_id: str, site_id: str, max_count: int) -> List[Union[dict, Exception]]:
+    """
+    Pide todas las páginas necesarias para max_count reviews.
+    
+    Si la primera página llega completa, el resto de los offsets se conocen de antemano
+    y se piden en paralelo. Si llega corta (el servidor limita el tamaño de página o no
+    hay más reviews) se sigue paginando de a una con el tamaño real, sin saltear reviews.
+    Devuelve el JSON de cada página (o la excepción si falló) en orden de offset.
+    """
+    client = _get_api_client()
+    semaphore = asyncio.Semaphore(API_CONCURRENCY)
+    url = API_REVIEWS_URL.format(object_id)
     params = {
         "objectId": object_id,
-        "siteId": site_id or "MLA",
+        "siteId": site_id,
         "isItem": "false",
-        "offset": offset,
-        "limit": limit,
+        "limit": API_PAGE_SIZE,
     }
-    url = base_url + "?" + urlencode(params)
-    req = Request(url, headers={
-        "Accept": "application/json, text/plain, */*",
-        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36",
-        "Referer": f"https://www.mercadolibre.com.ar/p/{object_id}",
-    })
-    with urlopen(req, timeout=20) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    headers = {"Referer": API_REFERER.format(object_id)}
+    
+    async def fetch(offset: int) -> dict:
+        async with semaphore:
+            return await _api_fetch_reviews_page(client, url, params, headers, offset)
+    
+    first = await fetch(0)
+    received = len(_api_page_items(first))
+    if received >= min(API_PAGE_SIZE, max_count):
+        offsets = range(API_PAGE_SIZE, max_count, API_PAGE_SIZE)
+        return [first] + await asyncio.gather(*(fetch(offset) for offset in offsets), return_exceptions=True)
+    
+    pages: List[Union[dict, Exception]] = [first]
+    offset = received
+    while received and offset < max_count:
+        try:
+            page = await fetch(offset)
+        except Exception as e:
+            pages.append(e)
+            break
+        pages.append(page)
+        received = len(_api_page_items(page))
+        offset += received
+    return pages
+
+
+def _api_page_items(data: dict) -> List[dict]:
+    return data.get("reviews") or data.get("results") or []
+
+
+# Resultados recientes de la API por (object_id, site_id, max_count): un refresh
+# repetido del mismo producto no vuelve a pedir ni a parsear las páginas
+API_CACHE_TTL = 900.0
+API_CACHE_MAX = 512
+_api_cache: "OrderedDict[Tuple[str, str, int], Tuple[float, List[dict]]]" = OrderedDict()
+
+
+def _collect_api_reviews(pages: List[Union[dict, Exception]], max_count: int, all_reviews: Dict[str, dict]) -> None:
+    """
+    Agrega a all_reviews (por id de la API) las reviews de las páginas.
+    
+    Una página fallida corta con su excepción; lo ya agregado queda en all_reviews.
+    """
+    # Las páginas llegan en paralelo pero se procesan en orden, cortando en la primera vacía
+    for data in pages:
+        if len(all_reviews) >= max_count:
+            break
+        if isinstance(data, Exception):
+            raise data
+        items = _api_page_items(data)
+        if not items:
+            break
+        added = 0
+        for r in items:
+            try:
+                rid = str(r.get("id") or "")
+                if not rid:
+                    continue
+                if rid in all_reviews:
+                    continue
+                # rating
+                rate = int(r.get("rating") or 0)
+                # content
+                content = ""
+                if isinstance(r.get("comment"), dict):
+                    c = r["comment"].get("content")
+                    if isinstance(c, dict):
+                        content = c.get("text") or ""
+                    elif isinstance(c, str):
+                        content = c
+                elif isinstance(r.get("content"), str):
+                    content = r.get("content")
+                content = (content or "").strip()
+                # date text
+                date_text = ""
+                if isinstance(r.get("comment"), dict):
+                    date_text = r["comment"].get("date") or (r["comment"].get("time") or {}).get("text", "")
+                date_text = r.get("date") or date_text or ""
+                likes = 0
+                for act in r.get("actions") or []:
+                    if act.get("id") == "LIKE":
+                        try:
+                            likes = int(act.get("value") or 0)
+                        except Exception:
+                            likes = 0
+                        break
+                all_reviews[rid] = {
+                    "id": f"A{rid}",
+                    "rate": rate,
+                    "content": content,
+                    "date_created": date_text,
+                    "reviewer_id": f"user_{rid}",
+                    "likes": likes,
+                    "dislikes": 0,
+                }
+                added += 1
+                if len(all_reviews) >= max_count:
+                    break
+            except Exception:
+                continue
+        if added == 0:
+            break
+
 
+async def _api_fetch_many(keys: List[Tuple[str, str, int]]) -> List[Union[List[Union[dict, Exception]], Exception]]:
+    # Hasta SCRAPE_CONCURRENCY productos a la vez; cada uno pagina con su propio límite
+    semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    
+    async def fetch(object_id: str, site_id: str, max_count: int) -> List[Union[dict, Exception]]:
+        async with semaphore:
+            return await _api_fetch_reviews_pages(object_id, site_id, max_count)
+    
+    return await asyncio.gather(*(fetch(*key) for key in keys), return_exceptions=True)
 
-def scrape_reviews_via_api(object_id: str, site_id: str, max_count: int) -> List[dict]:
+
+def scrape_reviews_via_api_many(requests: List[Tuple[str, Optional[str], int]]) -> List[List[dict]]:
+    """
+    Scrapea reviews vía API noindex de varios productos (object_id, site_id, max_count) a la vez.
+    
+    Los que están en cache no se piden; el resto se piden en paralelo. Devuelve una lista de
+    reviews por producto, en el orden de requests y en el formato que guarda run_for_item.
+    """
+    # Sitio por defecto resuelto una sola vez; las capas de abajo reciben siempre un site_id
+    keys = [(object_id, site_id or "MLA", max_count) for object_id, site_id, max_count in requests]
+    results: List[Optional[List[dict]]] = []
+    for key in keys:
+        cached = _api_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            _api_cache.move_to_end(key)
+            print(f"API {key[0]}: {len(cached[1])} reviews desde cache")
+            # Copias: el llamador extiende la lista y guarda los dicts
+            results.append([dict(review) for review in cached[1]])
+        else:
+            results.append(None)
+    
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        fetched = _run_api(_api_fetch_many([keys[i] for i in misses]))
+        for i, pages in zip(misses, fetched):
+            key = keys[i]
+            # Reviews por id de la API: deduplica e inserta en una sola operación
+            all_reviews: Dict[str, dict] = {}
+            try:
+                if isinstance(pages, Exception):
+                    raise pages
+                _collect_api_reviews(pages, key[2], all_reviews)
+            except Exception as e:
+                # Resultado parcial: no se cachea
+                print(f"⚠️ API reviews de {key[0]} falló: {e}")
+            else:
+                _api_cache[key] = (time.monotonic() + API_CACHE_TTL, [dict(review) for review in all_reviews.values()])
+                _api_cache.move_to_end(key)
+                while len(_api_cache) > API_CACHE_MAX:
+                    _api_cache.popitem(last=False)
+            print(f"API {key[0]}: recolectadas {len(all_reviews)} reviews")
+            results[i] = list(all_reviews.values())
+    return results
+
+
+def scrape_reviews_via_api(object_id: str, site_id: Optional[str], max_count: int) -> List[dict]:
     """Scrapea reviews vía API noindex. Devuelve lista en el mismo formato que guarda run_for_item."""
-    all_reviews: List[dict] = []
-    seen_ids: Set[str] = set()
-    offset = 0
-    page_size = 15
+    return scrape_reviews_via_api_many([(object_id, site_id, max_count)])[0]
+
+
+# Items scrapeados a la vez por DOM, cada uno en su propia página del contexto compartido
+DOM_CONCURRENCY = settings.SCRAPE_CONCURRENCY
+
+# Recursos que el scraper no usa (solo lee texto del DOM); las hojas de estilo se
+# mantienen porque los chequeos de visibilidad del modal dependen del CSS
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "ping"})
+# Scripts de analítica y publicidad de terceros: no intervienen en las reviews
+BLOCKED_HOSTS_RE = re.compile(
+    r"^https?://[^/]*(?:googletagmanager\.com|google-analytics\.com|doubleclick\.net"
+    r"|googlesyndication\.com|facebook\.net|hotjar\.com|clarity\.ms)/"
+)
+
+
+async def _block_unused_resources(route) -> None:
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS_RE.match(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class _NoStackInspect:
+    """inspect de playwright sin stack(): el resto de las funciones son las originales."""
+    
+    def __getattr__(self, name):
+        return getattr(inspect, name)
+    
+    @staticmethod
+    def stack(*args, **kwargs):
+        return []
+
+
+def _disable_playwright_stack_capture() -> None:
+    """
+    playwright-python captura inspect.stack() en cada llamada a la API (locator, click,
+    evaluate...) solo para nombrar la llamada en trazas y errores; en el loop de scroll
+    eso es buena parte del CPU. Se desactiva salvo PW_INSPECT_STACK=1.
+    """
+    if os.getenv("PW_INSPECT_STACK") == "1":
+        return
     try:
-        while len(all_reviews) < max_count:
-            data = _api_fetch_reviews_page(object_id, site_id or "MLA", offset, page_size)
-            items = data.get("reviews") or data.get("results") or []
-            if not items:
-                break
-            added = 0
-            for r in items:
-                try:
-                    rid = str(r.get("id") or "")
-                    if not rid:
-                        continue
-                    if rid in seen_ids:
-                        continue
-                    seen_ids.add(rid)
-                    # rating
-                    rate = int(r.get("rating") or 0)
-                    # content
-                    content = ""
-                    if isinstance(r.get("comment"), dict):
-                        c = r["comment"].get("content")
-                        if isinstance(c, dict):
-                            content = c.get("text") or ""
-                        elif isinstance(c, str):
-                            content = c
-                    elif isinstance(r.get("content"), str):
-                        content = r.get("content")
-                    content = (content or "").strip()
-                    # date text
-                    date_text = ""
-                    if isinstance(r.get("comment"), dict):
-                        date_text = r["comment"].get("date") or (r["comment"].get("time") or {}).get("text", "")
-                    date_text = r.get("date") or date_text or ""
-                    title = content[:50] + "..." if len(content) > 50 else content
-                    likes = 0
-                    for act in r.get("actions") or []:
-                        if act.get("id") == "LIKE":
-                            try:
-                                likes = int(act.get("value") or 0)
-                            except Exception:
-                                likes = 0
-                            break
-                    all_reviews.append({
-                        "id": f"A{rid}",
-                        "rate": rate,
-                        "title": title,
-                        "content": content,
-                        "date_created": date_text,
-                        "reviewer_id": f"user_{rid}",
-                        "likes": likes,
-                        "dislikes": 0,
-                    })
-                    added += 1
-                    if len(all_reviews) >= max_count:
-                        break
-                except Exception:
-                    continue
-            if added == 0:
-                break
-            offset += page_size
-    except Exception as e:
-        print(f"⚠️ API reviews falló: {e}")
-    print(f"API: recolectadas {len(all_reviews)} reviews")
-    return all_reviews
+        from playwright._impl import _connection
+    except ImportError:
+        return
+    if hasattr(_connection, "inspect") and not isinstance(_connection.inspect, _NoStackInspect):
+        _connection.inspect = _NoStackInspect()
 
 
 def scrape_reviews_directly(item_id: str, count: int) -> List[dict]:
+    """Scraper directo de un solo item (para varios usar scrape_reviews_directly_async)"""
+    return asyncio.run(scrape_reviews_directly_async({item_id: count}))[item_id]
+
+
+async def scrape_reviews_directly_async(counts: Dict[str, int]) -> Dict[str, List[dict]]:
+    """
+    Scrapea por DOM varios items en paralelo sobre un único browser headless.
+    
+    counts mapea item_id -> cantidad de reviews a buscar. Hasta DOM_CONCURRENCY items
+    trabajan a la vez, cada uno en su propia página de un único contexto: el browser se
+    lanza una sola vez y la cache HTTP y las cookies se reutilizan entre items.
+    """
+    from playwright.async_api import async_playwright
+    
+    _disable_playwright_stack_capture()
+    semaphore = asyncio.Semaphore(DOM_CONCURRENCY)
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await context.route("**/*", _block_unused_resources)
+        
+        async def scrape_one(item_id: str, count: int) -> List[dict]:
+            async with semaphore:
+                page = await context.new_page()
+                try:
+                    return await _scrape_item_reviews(page, item_id, count)
+                finally:
+                    # Se cierra solo la página; contexto y browser siguen para el próximo item
+                    await page.close()
+        
+        try:
+            results = await asyncio.gather(
+                *(scrape_one(item_id, count) for item_id, count in counts.items()),
+                return_exceptions=True,
+            )
+        finally:
+            await browser.close()
+    
+    reviews_by_item: Dict[str, List[dict]] = {}
+    for item_id, result in zip(counts, results):
+        if isinstance(result, Exception):
+            print(f"Error general ({item_id}): {result}")
+            result = []
+        reviews_by_item[item_id] = result
+    return reviews_by_item
+
+
+def _parse_api_review(obj) -> Optional[dict]:
+    """Review en el formato de _parse_comment_text a partir de un objeto JSON de la API."""
+    try:
+        # Intentar mapear estructuras comunes
+        rate = int(obj.get('rating', obj.get('rate', 0)) or 0)
+        content = obj.get('content') or obj.get('comment') or obj.get('text') or ''
+        date_text = obj.get('date_created') or obj.get('date') or obj.get('created_at') or ''
+        if content and len(content.strip()) > 10:
+            return {
+                'text': content,
+                'id': (content[:80] + str(rate)).strip(),
+                'rate': rate,
+                'date': str(date_text),
+                'content': content.strip(),
+                'extracted_immediately': True
+            }
+    except Exception:
+        return None
+    return None
+
+
+def _comments_to_reviews(item_id: str, comments: List[dict], count: int) -> List[dict]:
+    """Convierte comentarios ya parseados en reviews con el formato que guarda run_for_item."""
+    reviews = []
+    for i, comment_data in enumerate(comments[:count]):
+        try:
+            rate = comment_data.get('rate', 0)
+            date_text = comment_data.get('date', '')
+            content = comment_data.get('content', '')
+            review_data = {
+                "id": f"R{item_id}{i+1}",
+                "rate": rate,
+                "content": content,
+                "date_created": date_text,
+                "reviewer_id": f"user_{i+1}",
+                "likes": 0,
+                "dislikes": 0,
+            }
+            reviews.append(review_data)
+            print(f"  📄 Review {i+1}: {content[:50]}... (Rating: {rate})")
+        except Exception:
+            continue
+    return reviews
+
+
+async def _comments_signature(page, selector: str) -> Optional[str]:
+    """Firma (cantidad + último comentario) de los comentarios que hay ahora en la página."""
+    try:
+        return await page.evaluate(COMMENTS_SIGNATURE_JS, selector)
+    except Exception:
+        return None
+
+
+async def _wait_for_comments_change(page, selector: str, before: Optional[str], timeout: float) -> None:
+    """
+    Espera a que cambien los comentarios renderizados (o hasta timeout ms), en lugar de una
+    pausa fija: sigue apenas aparecen los nuevos y aguanta más cuando la red está lenta.
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+    
+    if before is None:
+        return
+    try:
+        await page.wait_for_function(
+            f"([selector, before]) => ({COMMENTS_SIGNATURE_JS})(selector) !== before",
+            arg=[selector, before],
+            timeout=timeout,
+        )
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def _scrape_item_reviews(page, item_id: str, count: int) -> List[dict]:
     """Scraper directo usando la lógica que sabemos que funciona"""
-    from playwright.sync_api import sync_playwright
-    import time
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
     
     url = f"https://www.mercadolibre.com.ar/p/{item_id}#reviews"
     reviews = []
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
+    # Reviews que la propia página pide a su API. El listener se registra antes del
+    # goto para no perder la primera tanda, que llega durante la carga.
+    api_comments_data = []
+    api_seen = set()
+    
+    async def _on_response(response):
+        try:
+            url_l = response.url.lower()
+            if ('review' in url_l or 'opinion' in url_l) and 'image' not in url_l:
+                ctype = response.headers.get('content-type', '')
+                if 'application/json' in ctype:
+                    data = await response.json()
+                    candidates = []
+                    if isinstance(data, dict):
+                        for key in ['reviews', 'results', 'list', 'data', 'items']:
+                            if isinstance(data.get(key), list):
+                                candidates = data.get(key)
+                                break
+                        # Algunas APIs anidan en data.results
+                        if not candidates and isinstance(data.get('data'), dict) and isinstance(data['data'].get('results'), list):
+                            candidates = data['data']['results']
+                    if isinstance(data, list):
+                        candidates = data
+                    added_now = 0
+                    for obj in candidates or []:
+                        parsed = _parse_api_review(obj)
+                        if parsed:
+                            key = parsed['id']
+                            if key not in api_seen:
+                                api_seen.add(key)
+                                api_comments_data.append(parsed)
+                                added_now += 1
+                    if added_now:
+                        print(f"  🌐 API: capturadas {added_now} nuevas reviews (total API {len(api_comments_data)})")
+        except Exception:
+            pass
+    
+    page.on('response', _on_response)
+    try:
+        await page.add_init_script(script=SNAPSHOT_OBSERVER_JS)
+    except Exception:
+        pass
+    
+    try:
+        print(f"Accediendo a: {url}")
+        await page.goto(url, wait_until="commit")
         
+        # Esperar a que aparezcan las opiniones (o al menos el botón del modal),
+        # en lugar de una pausa fija
         try:
-            print(f"Accediendo a: {url}")
-            page.goto(url, wait_until="domcontentloaded")
-            
-            # Esperar que cargue completamente
-            time.sleep(8)
-            
-            # Cerrar cualquier modal de Google Sign-in que pueda aparecer
-            try:
-                google_modal_close = page.locator('button[aria-label="Close"], .google-modal button, [data-testid="close-button"]').first
-                if google_modal_close.is_visible():
-                    print("Cerrando modal de Google Sign-in...")
-                    google_modal_close.click()
-                    time.sleep(2)
-            except Exception as e:
-                print(f"No se encontró modal de Google para cerrar: {e}")
-            
-            # Fallback inmediato: leer Opiniones destacadas sin abrir el modal
-            # Objetivo: superar rápidamente el umbral de 6 comentarios si ya están en el DOM
-            all_collected_comments = set()
-            comments_data = []
+            await page.wait_for_selector('.ui-review-capability__summary article', timeout=10000)
+        except PlaywrightTimeoutError:
             try:
-                print("Buscando opiniones destacadas en la página (sin modal)...")
-                summary_selector_list = [
-                    '.ui-review-capability__summary [data-testid="comments-component"] article[data-testid="comment-component"]',
-                    '.ui-review-capability__summary .ui-review-capability-comments article[data-testid="comment-component"]',
-                    '.ui-review-capability__summary .ui-review-capability-comments article'
-                ]
-                found_any = False
-                for sel in summary_selector_list:
-                    items = page.locator(sel).all()
-                    if len(items) > 0:
-                        print(f"  ✅ Encontrados {len(items)} artículos con '{sel}'")
-                        found_any = True
-                        for art in items:
-                            try:
-                                text = art.text_content()
-                                if text and len(text.strip()) > 50:
-                                    comment_id = text[:100].strip()
-                                    if comment_id in all_collected_comments:
-                                        continue
-                                    all_collected_comments.add(comment_id)
-                                    # Parseo simple (mismos patrones que abajo)
-                                    rating_match = re.search(r'Calificación (\d+) de 5', text)
-                                    rate = int(rating_match.group(1)) if rating_match else 0
-                                    date_match = re.search(r'(\d{1,2} \w+\. \d{4})', text)
-                                    date_text = date_match.group(1) if date_match else ""
-                                    content_parts = text.split(date_text)
-                                    if len(content_parts) > 1:
-                                        content = content_parts[1].strip()
-                                        content = re.sub(r'Es útil\d+.*$', '', content).strip()
-                                        content = re.sub(r'Más opciones$', '', content).strip()
-                                    else:
-                                        content = text.strip()
-                                    comments_data.append({
-                                        'text': text,
-                                        'id': comment_id,
-                                        'rate': rate,
-                                        'date': date_text,
-                                        'content': content,
-                                        'extracted_immediately': True
-                                    })
-                            except Exception:
-                                continue
-                        break
-                print(f"  📊 Opiniones destacadas recolectadas: {len(comments_data)}")
-                # Si ya superamos 6 (más que lo actual), devolvemos directamente
-                if len(comments_data) > 6:
-                    print("✅ Suficientes comentarios desde el summary, sin abrir el modal")
-                    for i, comment_data in enumerate(comments_data[:count]):
-                        try:
-                            rate = comment_data.get('rate', 0)
-                            date_text = comment_data.get('date', '')
-                            content = comment_data.get('content', '')
-                            title = content[:50] + "..." if len(content) > 50 else content
-                            review_data = {
-                                "id": f"R{item_id}{i+1}",
-                                "rate": rate,
-                                "title": title,
-                                "content": content,
-                                "date_created": date_text,
-                                "reviewer_id": f"user_{i+1}",
-                                "likes": 0,
-                                "dislikes": 0,
-                            }
-                            reviews.append(review_data)
-                            print(f"  📄 Review {i+1}: {title[:60]}... (Rating: {rate})")
-                        except Exception:
-                            continue
-                    return reviews
-            except Exception as e:
-                print(f"  ⚠️ No se pudieron leer opiniones destacadas: {e}")
+                await page.wait_for_selector('button:has-text("Mostrar todas las opiniones")', timeout=5000)
+            except PlaywrightTimeoutError:
+                print("⚠️ Opiniones no detectadas en la página, continuando...")
+        
+        # Si la carga de la página ya trajo suficientes reviews por su API, no hace falta el DOM
+        if len(api_comments_data) >= count:
+            print(f"✅ {len(api_comments_data)} reviews capturadas de la API de la página, sin scroll ni modal")
+            return _comments_to_reviews(item_id, api_comments_data, count)
+        
+        # Cerrar cualquier modal de Google Sign-in que pueda aparecer
+        try:
+            google_modal_close = page.locator('button[aria-label="Close"], .google-modal button, [data-testid="close-button"]').first
+            if await google_modal_close.is_visible():
+                print("Cerrando modal de Google Sign-in...")
+                await google_modal_close.click()
+                try:
+                    await google_modal_close.wait_for(state="hidden", timeout=2000)
+                except PlaywrightTimeoutError:
+                    pass
+        except Exception as e:
+            print(f"No se encontró modal de Google para cerrar: {e}")
+        
+        # Fallback inmediato: leer Opiniones destacadas sin abrir el modal
+        # Objetivo: superar rápidamente el umbral de 6 comentarios si ya están en el DOM
+        # Comentarios por id: deduplica y conserva el orden en una sola estructura
+        comments_by_id: Dict[str, dict] = {}
+        try:
+            print("Buscando opiniones destacadas en la página (sin modal)...")
+            summary_selector_list = [
+                '.ui-review-capability__summary [data-testid="comments-component"] article[data-testid="comment-component"]',
+                '.ui-review-capability__summary .ui-review-capability-comments article[data-testid="comment-component"]',
+                '.ui-review-capability__summary .ui-review-capability-comments article'
+            ]
+            found_any = False
+            for sel in summary_selector_list:
+                # Todos los textos en un solo round-trip, en lugar de un text_content() por artículo
+                texts = await page.eval_on_selector_all(sel, ARTICLE_TEXTS_JS)
+                if len(texts) > 0:
+                    print(f"  ✅ Encontrados {len(texts)} artículos con '{sel}'")
+                    found_any = True
+                    for text in texts:
+                        if text and len(text.strip()) > 50:
+                            comment_id = text[:100].strip()
+                            if comment_id not in comments_by_id:
+                                comments_by_id[comment_id] = _parse_comment_text(text, comment_id)
+                    break
+            print(f"  📊 Opiniones destacadas recolectadas: {len(comments_by_id)}")
+            # Si ya superamos 6 (más que lo actual), devolvemos directamente
+            if len(comments_by_id) > 6:
+                print("✅ Suficientes comentarios desde el summary, sin abrir el modal")
+                return _comments_to_reviews(item_id, list(comments_by_id.values()), count)
+        except Exception as e:
+            print(f"  ⚠️ No se pudieron leer opiniones destacadas: {e}")
 
-            # Intentar hacer click en "Mostrar todas las opiniones" para abrir el modal
-            try:
-                print("Buscando botón 'Mostrar todas las opiniones'...")
-                all_opinions_button = page.locator('button:has-text("Mostrar todas las opiniones")').first
-                if all_opinions_button.is_visible():
-                    print("Botón encontrado, scrolleando hacia él...")
-                    # Scroll hacia el botón para asegurar que es clickeable
-                    all_opinions_button.scroll_into_view_if_needed()
-                    time.sleep(2)
-                    
-                    print("Haciendo click en 'Mostrar todas las opiniones' para abrir modal...")
-                    # Múltiples estrategias de click
-                    try:
-                        all_opinions_button.click()
-                    except:
-                        # Si falla, intentar con fuerza
-                        all_opinions_button.click(force=True)
-                    
-                    print("Esperando que se abra el modal...")
-                    time.sleep(8)  # Más tiempo para que se abra el modal
-                    
-                    # Verificar si se abrió el modal
-                    modal_check = page.locator('.andes-modal__content').first
-                    if modal_check.is_visible():
-                        print("✅ Modal abierto correctamente!")
-                    else:
-                        print("⚠️ Modal no detectado, pero continuando...")
+        # Intentar hacer click en "Mostrar todas las opiniones" para abrir el modal
+        try:
+            print("Buscando botón 'Mostrar todas las opiniones'...")
+            all_opinions_button = page.locator('button:has-text("Mostrar todas las opiniones")').first
+            if await all_opinions_button.is_visible():
+                print("Botón encontrado, scrolleando hacia él...")
+                # Scroll hacia el botón para asegurar que es clickeable (espera a que termine)
+                await all_opinions_button.scroll_into_view_if_needed()
+                
+                print("Haciendo click en 'Mostrar todas las opiniones' para abrir modal...")
+                # Múltiples estrategias de click
+                try:
+                    await all_opinions_button.click()
+                except:
+                    # Si falla, intentar con fuerza
+                    await all_opinions_button.click(force=True)
+                
+                print("Esperando que se abra el modal...")
+                try:
+                    await page.wait_for_selector('.andes-modal__content article', timeout=10000)
+                except PlaywrightTimeoutError:
+                    pass
+                
+                # Verificar si se abrió el modal
+                modal_check = page.locator('.andes-modal__content').first
+                if await modal_check.is_visible():
+                    print("✅ Modal abierto correctamente!")
                 else:
-                    print("Botón 'Mostrar todas las opiniones' no encontrado")
-            except Exception as e:
-                print(f"Error haciendo click en 'Mostrar todas las opiniones': {e}")
+                    print("⚠️ Modal no detectado, pero continuando...")
+            else:
+                print("Botón 'Mostrar todas las opiniones' no encontrado")
+        except Exception as e:
+            print(f"Error haciendo click en 'Mostrar todas las opiniones': {e}")
+        
+        # Buscar el modal de comentarios que se abrió
+        print("Buscando modal de comentarios...")
+        modal_container = None
+        
+        # Intentar diferentes selectores para el modal
+        modal_selectors = [
+            '.andes-modal__content',
+            '.ui-review-capability-modal',
+            '[data-testid="modal"]',
+            '.modal-content',
+            '.ui-review-capability-comments'
+        ]
+        
+        for selector in modal_selectors:
+            try:
+                modal = page.locator(selector).first
+                if await modal.is_visible():
+                    print(f"Modal encontrado con selector: {selector}")
+                    modal_container = modal
+                    break
+            except:
+                continue
+        
+        if modal_container:
+            print("Modal encontrado, haciendo scroll en el modal (como estaba funcionando)...")
             
-            # Buscar el modal de comentarios que se abrió
-            print("Buscando modal de comentarios...")
-            modal_container = None
+            # Comentarios únicos DURANTE el scroll, por id (la única estructura de deduplicación)
+            comments_by_id = {}
+
+            # Reviews ya leídas de window.__mlReviews (lo llena SNAPSHOT_OBSERVER_JS); su largo es el cursor
+            persisted = []
             
-            # Intentar diferentes selectores para el modal
-            modal_selectors = [
-                '.andes-modal__content',
-                '.ui-review-capability-modal',
-                '[data-testid="modal"]',
-                '.modal-content',
-                '.ui-review-capability-comments'
-            ]
+            # Selector de comentarios: se detecta en el primer scroll que encuentra alguno
+            comments_selector = None
             
-            for selector in modal_selectors:
+            # EL SCROLL ORIGINAL QUE FUNCIONABA - reforzado sobre contenedor de comentarios
+            for i in range(12):  # subir intentos para asegurar carga incremental
+                # RECOLECTAR COMENTARIOS que están visibles AHORA, en un solo round-trip
+                new_count = dup_count = short_count = 0
                 try:
-                    modal = page.locator(selector).first
-                    if modal.is_visible():
-                        print(f"Modal encontrado con selector: {selector}")
-                        modal_container = modal
-                        break
-                except:
-                    continue
-            
-            if modal_container:
-                print("Modal encontrado, haciendo scroll en el modal (como estaba funcionando)...")
+                    visible = await page.evaluate(VISIBLE_COMMENTS_JS, comments_selector)
+                    if comments_selector is None and visible['selector']:
+                        comments_selector = visible['selector']
+                        print(f"  ✅ Usando selector '{comments_selector}' con {len(visible['texts'])} elementos")
+                    for text in visible['texts']:
+                        if len(text.strip()) <= 50:
+                            short_count += 1
+                            continue
+                        comment_id = text[:100].strip()
+                        if comment_id in comments_by_id:
+                            dup_count += 1
+                            continue
+                        comment_data = comments_by_id[comment_id] = _parse_comment_text(text, comment_id)
+                        new_count += 1
+                        log.debug("  💬 NUEVO #%d: Rating %s - %s...", len(comments_by_id), comment_data['rate'], comment_data['content'][:30])
+                except Exception as e:
+                    print(f"  ❌ Error buscando comentarios: {e}")
+                # Un resumen por scroll en lugar de una línea por comentario
+                print(f"Scroll en modal {i+1}/12: +{new_count} nuevos, {dup_count} repetidos, {short_count} cortos")
                 
-                # Conjunto para almacenar comentarios únicos DURANTE el scroll
-                all_collected_comments = set()
-                comments_data = []
-                api_comments_data = []  # Fallback vía API capturada
+                # Firma antes del scroll, para esperar solo hasta que aparezcan comentarios nuevos
+                signature_selector = comments_selector or DEFAULT_COMMENTS_SELECTOR
+                signature = await _comments_signature(page, signature_selector)
+                
+                # EL SCROLL ORIGINAL QUE FUNCIONABA
+                try:
+                    await modal_container.evaluate("element => element.scrollTop += 1000")
+                except Exception:
+                    pass
+                
+                # Intentar scroll específico en el contenedor de comentarios
                 try:
-                    def _try_parse_api_review(obj):
+                    comments_container_strict = modal_container.locator('.ui-review-capability-comments').first
+                    if await comments_container_strict.is_visible():
+                        # foco y scroll del contenedor real
                         try:
-                            # Intentar mapear estructuras comunes
-                            rate = int(obj.get('rating', obj.get('rate', 0)) or 0)
-                            content = obj.get('content') or obj.get('comment') or obj.get('text') or ''
-                            date_text = obj.get('date_created') or obj.get('date') or obj.get('created_at') or ''
-                            if content and len(content.strip()) > 10:
-                                return {
-                                    'text': content,
-                                    'id': (content[:80] + str(rate)).strip(),
-                                    'rate': rate,
-                                    'date': str(date_text),
-                                    'content': content.strip(),
-                                    'extracted_immediately': True
-                                }
+                            await comments_container_strict.focus()
                         except Exception:
-                            return None
-                        return None
-
-                    def _on_response(response):
+                            pass
+                        await comments_container_strict.evaluate("el => el.scrollTop += 1200")
                         try:
-                            url_l = response.url.lower()
-                            if ('review' in url_l or 'opinion' in url_l) and 'image' not in url_l:
-                                ctype = response.headers.get('content-type', '')
-                                if 'application/json' in ctype:
-                                    data = response.json()
-                                    candidates = []
-                                    if isinstance(data, dict):
-                                        for key in ['reviews', 'results', 'list', 'data', 'items']:
-                                            if isinstance(data.get(key), list):
-                                                candidates = data.get(key)
-                                                break
-                                        # Algunas APIs anidan en data.results
-                                        if not candidates and isinstance(data.get('data'), dict) and isinstance(data['data'].get('results'), list):
-                                            candidates = data['data']['results']
-                                    if isinstance(data, list):
-                                        candidates = data
-                                    added_now = 0
-                                    for obj in candidates or []:
-                                        parsed = _try_parse_api_review(obj)
-                                        if parsed:
-                                            key = parsed['id']
-                                            if key not in all_collected_comments:
-                                                all_collected_comments.add(key)
-                                                api_comments_data.append(parsed)
-                                                added_now += 1
-                                    if added_now:
-                                        print(f"  🌐 API: capturadas {added_now} nuevas reviews (total API {len(api_comments_data)})")
+                            await comments_container_strict.hover()
+                            await page.mouse.wheel(0, 1200)
+                        except Exception:
+                            pass
+                        # key End para forzar virtualización
+                        try:
+                            await page.keyboard.press('End')
                         except Exception:
                             pass
-
-                    page.on('response', _on_response)
                 except Exception:
                     pass
-
-                # Inicializar colector persistente en el contexto de la página (evita pérdida por virtualización)
+                
+                # Esperar a que el scroll renderice comentarios nuevos (no una pausa fija)
+                await _wait_for_comments_change(page, signature_selector, signature, timeout=2000)
+                
+                # Botón de "Cargar más" (por texto o, si no hay, por data-testid)
                 try:
-                    page.evaluate("""
-                        (() => {
-                          if (!window.__mlReviewsSet) { window.__mlReviewsSet = new Set(); }
-                          if (!window.__mlReviews) { window.__mlReviews = []; }
-                        })();
-                    """)
+                    button = modal_container.locator(LOAD_MORE_SELECTOR).first
+                    if not await button.count():
+                        button = modal_container.locator(LOAD_MORE_TESTID_SELECTOR).filter(has_text=LOAD_MORE_TEXT_RE).first
+                    if await button.count():
+                        print("  Haciendo click en botón de cargar más...")
+                        before = await _comments_signature(page, signature_selector)
+                        await button.click(timeout=2000)
+                        await _wait_for_comments_change(page, signature_selector, before, timeout=5000)
                 except Exception:
                     pass
-                
-                # EL SCROLL ORIGINAL QUE FUNCIONABA - reforzado sobre contenedor de comentarios
-                for i in range(12):  # subir intentos para asegurar carga incremental
-                    print(f"Scroll en modal {i+1}/3...")
-                    
-                    # DEBUG: Pausa manual para inspeccionar
-                    if i == 0:  # Solo en el primer scroll
-                        print("🔍 PAUSA DEBUG: Presiona Enter para continuar...")
-  
-                    
-                    # RECOLECTAR COMENTARIOS que están visibles AHORA (NUEVO)
-                    try:
-                        # ESPERAR y REFRESCAR para que se rendericen nuevos elementos
-                        page.wait_for_timeout(1000)  # Pausa para renderizado
-                        
-                        # INVESTIGAR el contenedor principal MÁS A FONDO
-                        print(f"  🔍 DEBUG PROFUNDO:")
-                        
-                        # ¿Cuántos contenedores hay?
-                        all_containers = page.locator('.ui-review-capability-comments').all()
-                        print(f"      - Total contenedores .ui-review-capability-comments: {len(all_containers)}")
-                        
-                        # Investigar cada contenedor
-                        for idx, container in enumerate(all_containers):
-                            if container.is_visible():
-                                print(f"      - Contenedor {idx+1} (visible):")
-                                all_divs = container.locator('> div').all()
-                                all_articles = container.locator('article').all()
-                                all_children = container.locator('> *').all()
-                                
-                                print(f"          * Divs directos: {len(all_divs)}")
-                                print(f"          * Articles: {len(all_articles)}")
-                                print(f"          * Todos los hijos: {len(all_children)}")
-                                
-                                # Obtener el HTML para verificar
-                                try:
-                                    html_content = container.inner_html()
-                                    div_count_in_html = html_content.count('<div')
-                                    article_count_in_html = html_content.count('<article')
-                                    print(f"          * En HTML: {div_count_in_html} <div>, {article_count_in_html} <article>")
-                                except:
-                                    print(f"          * No se pudo obtener HTML")
-                            else:
-                                print(f"      - Contenedor {idx+1} (NO visible)")
-                        
-                        # Usar el primer contenedor visible
-                        container = page.locator('.ui-review-capability-comments').first
-                        if container.is_visible():
-                            all_divs = container.locator('> div').all()
-                            all_articles = container.locator('article').all()
-                            all_children = container.locator('> *').all()
-                        else:
-                            print(f"      ❌ NINGÚN contenedor visible!")
-                            all_divs = []
-                            all_articles = []
-                            all_children = []
-                        
-                        # Probar múltiples selectores DENTRO del contenedor
-                        current_comments = page.locator('.ui-review-capability-comments__comment').all()
-                        alt_comments1 = page.locator('article[data-testid="comment-component"]').all()
-                        alt_comments2 = page.locator('article[aria-roledescription="Review"]').all()
-                        
-                        # NUEVO: Probar selectores más amplios DENTRO del contenedor
-                        container_articles = page.locator('.ui-review-capability-comments article').all()
-                        container_divs = page.locator('.ui-review-capability-comments > div').all()
-                        
-                        print(f"  🔍 Selectores específicos:")
-                        print(f"      - .ui-review-capability-comments__comment: {len(current_comments)}")
-                        print(f"      - article[data-testid='comment-component']: {len(alt_comments1)}")
-                        print(f"      - article[aria-roledescription='Review']: {len(alt_comments2)}")
-                        print(f"  🔍 Selectores amplios:")
-                        print(f"      - .ui-review-capability-comments article: {len(container_articles)}")
-                        print(f"      - .ui-review-capability-comments > div: {len(container_divs)}")
-                        
-                        # Usar el selector que encuentre MÁS elementos
-                        all_selectors = [
-                            (current_comments, "principal (.ui-review-capability-comments__comment)"),
-                            (alt_comments1, "data-testid"), 
-                            (alt_comments2, "aria-role"),
-                            (container_articles, "container articles"),
-                            (container_divs, "container divs")
-                        ]
-                        
-                        best_comments, best_name = max(all_selectors, key=lambda x: len(x[0]))
-                        current_comments = best_comments
-                        
-                        if len(current_comments) > 5:
-                            print(f"  ✅ Usando selector '{best_name}' con {len(current_comments)} elementos!")
-                        else:
-                            print(f"  ⚠️ Usando selector '{best_name}' pero solo {len(current_comments)} elementos")
-                        
-                        for j, comment in enumerate(current_comments):
-                            try:
-                                # EXTRAER INMEDIATAMENTE todo el contenido antes de que se reemplace
-                                text = comment.text_content()
-                                if text and len(text.strip()) > 50:
-                                    comment_id = text[:100].strip()
-                                    if comment_id not in all_collected_comments:
-                                        all_collected_comments.add(comment_id)
-                                        
-                                        # EXTRAER INMEDIATAMENTE todos los datos del comentario
-                                        # No guardar el elemento DOM, guardar todos los datos
-                                        try:
-                                            # Extraer rating
-                                            rating_match = re.search(r'Calificación (\d+) de 5', text)
-                                            rate = int(rating_match.group(1)) if rating_match else 0
-                                            
-                                            # Extraer fecha
-                                            date_match = re.search(r'(\d{1,2} \w+\. \d{4})', text)
-                                            date_text = date_match.group(1) if date_match else ""
-                                            
-                                            # Extraer contenido del comentario
-                                            content_parts = text.split(date_text)
-                                            if len(content_parts) > 1:
-                                                content = content_parts[1].strip()
-                                                # Limpiar texto
-                                                content = re.sub(r'Es útil\d+.*$', '', content).strip()
-                                                content = re.sub(r'Más opciones$', '', content).strip()
-                                            else:
-                                                content = text.strip()
-                                            
-                                            comments_data.append({
-                                                'text': text,
-                                                'id': comment_id,
-                                                'rate': rate,
-                                                'date': date_text,
-                                                'content': content,
-                                                'extracted_immediately': True  # Marcador de que fue extraído inmediatamente
-                                            })
-                                            print(f"  💬 NUEVO #{len(comments_data)}: Rating {rate} - {content[:30]}...")
-                                        except Exception as parse_error:
-                                            # Si falla el parsing, guardar el texto crudo
-                                            comments_data.append({
-                                                'text': text,
-                                                'id': comment_id,
-                                                'rate': 0,
-                                                'date': '',
-                                                'content': text.strip(),
-                                                'extracted_immediately': True
-                                            })
-                                            print(f"  💬 NUEVO #{len(comments_data)} (parsing falló): {comment_id[:30]}...")
-                                    else:
-                                        print(f"  🔄 Comentario {j+1} ya visto: {comment_id[:30]}...")
-                                else:
-                                    print(f"  ⚠️ Comentario {j+1} muy corto o vacío")
-                            except Exception as e:
-                                print(f"  ❌ Error procesando comentario {j+1}: {e}")
-                    except Exception as e:
-                        print(f"  ❌ Error buscando comentarios: {e}")
-                    
-                    # EL SCROLL ORIGINAL QUE FUNCIONABA
-                    try:
-                        modal_container.evaluate("element => element.scrollTop += 1000")
-                    except Exception:
-                        pass
-                    page.wait_for_timeout(500)
-                    
-                    # Intentar scroll específico en el contenedor de comentarios
-                    try:
-                        comments_container_strict = modal_container.locator('.ui-review-capability-comments').first
-                        if comments_container_strict.is_visible():
-                            # foco y scroll del contenedor real
-                            try:
-                                comments_container_strict.focus()
-                            except Exception:
-                                pass
-                            comments_container_strict.evaluate("el => el.scrollTop += 1200")
-                            page.wait_for_timeout(400)
-                            try:
-                                comments_container_strict.hover()
-                                page.mouse.wheel(0, 1200)
-                            except Exception:
-                                pass
-                            # key End para forzar virtualización
-                            try:
-                                page.keyboard.press('End')
-                            except Exception:
-                                pass
-                    except Exception:
-                        pass
-                    
-                    # Buscar botones de "Cargar más" que puedan aparecer (ORIGINAL)
-                    try:
-                        load_more_buttons = modal_container.locator('button:has-text("Cargar más"), button:has-text("Ver más"), button:has-text("Mostrar más")').all()
-                        for button in load_more_buttons:
-                            if button.is_visible():
-                                print(f"  Haciendo click en botón de cargar más...")
-                                button.click()
-                                time.sleep(2)
-                                break
-                    except Exception as e:
-                        pass
-                    
-                    # Buscar botones de "Cargar más" dentro del modal con más selectores (ORIGINAL)
-                    try:
-                        button_texts = [
-                            "Cargar más", "Ver más", "Mostrar más", "Cargar más comentarios", 
-                            "Ver más comentarios", "Mostrar más comentarios", "Cargar más opiniones",
-                            "Ver más opiniones", "Mostrar más opiniones", "Ver todas las opiniones"
-                        ]
-                        
-                        for text in button_texts:
-                            buttons = modal_container.locator(f'button:has-text("{text}")').all()
-                            for button in buttons:
-                                if button.is_visible():
-                                    print(f"Haciendo click en botón '{text}' dentro del modal...")
-                                    button.click()
-                                    time.sleep(3)
-                                    break
-                            else:
-                                continue
-                            break
-                    except Exception as e:
-                        pass
-                    
-                    # También buscar botones por atributos data-testid (ORIGINAL)
-                    try:
-                        testid_buttons = modal_container.locator('[data-testid*="load"], [data-testid*="more"], [data-testid*="button"]').all()
-                        for button in testid_buttons:
-                            if button.is_visible() and button.text_content():
-                                text = button.text_content().strip()
-                                if any(keyword in text.lower() for keyword in ['cargar', 'ver', 'mostrar', 'más']):
-                                    print(f"Haciendo click en botón por testid: {text}")
-                                    button.click()
-                                    time.sleep(3)
-                                    break
-                    except Exception as e:
-                        pass
-                
-                    # Snapshot persistente de artículos visibles (acumula en window.__mlReviews)
-                    try:
-                        added_now = page.evaluate("""
-                          () => {
-                            const modal = document.querySelector('.andes-modal__content');
-                            if (!modal) return 0;
-                            const container = modal.querySelector('.ui-review-capability-comments') || modal;
-                            const articles = container.querySelectorAll('article[data-testid="comment-component"], article[aria-roledescription="Review"]');
-                            if (!window.__mlReviewsSet) window.__mlReviewsSet = new Set();
-                            if (!window.__mlReviews) window.__mlReviews = [];
-                            let added = 0;
-                            for (const a of articles) {
-                              const text = (a.textContent || '').trim();
-                              if (text.length < 50) continue;
-                              const id = text.slice(0, 120).trim();
-                              if (window.__mlReviewsSet.has(id)) continue;
-                              // Parse rating y fecha simples
-                              let rate = 0; const m = text.match(/Calificación\s+(\d+)\s+de\s+5/i); if (m) rate = parseInt(m[1], 10) || 0;
-                              let date = ''; const d = text.match(/\b\d{1,2}\s+\w+\.?\s+\d{4}\b/); if (d) date = d[0];
-                              let content = text;
-                              if (date) { const parts = text.split(date); content = parts.slice(1).join(' ').trim(); }
-                              // Limpiar UI común
-                              content = content.replace(/Es útil\s*\d+.*/i, '').replace(/Más opciones.*/i, '').trim();
-                              window.__mlReviewsSet.add(id);
-                              window.__mlReviews.push({ id, rate, date, content, extracted_immediately: true });
-                              added++;
-                            }
-                            return added;
-                          }
-                        """)
-                        if added_now:
-                            print(f"  🧩 Snapshot sumó {added_now} nuevos (persistentes)")
-                    except Exception:
-                        pass
-
-                    # Intentar paginación dentro del modal (Siguiente)
-                    try:
-                        next_selectors = [
-                            '.andes-pagination [aria-label="Siguiente"]:not([disabled])',
-                            'button[aria-label="Siguiente"]:not([disabled])',
-                            'a[aria-label="Siguiente"]',
-                            '.ui-pagination__link:has-text("Siguiente")',
-                            '.andes-button:has-text("Siguiente")'
-                        ]
-                        clicked = False
-                        for sel in next_selectors:
-                            btn = modal_container.locator(sel).first
-                            if btn.count() > 0 and btn.is_visible():
-                                print(f"  ➡️ Paginando con: {sel}")
-                                try:
-                                    btn.click()
-                                except Exception:
-                                    btn.click(force=True)
-                                page.wait_for_timeout(1500)
-                                clicked = True
-                                break
-                        if not clicked:
-                            # si no hay siguiente y ya agregamos algunos, podemos terminar antes
-                            pass
-                    except Exception:
-                        pass
-
-                print(f"\n🎯 SCROLL COMPLETADO: {len(comments_data)} comentarios únicos recolectados")
-                if api_comments_data:
-                    print(f"  🌐 Además, vía API capturadas {len(api_comments_data)} reviews")
-                    # Mezclar API con DOM manteniendo unicidad
-                    for r in api_comments_data:
-                        key = r['id']
-                        if key not in all_collected_comments:
-                            all_collected_comments.add(key)
-                            comments_data.append(r)
-
-                # Mezclar los del snapshot persistente
+            
+                # El observer ya acumuló en window.__mlReviews: se leen solo las nuevas
                 try:
-                    persisted = page.evaluate("() => (window.__mlReviews || [])")
-                    if persisted:
-                        added_from_persist = 0
-                        for r in persisted:
-                            key = r.get('id') if isinstance(r, dict) else None
-                            if not key:
-                                continue
-                            if key not in all_collected_comments:
-                                all_collected_comments.add(key)
-                                # asegurar campos esperados
-                                comments_data.append({
-                                    'text': r.get('content', ''),
-                                    'id': key,
-                                    'rate': r.get('rate', 0),
-                                    'date': r.get('date', ''),
-                                    'content': r.get('content', ''),
-                                    'extracted_immediately': True
-                                })
-                                added_from_persist += 1
-                        if added_from_persist:
-                            print(f"  📌 Persistente sumó {added_from_persist} nuevos (total {len(comments_data)})")
+                    delta = await page.evaluate(SNAPSHOT_DELTA_JS, len(persisted))
+                    if delta:
+                        persisted.extend(delta)
+                        print(f"  🧩 Snapshot sumó {len(delta)} nuevos (persistentes)")
                 except Exception:
                     pass
-                
-                # Usar los comentarios recolectados durante el scroll
-                # Ya tenemos los datos extraídos, no necesitamos elementos DOM
-                cards = comments_data  # Son dictionaries con todos los datos ya extraídos
-            else:
-                print("Modal no encontrado, intentando scroll en contenedor principal...")
-                
-                # Fallback: buscar el contenedor de comentarios en la página principal
-                comments_container = page.locator('.ui-review-capability-comments').first
-                
-                if comments_container.is_visible():
-                    print("Contenedor de comentarios encontrado en página principal...")
-                    for i in range(10):
-                        comments_container.evaluate("element => element.scrollTop = element.scrollHeight")
-                        time.sleep(2)
-                else:
-                    print("No se encontró contenedor de comentarios, usando scroll general...")
-                    for i in range(8):
-                        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        time.sleep(2)
+
+                # Intentar paginación dentro del modal (Siguiente)
+                try:
+                    btn = modal_container.locator(NEXT_PAGE_SELECTOR).first
+                    if await btn.count():
+                        print("  ➡️ Paginando a la página siguiente")
+                        before = await _comments_signature(page, signature_selector)
+                        try:
+                            # Timeout corto: si no es clickeable se fuerza, sin esperar los 30s por defecto
+                            await btn.click(timeout=2000)
+                        except Exception:
+                            await btn.click(force=True, timeout=2000)
+                        await _wait_for_comments_change(page, signature_selector, before, timeout=5000)
+                except Exception:
+                    pass
+
+            print(f"\n🎯 SCROLL COMPLETADO: {len(comments_by_id)} comentarios únicos recolectados")
+            if api_comments_data:
+                print(f"  🌐 Además, vía API capturadas {len(api_comments_data)} reviews")
+                # Mezclar API con DOM manteniendo unicidad (gana lo leído del DOM)
+                for r in api_comments_data:
+                    comments_by_id.setdefault(r['id'], r)
+
+            # Mezclar los del snapshot persistente
+            try:
+                persisted.extend(await page.evaluate(SNAPSHOT_DELTA_JS, len(persisted)))
+            except Exception:
+                pass
+            # Ya vienen deduplicadas por __mlReviewsSet; sus ids (120 caracteres) no
+            # coinciden con los del scroll (100)
+            added_from_persist = 0
+            for r in persisted:
+                key = r.get('id') if isinstance(r, dict) else None
+                if not key:
+                    continue
+                # asegurar campos esperados
+                comments_by_id[key] = {
+                    'text': r.get('content', ''),
+                    'id': key,
+                    'rate': r.get('rate', 0),
+                    'date': r.get('date', ''),
+                    'content': r.get('content', ''),
+                    'extracted_immediately': True
+                }
+                added_from_persist += 1
+            if added_from_persist:
+                print(f"  📌 Persistente sumó {added_from_persist} nuevos (total {len(comments_by_id)})")
             
-            # Ya recolectamos durante el scroll, solo mostrar resumen
-            print(f"\n📊 Total de comentarios recolectados durante el scroll: {len(cards)}")
+            # Usar los comentarios recolectados durante el scroll
+            # Ya tenemos los datos extraídos, no necesitamos elementos DOM
+            cards = list(comments_by_id.values())  # Son dictionaries con todos los datos ya extraídos
+        else:
+            print("Modal no encontrado, intentando scroll en contenedor principal...")
             
-            # Mostrar muestra de los primeros comentarios
-            if len(cards) > 0:
-                print("\n📝 Muestra de comentarios recolectados:")
-                for i, comment_data in enumerate(cards[:5]):
-                    try:
-                        if isinstance(comment_data, dict):
-                            # Los datos ya están extraídos
-                            content = comment_data.get('content', 'Sin contenido')
-                            rate = comment_data.get('rate', 0)
-                            print(f"  {i+1}. Rating {rate}: {content[:100]}...")
-                        else:
-                            # Fallback por si acaso
-                            text = comment_data.text_content()
-                            print(f"  {i+1}. {text[:100]}...")
-                    except Exception as e:
-                        print(f"  {i+1}. Error obteniendo texto: {e}")
+            # Fallback: buscar el contenedor de comentarios en la página principal
+            comments_container = page.locator('.ui-review-capability-comments').first
             
-            for i, comment_data in enumerate(cards[:count]):
+            if await comments_container.is_visible():
+                print("Contenedor de comentarios encontrado en página principal...")
+                for i in range(10):
+                    before = await _comments_signature(page, DEFAULT_COMMENTS_SELECTOR)
+                    await comments_container.evaluate("element => element.scrollTop = element.scrollHeight")
+                    await _wait_for_comments_change(page, DEFAULT_COMMENTS_SELECTOR, before, timeout=2000)
+            else:
+                print("No se encontró contenedor de comentarios, usando scroll general...")
+                for i in range(8):
+                    before = await _comments_signature(page, DEFAULT_COMMENTS_SELECTOR)
+                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                    await _wait_for_comments_change(page, DEFAULT_COMMENTS_SELECTOR, before, timeout=2000)
+        
+        # Ya recolectamos durante el scroll, solo mostrar resumen
+        print(f"\n📊 Total de comentarios recolectados durante el scroll: {len(cards)}")
+        
+        # Mostrar muestra de los primeros comentarios
+        if len(cards) > 0:
+            print("\n📝 Muestra de comentarios recolectados:")
+            for i, comment_data in enumerate(cards[:5]):
                 try:
-                    if isinstance(comment_data, dict) and comment_data.get('extracted_immediately'):
-                        # Usar los datos ya extraídos durante el scroll
+                    if isinstance(comment_data, dict):
+                        # Los datos ya están extraídos
+                        content = comment_data.get('content', 'Sin contenido')
                         rate = comment_data.get('rate', 0)
-                        date_text = comment_data.get('date', '')
-                        content = comment_data.get('content', '')
-                        title = content[:50] + "..." if len(content) > 50 else content
+                        print(f"  {i+1}. Rating {rate}: {content[:100]}...")
                     else:
-                        # Fallback: extraer de elemento DOM (no debería pasar)
-                        text = comment_data.text_content() if hasattr(comment_data, 'text_content') else str(comment_data)
-                        
-                        # Parsear rating
-                        rating_match = re.search(r'Calificación (\d+) de 5', text)
-                        rate = int(rating_match.group(1)) if rating_match else 0
-                        
-                        # Parsear fecha
-                        date_match = re.search(r'(\d{1,2} \w+\. \d{4})', text)
-                        date_text = date_match.group(1) if date_match else ""
-                        
-                        # Extraer contenido
-                        content_parts = text.split(date_text)
-                        content = content_parts[1].strip() if len(content_parts) > 1 else text
-                        content = re.sub(r'^Calificación \d+ de 5\s*', '', content)
-                        content = re.sub(r'^\d{1,2} \w+\. \d{4}\s*', '', content)
-                        content = content.strip()
-                        
-                        # Crear título basado en el contenido
-                        title = content[:50] + "..." if len(content) > 50 else content
-                    
-                    review_data = {
-                        "id": f"R{item_id}{i+1}",
-                        "rate": rate,
-                        "title": title,
-                        "content": content,
-                        "date_created": date_text,
-                        "reviewer_id": f"user_{i+1}",
-                        "likes": 0,
-                        "dislikes": 0,
-                    }
+                        # Fallback por si acaso
+                        text = await comment_data.text_content()
+                        print(f"  {i+1}. {text[:100]}...")
+                except Exception as e:
+                    print(f"  {i+1}. Error obteniendo texto: {e}")
+        
+        for i, comment_data in enumerate(cards[:count]):
+            try:
+                if isinstance(comment_data, dict) and comment_data.get('extracted_immediately'):
+                    # Usar los datos ya extraídos durante el scroll
+                    rate = comment_data.get('rate', 0)
+                    date_text = comment_data.get('date', '')
+                    content = comment_data.get('content', '')
+                else:
+                    # Fallback: extraer de elemento DOM (no debería pasar)
+                    text = (await comment_data.text_content()) if hasattr(comment_data, 'text_content') else str(comment_data)
                     
-                    reviews.append(review_data)
-                    print(f"  📄 Review {i+1}: {title[:60]}... (Rating: {rate})")
+                    # Parsear rating
+                    rating_match = RATING_RE.search(text)
+                    rate = int(rating_match.group(1)) if rating_match else 0
                     
-                except Exception as e:
-                    print(f"Error procesando review {i+1}: {e}")
-                    continue
+                    # Parsear fecha
+                    date_match = DATE_RE.search(text)
+                    date_text = date_match.group(1) if date_match else ""
                     
-        except Exception as e:
-            print(f"Error general: {e}")
-        finally:
-            browser.close()
+                    # Extraer contenido
+                    _, sep, tail = text.partition(date_text) if date_text else ('', '', '')
+                    content = tail.strip() if sep else text
+                    content = RATING_PREFIX_RE.sub('', content)
+                    content = DATE_PREFIX_RE.sub('', content)
+                    content = content.strip()
+                
+                review_data = {
+                    "id": f"R{item_id}{i+1}",
+                    "rate": rate,
+                    "content": content,
+                    "date_created": date_text,
+                    "reviewer_id": f"user_{i+1}",
+                    "likes": 0,
+                    "dislikes": 0,
+                }
+                
+                reviews.append(review_data)
+                print(f"  📄 Review {i+1}: {content[:50]}... (Rating: {rate})")
+                
+            except Exception as e:
+                print(f"Error procesando review {i+1}: {e}")
+                continue
+                
+    except Exception as e:
+        print(f"Error general: {e}")
     
     return reviews
 
 
+def _ensure_product(db, item_id: str, site_id_hint, title_hint) -> None:
+    # Get or create product
+    prod = db.get(Product, item_id)
+    if prod is None:
+        print(f"Creando producto {item_id}...")
+        prod = Product(
+            id=item_id,
+            title=title_hint or f"Item {item_id}",
+            price=0.0,
+            site_id=site_id_hint or "MLA",
+            currency_id="ARS",
+            sold_quantity=0,
+            available_quantity=0,
+        )
+        db.add(prod)
+        db.flush()
+        print(f"✅ Producto creado: {prod.title}")
+
+
+def _review_title(content: str) -> str:
+    # El título se deriva del contenido recién al guardar, fuera de los loops de scraping
+    return f"{content[:50]}..." if len(content) > 50 else content
+
+
+# Campos de las reviews scrapeadas que ya quedan en columnas de reviews; en review_raw
+# se guarda solo el resto (y nada si no queda nada)
+_REVIEW_COLUMN_KEYS = frozenset({"id", "rate", "title", "content", "date_created", "reviewer_id", "likes", "dislikes"})
+
+
+def _store_reviews(db, item_id: str, reviews_data: List[dict]) -> int:
+    """
+    Guarda las reviews de un item con un solo INSERT ... ON CONFLICT (id) DO NOTHING.
+    
+    Las que ya existían quedan como estaban; devuelve cuántas se insertaron.
+    """
+    # Deduplicar por id: un mismo INSERT no puede tocar dos veces la misma fila
+    rows: Dict[str, dict] = {}
+    raw_by_id: Dict[str, dict] = {}
+    # Fecha de respaldo común a todo el lote, para las reviews sin fecha parseable
+    now = datetime.utcnow()
+    for review_data in reviews_data:
+        if review_data["id"] in rows:
+            continue
+        extra = {key: value for key, value in review_data.items() if key not in _REVIEW_COLUMN_KEYS}
+        if extra:
+            raw_by_id[review_data["id"]] = extra
+        
+        # Parsear fecha original de la API
+        original_date = now
+        if review_data.get("date_created"):
+            try:
+                # La API devuelve formato ISO: "2024-01-01T00:00:00Z"; ciso8601 lo parsea en C
+                original_date = ciso8601.parse_datetime(review_data["date_created"])
+            except (ValueError, TypeError):
+                # TypeError: valor no string (número, dict capturado del DOM, etc.)
+                pass
+        
+        rows[review_data["id"]] = {
+            "id": review_data["id"],
+            "product_id": item_id,
+            "rate": review_data["rate"],
+            "title": _review_title(review_data["content"]),
+            "content": review_data["content"],
+            "date_created": original_date,
+            "reviewer_id": review_data["reviewer_id"],
+            "likes": review_data["likes"],
+            "dislikes": review_data["dislikes"],
+            "sentiment_score": 0.0,
+            "sentiment_label": "neutral",
+            "date_text": review_data.get("date_created", ""),  # Guardar fecha original como texto
+        }
+    if not rows:
+        return 0
+    
+    stmt = (
+        dialect_insert(db, Review)
+        .values(list(rows.values()))
+        .on_conflict_do_nothing(index_elements=[Review.id])
+        .returning(Review.id)
+    )
+    inserted = db.scalars(stmt).all()
+    raw_rows = [{"review_id": review_id, "raw_json": raw_by_id[review_id]} for review_id in inserted if review_id in raw_by_id]
+    if raw_rows:
+        # Campos extra en review_raw, solo de las nuevas (misma transacción)
+        db.execute(
+            dialect_insert(db, ReviewRaw)
+            .values(raw_rows)
+            .on_conflict_do_nothing(index_elements=[ReviewRaw.review_id])
+        )
+    return len(inserted)
+
+
 def run_for_item(item_id: str, count: int, site_id_hint, title_hint) -> None:
+    run_for_items([(item_id, site_id_hint, title_hint)], count)
+
+
+def run_for_items(items: List[Tuple[str, Optional[str], Optional[str]]], count: int) -> None:
+    """
+    Scrapea y guarda reviews de varios items (item_id, site_id_hint, title_hint).
+    
+    Primero la API de todos los items en paralelo; el complemento por DOM de los que
+    quedaron cortos corre en paralelo sobre un único browser.
+    """
+    unique_items: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    for item_id, site_id_hint, title_hint in items:
+        unique_items.setdefault(item_id, (site_id_hint, title_hint))
     with get_session() as db:
-        # Get or create product
-        prod = db.get(Product, item_id)
-        if prod is None:
-            print(f"Creando producto {item_id}...")
-            prod = Product(
-                id=item_id,
-                title=title_hint or f"Item {item_id}",
-                price=0.0,
-                site_id=site_id_hint or "MLA",
-                currency_id="ARS",
-                sold_quantity=0,
-                available_quantity=0,
-            )
-            db.add(prod)
-            db.flush()
-            print(f"✅ Producto creado: {prod.title}")
-        
-        # Scrape via API primero (más robusto y masivo)
-        print(f"Obteniendo reviews via API para {item_id}...")
-        api_reviews = scrape_reviews_via_api(item_id, site_id_hint or "MLA", count)
-        reviews_data = api_reviews
-        # Si la API devolvió menos de las pedidas, intentar complementar con DOM
+        for item_id, (site_id_hint, title_hint) in unique_items.items():
+            _ensure_product(db, item_id, site_id_hint, title_hint)
+    
+    # Scrape via API primero (más robusto y masivo), todos los items en paralelo
+    print(f"Obteniendo reviews via API para {len(unique_items)} items...")
+    api_results = scrape_reviews_via_api_many(
+        [(item_id, site_id_hint, count) for item_id, (site_id_hint, _) in unique_items.items()]
+    )
+    
+    reviews_by_item: Dict[str, List[dict]] = {}
+    missing: Dict[str, int] = {}
+    for item_id, reviews_data in zip(unique_items, api_results):
+        reviews_by_item[item_id] = reviews_data
+        # Si la API devolvió menos de las pedidas, complementar con DOM
         if len(reviews_data) < count:
             print(f"API devolvió {len(reviews_data)} < {count}. Complementando con DOM...")
-            try:
-                dom_reviews = scrape_reviews_directly(item_id, count - len(reviews_data))
-                reviews_data.extend(dom_reviews)
-            except Exception as e:
-                print(f"DOM complementario falló: {e}")
-        
-        stored_count = 0
-        for review_data in reviews_data:
-            existing = db.get(Review, review_data["id"])
-            if existing:
-                continue
-                
-            # Parsear fecha original de la API
-            original_date = None
-            if "date_created" in review_data and review_data["date_created"]:
-                try:
-                    # La API devuelve formato ISO: "2024-01-01T00:00:00Z"
-                    original_date = datetime.fromisoformat(review_data["date_created"].replace('Z', '+00:00'))
-                except Exception:
-                    original_date = datetime.utcnow()
-            else:
-                original_date = datetime.utcnow()
-            
-            review = Review(
-                id=review_data["id"],
-                product_id=item_id,
-                rate=review_data["rate"],
-                title=review_data["title"],
-                content=review_data["content"],
-                date_created=original_date,
-                reviewer_id=review_data["reviewer_id"],
-                likes=review_data["likes"],
-                dislikes=review_data["dislikes"],
-                sentiment_score=0.0,
-                sentiment_label="neutral",
-                date_text=review_data.get("date_created", ""),  # Guardar fecha original como texto
-                raw_json=review_data,  # Guardar datos originales completos
-            )
-            db.add(review)
-            stored_count += 1
-        
-        print(f"✅ Guardadas {stored_count} reviews nuevas")
+            missing[item_id] = count - len(reviews_data)
+    
+    if missing:
+        try:
+            dom_reviews = asyncio.run(scrape_reviews_directly_async(missing))
+            for item_id, item_reviews in dom_reviews.items():
+                reviews_by_item[item_id].extend(item_reviews)
+        except Exception as e:
+            print(f"DOM complementario falló: {e}")
+    
+    for item_id, reviews_data in reviews_by_item.items():
+        with get_session() as db:
+            stored_count = _store_reviews(db, item_id, reviews_data)
+        print(f"✅ Guardadas {stored_count} reviews nuevas para {item_id}")
 
 
 def parse_args() -> argparse.Namespace:
@@ -877,11 +1200,13 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--url", action="append", default=[], help="MercadoLibre product URL")
     parser.add_argument("--urls-file", type=str, help="Path to file with URLs")
     parser.add_argument("--count", type=int, default=10, help="Number of reviews to fetch")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Log every collected comment while scrolling")
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    logging.basicConfig(format="%(message)s", level=logging.DEBUG if args.verbose else logging.WARNING)
     init_db()
     
     urls: List[str] = []
@@ -890,29 +1215,29 @@ def main() -> None:
     if args.urls_file:
         p = Path(args.urls_file)
         if p.exists():
-            with p.open("r", encoding="utf-8") as fh:
-                for line in fh:
-                    line = line.strip()
-                    if line:
-                        urls.append(line)
+            urls.extend(line.strip() for line in p.read_text(encoding="utf-8").splitlines() if line.strip())
     
     if not urls:
         raise SystemExit("Provide at least one --url or --urls-file")
     
-    seen: Set[str] = set()
+    # Deduplicar por item: la misma publicación con otros parámetros (?ref=...) se scrapea una vez
+    seen_items: Set[str] = set()
+    items: List[Tuple[str, Optional[str], Optional[str]]] = []
     for url in urls:
-        if url in seen:
+        item_id = extract_product_code(url)
+        if item_id in seen_items:
             continue
-        seen.add(url)
+        seen_items.add(item_id)
         
-        item_id = extract_product_code(url)
         site_id_hint, title_hint = extract_hints(url, item_id)
         
-        print(f"\n🚀 Procesando: {url}")
-        print(f"📋 Item ID: {item_id}")
-        
-        run_for_item(item_id, args.count, site_id_hint, title_hint)
-        print(f"✅ Completado: {item_id}")
+        print(f"🚀 {url} -> Item ID: {item_id}")
+        items.append((item_id, site_id_hint, title_hint))
+    
+    run_for_items(items, args.count)
+    # Un solo refresco de las estadísticas precalculadas para todo el lote
+    refresh_review_stats()
+    print(f"✅ Completados {len(items)} items")
 
 
 if __name__ == "__main__":
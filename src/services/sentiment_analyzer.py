@@ -5,18 +5,85 @@ Completa los campos sentiment_score y sentiment_label para reviews que no los te
 """
 
 import argparse
+import re
+from itertools import islice
 from datetime import datetime, date
-from typing import Optional, List
-from sqlalchemy import and_, or_
-from textblob import TextBlob
+from typing import Iterable, Iterator, Optional, List
+import ahocorasick
+from sqlalchemy import Row, and_, func, select, tuple_, update
 
-from src.models.database import get_session
+from src.models.database import get_session, refresh_review_stats
 from src.models.review import Review
 
 
+# Analizador VADER (léxico puro, sin tokenizar ni etiquetar POS); se carga recién al
+# analizar el primer texto, así --dry-run y quien solo importa el módulo no leen el léxico
+_analyzer = None
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+# Atajo para reviews con señales inequívocas: se clasifican sin pasar por el analizador
+_STRONG_POSITIVE_CUES = r"excelente|increíble|buenísim[oa]|recomendad[oa]|recomendable"
+_STRONG_NEGATIVE_CUES = r"pésim\w*|horribl\w*|malísim\w*"
+_STRONG_POSITIVE = re.compile(rf"\b(?:{_STRONG_POSITIVE_CUES})\b")
+_STRONG_NEGATIVE = re.compile(rf"\b(?:{_STRONG_NEGATIVE_CUES}|no funciona|no (?:lo |la )?recomiendo)\b")
+
+
+def _negated(cues: str) -> re.Pattern:
+    """Negador hasta dos palabras antes de la señal ("no es recomendable", "nada pésimo")"""
+    return re.compile(rf"\b(?:no|nada|nunca|ni)\s+(?:\w+\s+){{0,2}}(?:{cues})\b")
+
+
+_NEGATED_POSITIVE = _negated(_STRONG_POSITIVE_CUES)
+_NEGATED_NEGATIVE = _negated(_STRONG_NEGATIVE_CUES)
+
+# Palabras clave en español para ajustar el análisis
+_POSITIVE_WORDS = frozenset((
+    'excelente', 'perfecto', 'genial', 'fantástico', 'increíble', 'maravilloso',
+    'recomendado', 'bueno', 'buena', 'buen', 'buenas', 'buenos', 'súper',
+    'perfecta', 'maravillosa', 'fantástica', 'cumple', 'cumplió', 'superó', 'excede', 'excedió', 'mejor', 'mejora',
+    'feliz', 'contento', 'satisfecho', 'satisfecha', 'recomiendo', 'recomienda',
+    'vale', 'valió', 'valió la pena', 'útil', 'práctico', 'fácil', 'rápido'
+))
+
+_NEGATIVE_WORDS = frozenset((
+    'malo', 'mala', 'mal', 'pésimo', 'pésima', 'terrible', 'horrible',
+    'no funciona', 'no sirve', 'defectuoso', 'defectuosa', 'roto', 'rota',
+    'lento', 'lenta', 'difícil', 'complicado', 'complicada', 'confuso',
+    'confusa', 'descontento', 'descontenta',
+    'insatisfecho', 'insatisfecha', 'decepcionado', 'decepcionada',
+    'no recomiendo', 'no lo recomiendo', 'no la recomiendo', 'basura',
+    'perdida', 'pérdida', 'tiempo perdido', 'dinero perdido'
+))
+
+
+def _keyword_automaton(words) -> ahocorasick.Automaton:
+    """Autómata Aho-Corasick: encuentra todas las palabras clave en una sola pasada sobre el texto."""
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word.lower(), word.lower())
+    automaton.make_automaton()
+    return automaton
+
+
+_POSITIVE_AUTOMATON = _keyword_automaton(_POSITIVE_WORDS)
+_NEGATIVE_AUTOMATON = _keyword_automaton(_NEGATIVE_WORDS)
+
+
+def _count_keywords(automaton: ahocorasick.Automaton, text: str) -> int:
+    # Palabras clave distintas presentes en el texto (como `word in text` por cada una)
+    return len({word for _, word in automaton.iter(text)})
+
+
 def analyze_sentiment(text: str) -> tuple[float, str]:
     """
-    Analiza el sentimiento de un texto usando TextBlob con mejoras para español
+    Analiza el sentimiento de un texto usando VADER con mejoras para español
     
     Args:
         text: Texto a analizar
@@ -30,35 +97,32 @@ def analyze_sentiment(text: str) -> tuple[float, str]:
     # Limpiar y normalizar el texto
     text = text.lower().strip()
     
-    # Palabras clave en español para ajustar el análisis
-    positive_words = [
-        'excelente', 'perfecto', 'genial', 'fantástico', 'increíble', 'maravilloso',
-        'recomendado', 'bueno', 'buena', 'buen', 'buenas', 'buenos', 'súper',
-        'genial', 'perfecta', 'excelente', 'increíble', 'maravillosa', 'fantástica',
-        'cumple', 'cumplió', 'superó', 'excede', 'excedió', 'mejor', 'mejora',
-        'feliz', 'contento', 'satisfecho', 'satisfecha', 'recomiendo', 'recomienda',
-        'vale', 'valió', 'valió la pena', 'útil', 'práctico', 'fácil', 'rápido'
-    ]
-    
-    negative_words = [
-        'malo', 'mala', 'mal', 'pésimo', 'pésima', 'terrible', 'horrible',
-        'no funciona', 'no sirve', 'defectuoso', 'defectuosa', 'roto', 'rota',
-        'lento', 'lenta', 'difícil', 'complicado', 'complicada', 'confuso',
-        'confusa', 'mal', 'malo', 'mala', 'descontento', 'descontenta',
-        'insatisfecho', 'insatisfecha', 'decepcionado', 'decepcionada',
-        'no recomiendo', 'no lo recomiendo', 'no la recomiendo', 'basura',
-        'perdida', 'pérdida', 'tiempo perdido', 'dinero perdido'
-    ]
+    # Atajo: señal fuerte en un solo sentido
+    strong_negative = _STRONG_NEGATIVE.search(text) is not None
+    strong_positive = _STRONG_POSITIVE.search(text) is not None
+    if strong_negative and not strong_positive and _NEGATED_NEGATIVE.search(text) is None:
+        return 0.05, "negative"
+    # La señal positiva no alcanza si está negada o si hay alguna palabra negativa
+    if (strong_positive and not strong_negative
+            and _NEGATED_POSITIVE.search(text) is None
+            and next(_NEGATIVE_AUTOMATON.iter(text), None) is None):
+        return 0.95, "positive"
     
     # Contar palabras positivas y negativas
-    positive_count = sum(1 for word in positive_words if word in text)
-    negative_count = sum(1 for word in negative_words if word in text)
+    positive_count = _count_keywords(_POSITIVE_AUTOMATON, text)
+    negative_count = _count_keywords(_NEGATIVE_AUTOMATON, text)
     
-    # Crear objeto TextBlob
-    blob = TextBlob(text)
+    # Atajo: varias palabras clave en un solo sentido ya saturan el ajuste (±0.3 c/u)
+    if positive_count >= 3 and negative_count == 0:
+        return 0.9, "positive"
+    if negative_count >= 3 and positive_count == 0:
+        return 0.1, "negative"
+    # Atajo: texto corto sin palabras clave ("ok", "llegó ayer"): no vale la pena VADER
+    if len(text) < 20 and positive_count == 0 and negative_count == 0:
+        return 0.5, "neutral"
     
-    # Obtener polaridad base (-1.0 a 1.0)
-    polarity = blob.sentiment.polarity
+    # Polaridad base (-1.0 a 1.0): el compound de VADER
+    polarity = _get_analyzer().polarity_scores(text)["compound"]
     
     # Ajustar polaridad basado en palabras clave en español
     if positive_count > 0:
@@ -83,35 +147,113 @@ def analyze_sentiment(text: str) -> tuple[float, str]:
     return sentiment_score, sentiment_label
 
 
-def get_reviews_to_process(from_date: Optional[date] = None) -> List[Review]:
+def analyze_sentiments(texts: List[str]) -> List[tuple[float, str]]:
+    """
+    Analiza el sentimiento de una lista de textos en una sola pasada
+    
+    Los textos se normalizan una sola vez y los que quedan iguales tras normalizar
+    (muy comunes en reviews cortas) se analizan una sola vez.
+    
+    Args:
+        texts: Textos a analizar
+        
+    Returns:
+        List[tuple]: (sentiment_score, sentiment_label) en el mismo orden que texts
+    """
+    # Normalizar igual que analyze_sentiment para agrupar textos equivalentes
+    normalized = [(text or "").lower().strip() for text in texts]
+    
+    results_by_text: dict = {}
+    for text in set(normalized):
+        results_by_text[text] = analyze_sentiment(text)
+    
+    return [results_by_text[text] for text in normalized]
+
+
+def _pending_reviews_query(from_date: Optional[date] = None, product_id: Optional[str] = None):
+    # Query base: reviews todavía no procesadas (índice parcial ix_reviews_pending_sentiment)
+    query = select(Review.id, Review.title, Review.content, Review.date_created).filter(
+        Review.sentiment_processed_at.is_(None)
+    )
+    
+    # Filtrar por fecha si se proporciona
+    if from_date:
+        query = query.filter(Review.date_created >= from_date)
+    
+    # Filtrar por producto si se proporciona
+    if product_id:
+        query = query.filter(Review.product_id == product_id)
+    
+    return query
+
+
+def get_reviews_to_process(from_date: Optional[date] = None, product_id: Optional[str] = None) -> List[Row]:
     """
     Obtiene las reviews que necesitan análisis de sentimiento
     
     Args:
         from_date: Fecha opcional para filtrar reviews desde esa fecha
+        product_id: ID de producto opcional para limitar las reviews
         
     Returns:
-        List[Review]: Lista de reviews que necesitan procesamiento
+        List[Row]: Filas livianas (id, title, content, date_created), sin objetos ORM
     """
     with get_session() as db:
-        # Query base: reviews que no tienen sentiment_score o sentiment_label
-        query = db.query(Review).filter(
-            or_(
-                Review.sentiment_score == 0.0,
-                Review.sentiment_label == "neutral",
-                Review.sentiment_score.is_(None),
-                Review.sentiment_label.is_(None)
-            )
-        )
-        
-        # Filtrar por fecha si se proporciona
-        if from_date:
-            query = query.filter(Review.date_created >= from_date)
-        
         # Ordenar por fecha de creación (más recientes primero)
-        query = query.order_by(Review.date_created.desc())
+        query = _pending_reviews_query(from_date, product_id).order_by(Review.date_created.desc())
+        return db.execute(query).all()
+
+
+def iter_reviews_to_process(
+    from_date: Optional[date] = None,
+    product_id: Optional[str] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Row]:
+    """
+    Recorre las reviews que necesitan análisis de a chunk_size, sin cargarlas todas en memoria
+    
+    Cada chunk es una consulta corta (keyset sobre date_created, id), así no queda un cursor
+    abierto mientras se escriben los resultados (en SQLite eso bloquearía los UPDATE).
+    
+    Args:
+        from_date: Fecha opcional para filtrar reviews desde esa fecha
+        product_id: ID de producto opcional para limitar las reviews
+        chunk_size: Filas leídas por consulta
         
-        return query.all()
+    Yields:
+        Row: Filas livianas (id, title, content, date_created), más recientes primero
+    """
+    query = _pending_reviews_query(from_date, product_id).order_by(
+        Review.date_created.desc(), Review.id.desc()
+    ).limit(chunk_size)
+    last = None
+    while True:
+        with get_session() as db:
+            page = query if last is None else query.filter(
+                tuple_(Review.date_created, Review.id) < tuple_(last.date_created, last.id)
+            )
+            rows = db.execute(page).all()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def count_reviews_to_process(from_date: Optional[date] = None, product_id: Optional[str] = None) -> int:
+    """Cantidad de reviews que necesitan análisis de sentimiento"""
+    with get_session() as db:
+        query = _pending_reviews_query(from_date, product_id).with_only_columns(func.count())
+        return db.scalar(query)
+
+
+def _review_text(review: Review) -> str:
+    """Combina título y contenido de una review para el análisis"""
+    full_text = ""
+    if review.title:
+        full_text += review.title + " "
+    if review.content:
+        full_text += review.content
+    return full_text
 
 
 def process_review_sentiment(review: Review) -> bool:
@@ -126,11 +268,7 @@ def process_review_sentiment(review: Review) -> bool:
     """
     try:
         # Combinar título y contenido para análisis
-        full_text = ""
-        if review.title:
-            full_text += review.title + " "
-        if review.content:
-            full_text += review.content
+        full_text = _review_text(review)
         
         if not full_text.strip():
             print(f"⚠️  Review {review.id} no tiene texto para analizar")
@@ -142,6 +280,7 @@ def process_review_sentiment(review: Review) -> bool:
         # Actualizar la review
         review.sentiment_score = sentiment_score
         review.sentiment_label = sentiment_label
+        review.sentiment_processed_at = datetime.utcnow()
         
         return True
         
@@ -150,53 +289,87 @@ def process_review_sentiment(review: Review) -> bool:
         return False
 
 
-def process_reviews_batch(reviews: List[Review], batch_size: int = 100) -> dict:
+def process_reviews_batch(reviews: Iterable[Row], batch_size: int = 100) -> dict:
     """
     Procesa un lote de reviews en batch
     
     Args:
-        reviews: Lista de reviews a procesar
+        reviews: Filas (lista o iterador, p. ej. iter_reviews_to_process) a procesar
         batch_size: Tamaño del batch para commits
         
     Returns:
         dict: Estadísticas del procesamiento
     """
     stats = {
-        "total": len(reviews),
+        "total": 0,
         "processed": 0,
         "errors": 0,
         "skipped": 0
     }
     
-    if not reviews:
-        print("📝 No hay reviews para procesar")
-        return stats
-    
-    print(f"🔄 Procesando {len(reviews)} reviews...")
+    print("🔄 Procesando reviews...")
     
+    reviews = iter(reviews)
     with get_session() as db:
-        for i, review in enumerate(reviews):
-            try:
-                # Procesar sentimiento
-                if process_review_sentiment(review):
-                    stats["processed"] += 1
-                    print(f"✅ Review {review.id}: {review.sentiment_label} ({review.sentiment_score:.3f})")
+        while True:
+            # Se consume de a un batch: en memoria quedan solo batch_size filas
+            batch = list(islice(reviews, batch_size))
+            if not batch:
+                break
+            stats["total"] += len(batch)
+            
+            # Separar reviews sin texto antes de analizar el batch completo
+            pending = []
+            empty_ids = []
+            for review in batch:
+                full_text = _review_text(review)
+                if full_text.strip():
+                    pending.append((review, full_text))
                 else:
-                    stats["skipped"] += 1
+                    print(f"⚠️  Review {review.id} no tiene texto para analizar")
+                    empty_ids.append(review.id)
+            
+            try:
+                results = analyze_sentiments([text for _, text in pending])
+                processed_at = datetime.utcnow()
+                updates = []
+                for (review, _), (sentiment_score, sentiment_label) in zip(pending, results):
+                    # Solo dicts para el UPDATE: las filas no pasan por el unit of work
+                    updates.append({
+                        "id": review.id,
+                        "sentiment_score": sentiment_score,
+                        "sentiment_label": sentiment_label,
+                        "sentiment_processed_at": processed_at
+                    })
+                    print(f"✅ Review {review.id}: {sentiment_label} ({sentiment_score:.3f})")
+                analyzed = len(updates)
+                # Sin texto: neutral 0.0 (lo mismo que analyze_sentiment("")) y marcadas como
+                # procesadas, para que no vuelvan a seleccionarse en cada corrida
+                updates.extend(
+                    {
+                        "id": review_id,
+                        "sentiment_score": 0.0,
+                        "sentiment_label": "neutral",
+                        "sentiment_processed_at": processed_at
+                    }
+                    for review_id in empty_ids
+                )
                 
-                # Commit cada batch_size reviews
-                if (i + 1) % batch_size == 0:
-                    db.commit()
-                    print(f"💾 Guardado batch de {batch_size} reviews")
+                # Un solo UPDATE (executemany) y un commit por batch
+                if updates:
+                    db.execute(update(Review), updates)
+                db.commit()
+                stats["processed"] += analyzed
+                stats["skipped"] += len(empty_ids)
+                print(f"💾 Guardado batch de {len(batch)} reviews")
                 
             except Exception as e:
-                stats["errors"] += 1
-                print(f"❌ Error en review {review.id}: {e}")
+                stats["errors"] += len(pending) + len(empty_ids)
+                print(f"❌ Error en batch desde review {batch[0].id}: {e}")
                 db.rollback()
-        
-        # Commit final
-        db.commit()
     
+    if not stats["total"]:
+        print("📝 No hay reviews para procesar")
     return stats
 
 
@@ -208,6 +381,11 @@ def main():
         type=str,
         help="Fecha de inicio (YYYY-MM-DD) para procesar reviews desde esa fecha"
     )
+    parser.add_argument(
+        "--product-id",
+        type=str,
+        help="Procesar solo las reviews de un producto específico"
+    )
     parser.add_argument(
         "--batch-size",
         type=int,
@@ -235,25 +413,28 @@ def main():
     print("🚀 Servicio de Análisis de Sentimiento")
     print("=" * 50)
     
-    # Obtener reviews a procesar
-    reviews = get_reviews_to_process(from_date)
+    # Contar reviews a procesar (las filas se leen después, de a chunks)
+    total = count_reviews_to_process(from_date, args.product_id)
     
-    print(f"📊 Reviews encontradas para procesar: {len(reviews)}")
+    print(f"📊 Reviews encontradas para procesar: {total}")
     
     if args.dry_run:
         print("\n🔍 MODO DRY-RUN - No se harán cambios")
-        for i, review in enumerate(reviews[:10], 1):  # Mostrar solo las primeras 10
+        first = islice(iter_reviews_to_process(from_date, args.product_id, chunk_size=10), 10)
+        for i, review in enumerate(first, 1):  # Mostrar solo las primeras 10
             print(f"  {i}. {review.id} - {review.date_created} - '{review.title[:50]}...'")
-        if len(reviews) > 10:
-            print(f"  ... y {len(reviews) - 10} más")
+        if total > 10:
+            print(f"  ... y {total - 10} más")
         return
     
-    if not reviews:
+    if not total:
         print("✅ No hay reviews que necesiten procesamiento")
         return
     
-    # Procesar reviews
-    stats = process_reviews_batch(reviews, args.batch_size)
+    # Procesar reviews a medida que se leen
+    stats = process_reviews_batch(iter_reviews_to_process(from_date, args.product_id), args.batch_size)
+    if stats['processed']:
+        refresh_review_stats()
     
     # Mostrar estadísticas finales
     print("\n" + "=" * 50)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -8,17 +10,28 @@ class Settings(BaseSettings):
     ML_WEB_BASE_URL: str = "https://www.mercadolibre.com.ar"
     RATE_LIMIT_PER_HOUR: int = 1000
     REQUEST_DELAY_SECONDS: float = 0.1
+    ML_CACHE_DIR: str = ""
 
     DATABASE_URL: str = "sqlite:///data/reviews.db"
+    SQL_ECHO: bool = False
 
     DEBUG: bool = True
     SECRET_KEY: str = "dev-secret-key"
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
-    SENTIMENT_MODEL: str = "textblob"
+    SENTIMENT_MODEL: str = "vader"
     CACHE_EXPIRY_HOURS: int = 24
+    # Productos scrapeados a la vez (API y DOM) por scrape_final
+    SCRAPE_CONCURRENCY: int = 4
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", case_sensitive=False)
 
-settings = Settings()
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings built once per process; .env is parsed on the first call only."""
+    return Settings()
+
+
+settings = get_settings()
@@ -1,18 +1,201 @@
-from fastapi import FastAPI, Query, HTTPException
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from datetime import datetime
+import asyncpg
+import httpx
+import orjson
 from src.utils.config import settings
 from src.api.ml_client import MercadoLibreClient
-from src.services.data_service import DataService
-from src.services.review_scraper import ReviewCacheService
-from src.models.database import get_session
+from src.services.data_service import DataService, ReviewCursor, pg_reviews_by_product, pg_reviews_timeline
+from src.services.review_scraper import ProductNotFoundError, ReviewCacheService
+from src.models.database import Base, create_async_db_engine, init_db, refresh_review_stats
+from src.web.schemas import ItemOut, ItemReviewsOut, ProductIdsIn, ReviewOrderBy, ReviewOut, Sentiment
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+# Hilos para el código que sigue siendo bloqueante (el DDL de /migrate)
+BLOCKING_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="blocking")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un solo engine async (y su pool) para toda la vida del proceso, nunca uno por request
+    app.state.engine = create_async_db_engine()
+    # Igual con el cliente de MercadoLibre: sus conexiones keep-alive se reutilizan entre requests
+    app.state.ml_client = MercadoLibreClient()
+    app.state.review_service = ReviewCacheService(app.state.ml_client)
+    try:
+        yield
+    finally:
+        await app.state.ml_client.aclose()
+        app.state.ml_client.close()
+        await app.state.engine.dispose()
+        BLOCKING_POOL.shutdown(wait=False)
+
 
 app = FastAPI(
     title="ML Reviews Analyzer", 
     version="0.1.0",
-    description="API para consultar productos y reviews de MercadoLibre"
+    description="API para consultar productos y reviews de MercadoLibre",
+    lifespan=lifespan,
+    # Respuestas serializadas con orjson en vez de json de la stdlib
+    default_response_class=ORJSONResponse
 )
 
+
+async def run_data_service(fn: Callable[[DataService], T]) -> T:
+    """
+    Ejecuta fn(DataService) sobre una sesión del pool async compartido.
+    
+    DataService sigue siendo síncrono (lo usan también los scripts), pero run_sync
+    lo corre sobre el driver async: mientras espera a la base, el event loop
+    atiende otros requests en vez de quedar bloqueado.
+    """
+    async with AsyncSession(app.state.engine) as session:
+        return await session.run_sync(lambda sync_session: fn(DataService(sync_session)))
+
+
+def etag_for(body: bytes) -> str:
+    """ETag débil a partir del contenido de la respuesta"""
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def json_response(request: Request, body: bytes, etag: Optional[str] = None,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Respuesta JSON con ETag; 304 sin cuerpo si el cliente ya tiene esa versión (If-None-Match).
+    """
+    etag = etag or etag_for(body)
+    headers = {**(headers or {}), "ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Respuestas de los endpoints agregados, ya serializadas: path+query -> (vence, body, etag)
+STATS_CACHE_TTL = 60
+TIMELINE_CACHE_TTL = 300
+RESPONSE_CACHE_MAX = 512
+_response_cache: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+# Cálculos en curso por clave: los requests simultáneos esperan el mismo resultado
+_response_inflight: Dict[str, "asyncio.Future[Tuple[float, bytes, str]]"] = {}
+
+
+async def cached_json(request: Request, ttl: int, compute: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    Respuesta JSON de compute(), cacheada en memoria por path y query params durante ttl segundos.
+    
+    Las estadísticas cambian despacio: dentro del TTL se devuelven los bytes ya
+    serializados sin tocar la base. Cache-Control deja que el navegador o un CDN
+    también las guarden, y el ETag (calculado una vez por entrada) permite
+    contestar 304 a los clientes que sondean.
+    """
+    key = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+    cached = _response_cache.get(key)
+    if not cached or cached[0] <= time.monotonic():
+        future = _response_inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(_compute_and_cache(key, ttl, compute))
+            _response_inflight[key] = future
+            future.add_done_callback(lambda _: _response_inflight.pop(key, None))
+        cached = await asyncio.shield(future)
+    _, body, etag = cached
+    return json_response(request, body, etag, {"Cache-Control": f"public, max-age={ttl}"})
+
+
+async def _compute_and_cache(key: str, ttl: int, compute: Callable[[], Awaitable[Any]]) -> Tuple[float, bytes, str]:
+    body = orjson.dumps(await compute())
+    entry = (time.monotonic() + ttl, body, etag_for(body))
+    _response_cache[key] = entry
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > RESPONSE_CACHE_MAX:
+        _response_cache.popitem(last=False)
+    return entry
+
+
+def invalidate_response_cache() -> None:
+    """Descarta las estadísticas cacheadas (tras ingestar reviews en este proceso)"""
+    _response_cache.clear()
+
+
+# Refresco de product_review_stats desde requests: como mucho uno por intervalo y por worker
+STATS_REFRESH_MIN_INTERVAL = 60
+_stats_refreshed_at = float("-inf")
+
+
+async def refresh_review_stats_debounced() -> None:
+    """
+    Refresca la vista de estadísticas si pasó STATS_REFRESH_MIN_INTERVAL desde el último intento
+    
+    Si otro worker o un batch ya la está refrescando no espera: los productos que aún
+    no están en la vista se calculan en vivo (ver DataService.get_reviews_stats).
+    """
+    global _stats_refreshed_at
+    now = time.monotonic()
+    if now - _stats_refreshed_at < STATS_REFRESH_MIN_INTERVAL:
+        return
+    _stats_refreshed_at = now
+    await run_blocking(lambda: refresh_review_stats(skip_if_busy=True))
+
+
+def encode_cursor(review: dict) -> str:
+    """Cursor opaco (base64 url-safe) con la fecha ISO y el id de una review"""
+    return base64.urlsafe_b64encode(orjson.dumps([review["date_created"], review["id"]])).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[ReviewCursor]:
+    """Inversa de encode_cursor; 400 si el token no es válido"""
+    if not cursor:
+        return None
+    try:
+        date_created, review_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(date_created), str(review_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def next_cursor(reviews: list, limit: Optional[int]) -> Optional[str]:
+    """Cursor de la página siguiente, o None si esta no vino llena"""
+    if limit and len(reviews) == limit and reviews[-1]["date_created"]:
+        return encode_cursor(reviews[-1])
+    return None
+
+
+def is_postgres() -> bool:
+    return app.state.engine.dialect.name == "postgresql"
+
+
+@asynccontextmanager
+async def pg_connection():
+    """Conexión asyncpg nativa, prestada por el mismo pool del engine (sin un segundo pool)"""
+    async with app.state.engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        yield raw.driver_connection
+
+
+async def run_blocking(fn: Callable[..., T], *args) -> T:
+    """Corre fn(*args) en BLOCKING_POOL para no frenar el event loop mientras espera"""
+    return await asyncio.get_running_loop().run_in_executor(BLOCKING_POOL, fn, *args)
+
+
 # Configurar CORS para permitir el frontend
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +205,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprimir respuestas de más de 1 KB (el texto de las reviews se comprime muy bien); agrega
+# Vary: Accept-Encoding. Nivel 5: casi el mismo tamaño que 9 con bastante menos CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+# ===== MANEJO DE ERRORES =====
+# Un handler por tipo en vez de try/except en cada endpoint; el detalle interno va al log,
+# no a la respuesta
+
+@app.exception_handler(ProductNotFoundError)
+async def product_not_found_handler(request: Request, exc: ProductNotFoundError):
+    return ORJSONResponse(status_code=404, content={"detail": "Producto no encontrado"})
+
+
+@app.exception_handler(httpx.HTTPError)
+async def upstream_error_handler(request: Request, exc: httpx.HTTPError):
+    log.warning("Error consultando MercadoLibre en %s: %s", request.url.path, exc)
+    return ORJSONResponse(status_code=502, content={"detail": "Error consultando MercadoLibre"})
+
+
+@app.exception_handler(SQLAlchemyError)
+@app.exception_handler(asyncpg.PostgresError)
+async def database_error_handler(request: Request, exc: Exception):
+    log.exception("Error de base de datos en %s", request.url.path)
+    return ORJSONResponse(status_code=500, content={"detail": "Error de base de datos"})
+
 # ===== ENDPOINTS DE SALUD =====
 
 @app.get("/health")
@@ -32,16 +241,11 @@ async def health():
 async def migrate_database():
     """Ejecutar migraciones de base de datos"""
     try:
-        from src.models.database import Base
-        from sqlalchemy import create_engine
-        import os
-        
         database_url = os.getenv('DATABASE_URL')
         if not database_url:
             raise Exception("DATABASE_URL no configurada")
         
-        engine = create_engine(database_url)
-        Base.metadata.create_all(bind=engine)
+        await run_blocking(init_db)
         
         return {
             "status": "success", 
@@ -55,71 +259,76 @@ async def migrate_database():
 # ===== ENDPOINTS DE BÚSQUEDA EXTERNA =====
 
 @app.get("/api/search")
-async def search(q: str = Query(..., min_length=1), site_id: str = Query("MLA"), limit: int = Query(5, ge=1, le=50), offset: int = Query(0, ge=0)):
+async def search(request: Request, q: str = Query(..., min_length=1), site_id: str = Query("MLA"), limit: int = Query(5, ge=1, le=50), offset: int = Query(0, ge=0)):
     """Busca productos en MercadoLibre (API externa)"""
-    try:
-        client = MercadoLibreClient()
-        data = client.search_products(q, site_id=site_id, limit=limit, offset=offset)
-        return data
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail=str(exc))
+    client: MercadoLibreClient = request.app.state.ml_client
+    return await client.asearch_products(q, site_id=site_id, limit=limit, offset=offset)
 
 
 # ===== ENDPOINTS DE PRODUCTOS (BASE DE DATOS) =====
 
 @app.get("/api/products")
 async def get_products(
-    limit: Optional[int] = Query(None, ge=1), 
-    offset: int = Query(0, ge=0),
-    marca: Optional[str] = Query(None)
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0, deprecated=True, description="Obsoleto: usar after_id"),
+    marca: Optional[str] = Query(None),
+    after_id: Optional[str] = Query(None, description="Último id recibido; pagina por cursor en vez de offset")
 ):
-    """Obtiene productos desde la base de datos"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            if marca:
-                products = service.get_products_by_brand(marca, limit)
-            else:
-                products = service.get_all_products(limit, offset)
-            
-            return {
-                "products": products,
-                "count": len(products),
-                "limit": limit,
-                "offset": offset
-            }
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    """Obtiene productos desde la base de datos (de a limit; para recorrerlos todos, seguir next_after_id)"""
+    if not marca:
+        # Productos ya serializados por la base: se arma el JSON sin pasar por dicts
+        products_json = await run_data_service(
+            lambda service: service.get_all_products_json(limit, offset, after_id)
+        )
+        # Página llena: el id del último producto es el cursor de la siguiente
+        next_after_id = orjson.loads(products_json[-1])["id"] if len(products_json) == limit else None
+        body = (
+            '{"products":[' + ",".join(products_json) + "]"
+            + ',"count":' + str(len(products_json))
+            + ',"limit":' + str(limit)
+            + ',"offset":' + str(offset)
+            + ',"after_id":' + orjson.dumps(after_id).decode()
+            + ',"next_after_id":' + orjson.dumps(next_after_id).decode() + "}"
+        )
+        return json_response(request, body.encode())
+    
+    products = await run_data_service(lambda service: service.get_products_by_brand(marca, limit, after_id))
+    
+    return json_response(request, orjson.dumps({
+        "products": products,
+        "count": len(products),
+        "limit": limit,
+        "offset": offset,
+        "next_after_id": products[-1]["id"] if len(products) == limit else None
+    }))
 
 
 @app.get("/api/products/stats")
-async def get_products_stats():
+async def get_products_stats(request: Request):
     """Obtiene estadísticas generales de productos"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            stats = service.get_products_stats()
-            return stats
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    return await cached_json(
+        request, STATS_CACHE_TTL,
+        lambda: run_data_service(lambda service: service.get_products_stats())
+    )
+
+
+@app.post("/api/products/stats:batch")
+async def get_products_reviews_stats_batch(body: ProductIdsIn):
+    """Estadísticas de reviews de hasta 500 productos en una sola consulta"""
+    ids = list(dict.fromkeys(body.ids))
+    return {"stats": await run_data_service(lambda service: service.get_reviews_stats_bulk(ids))}
 
 
 @app.get("/api/products/{product_id}")
 async def get_product(product_id: str):
     """Obtiene un producto específico por ID"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            product = service.get_product_by_id(product_id)
-            
-            if not product:
-                raise HTTPException(status_code=404, detail="Producto no encontrado")
-            
-            return product
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    product = await run_data_service(lambda service: service.get_product_by_id(product_id))
+    
+    if not product:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    
+    return product
 
 
 # ===== ENDPOINTS DE REVIEWS (BASE DE DATOS) =====
@@ -127,189 +336,172 @@ async def get_product(product_id: str):
 @app.get("/api/reviews")
 async def get_reviews(
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, deprecated=True, description="Obsoleto e ignorado: usar cursor"),
     rating: Optional[int] = Query(None, ge=1, le=5),
-    sentiment: Optional[str] = Query(None, regex="^(positive|negative|neutral)$"),
-    recent: bool = Query(False)
+    sentiment: Optional[Sentiment] = Query(None),
+    recent: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior")
 ):
     """Obtiene reviews desde la base de datos con filtros opcionales"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            if recent:
-                reviews = service.get_recent_reviews(limit)
-            elif rating:
-                reviews = service.get_reviews_by_rating(rating, limit)
-            elif sentiment:
-                reviews = service.get_reviews_by_sentiment(sentiment, limit)
-            else:
-                # Para obtener todas las reviews, usamos un producto específico
-                # En una implementación más avanzada, podríamos tener un endpoint global
-                reviews = service.get_recent_reviews(limit)
-            
-            return {
-                "reviews": reviews,
-                "count": len(reviews),
-                "limit": limit,
-                "offset": offset,
-                "filters": {
-                    "rating": rating,
-                    "sentiment": sentiment,
-                    "recent": recent
-                }
-            }
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    review_cursor = decode_cursor(cursor)
+    
+    def load(service: DataService):
+        if recent:
+            return service.get_recent_reviews(limit, review_cursor)
+        elif rating:
+            return service.get_reviews_by_rating(rating, limit, review_cursor)
+        elif sentiment:
+            return service.get_reviews_by_sentiment(sentiment, limit, review_cursor)
+        # Para obtener todas las reviews, usamos un producto específico
+        # En una implementación más avanzada, podríamos tener un endpoint global
+        return service.get_recent_reviews(limit, review_cursor)
+    
+    reviews = await run_data_service(load)
+    
+    return {
+        "reviews": reviews,
+        "count": len(reviews),
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor(reviews, limit),
+        "filters": {
+            "rating": rating,
+            "sentiment": sentiment,
+            "recent": recent
+        }
+    }
 
 
 @app.get("/api/products/{product_id}/reviews")
 async def get_product_reviews(
     product_id: str,
-    limit: Optional[int] = Query(None, ge=1),
-    offset: int = Query(0, ge=0),
-    order_by: str = Query("date_created", regex="^(date_created|rate|sentiment_score)$")
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0, deprecated=True, description="Obsoleto: usar cursor"),
+    order_by: ReviewOrderBy = Query("date_created"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior (solo order_by=date_created)")
 ):
     """Obtiene reviews de un producto específico"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            # Verificar que el producto existe
-            product = service.get_product_by_id(product_id)
-            if not product:
-                raise HTTPException(status_code=404, detail="Producto no encontrado")
-            
-            reviews = service.get_reviews_by_product(product_id, limit, offset, order_by)
-            
-            return {
-                "product_id": product_id,
-                "reviews": reviews,
-                "count": len(reviews),
-                "limit": limit,
-                "offset": offset,
-                "order_by": order_by
-            }
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    review_cursor = decode_cursor(cursor)
+    
+    if is_postgres():
+        # Camino caliente: asyncpg directo, sin hidratar objetos ORM
+        async with pg_connection() as conn:
+            reviews = await pg_reviews_by_product(conn, product_id, limit, offset, order_by, review_cursor)
+    else:
+        reviews = await run_data_service(
+            lambda service: service.get_reviews_by_product(
+                product_id, limit, offset, order_by, review_cursor, require_product=True
+            )
+        )
+    if reviews is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    
+    return {
+        "product_id": product_id,
+        "reviews": reviews,
+        "count": len(reviews),
+        "limit": limit,
+        "offset": offset,
+        "order_by": order_by,
+        # Cursor para pedir la página siguiente sin OFFSET
+        "next_cursor": next_cursor(reviews, limit) if order_by == "date_created" else None
+    }
 
 
 @app.get("/api/products/{product_id}/reviews/stats")
-async def get_product_reviews_stats(product_id: str):
+async def get_product_reviews_stats(product_id: str, request: Request):
     """Obtiene estadísticas de reviews de un producto específico"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            # Verificar que el producto existe
-            product = service.get_product_by_id(product_id)
-            if not product:
-                raise HTTPException(status_code=404, detail="Producto no encontrado")
-            
-            stats = service.get_reviews_stats(product_id)
-            return stats
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    async def compute():
+        stats = await run_data_service(
+            lambda service: service.get_reviews_stats(product_id, require_product=True)
+        )
+        if stats is None:
+            # Se propaga sin cachear
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+        return stats
+    
+    return await cached_json(request, STATS_CACHE_TTL, compute)
+
+
+@app.get("/api/reviews/stream")
+async def stream_reviews(
+    product_id: Optional[str] = Query(None),
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    sentiment: Optional[Sentiment] = Query(None),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """Reviews como NDJSON (una por línea): se envían a medida que llegan de la base, sin armar la lista"""
+    stmt = DataService.stream_reviews_stmt(product_id, rating, sentiment, limit)
+    
+    async def rows():
+        async with AsyncSession(app.state.engine) as session:
+            result = await session.stream(stmt)
+            async for row in result:
+                yield orjson.dumps(DataService.review_to_dict(row)) + b"\n"
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
 
 
 @app.get("/api/reviews/stats")
-async def get_reviews_stats():
+async def get_reviews_stats(request: Request):
     """Obtiene estadísticas generales de reviews"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            stats = service.get_reviews_stats()
-            return stats
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    return await cached_json(
+        request, STATS_CACHE_TTL,
+        lambda: run_data_service(lambda service: service.get_reviews_stats())
+    )
 
 
 @app.get("/api/reviews/timeline")
 async def get_reviews_timeline(
+    request: Request,
     product_id: Optional[str] = Query(None),
     marca: Optional[str] = Query(None),
     days: int = Query(30, ge=1, le=365)
 ):
     """Obtiene datos temporales de reviews para gráficos de evolución"""
-    try:
-        with get_session() as session:
-            service = DataService(session)
-            timeline = service.get_reviews_timeline(product_id, days, marca)
-            return {
-                "timeline": timeline,
-                "days": days,
-                "product_id": product_id,
-                "marca": marca
-            }
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc))
+    async def compute():
+        if is_postgres():
+            async with pg_connection() as conn:
+                timeline = await pg_reviews_timeline(conn, product_id, days, marca)
+        else:
+            timeline = await run_data_service(lambda service: service.get_reviews_timeline(product_id, days, marca))
+        return {
+            "timeline": timeline,
+            "days": days,
+            "product_id": product_id,
+            "marca": marca
+        }
+    
+    return await cached_json(request, TIMELINE_CACHE_TTL, compute)
 
 
 # ===== ENDPOINTS DE INGESTA (MANTENER COMPATIBILIDAD) =====
 
-@app.get("/api/items/{item_id}")
-async def get_item(item_id: str):
+@app.get("/api/items/{item_id}", response_model=ItemOut)
+async def get_item(request: Request, item_id: str):
     """Endpoint de compatibilidad - obtiene producto desde API externa o cache"""
-    try:
-        client = MercadoLibreClient()
-        svc = ReviewCacheService(client)
-        from src.models.database import get_session
-        
-        with get_session() as db:
-            product = svc.get_or_fetch_product(db, item_id)
-            return {
-                "id": product.id,
-                "title": product.title,
-                "price": product.price,
-                "site_id": product.site_id,
-                "currency_id": product.currency_id,
-                "sold_quantity": product.sold_quantity,
-                "available_quantity": product.available_quantity,
-                "marca": product.marca,
-                "modelo": product.modelo,
-                "caracteristicas": product.caracteristicas,
-            }
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail=str(exc))
-
-
-@app.get("/api/items/{item_id}/reviews")
-async def get_item_reviews(item_id: str, limit: int = Query(20, ge=1, le=50), offset: int = Query(0, ge=0), refresh: bool = Query(False)):
+    svc: ReviewCacheService = request.app.state.review_service
+    async with AsyncSession(request.app.state.engine, expire_on_commit=False) as session:
+        product = await svc.aget_or_fetch_product(session, item_id)
+        await session.commit()
+    return ItemOut.model_validate(product)
+
+
+@app.get("/api/items/{item_id}/reviews", response_model=ItemReviewsOut)
+async def get_item_reviews(request: Request, item_id: str, limit: int = Query(20, ge=1, le=50), offset: int = Query(0, ge=0), refresh: bool = Query(False)):
     """Endpoint de compatibilidad - obtiene reviews desde API externa o cache"""
-    try:
-        client = MercadoLibreClient()
-        svc = ReviewCacheService(client)
-        from src.models.database import get_session
-        
-        with get_session() as db:
-            if refresh:
-                svc.get_or_fetch_product(db, item_id)
-                svc.fetch_and_store_reviews(db, item_id, limit=limit, offset=offset)
-            reviews = svc.get_reviews_cached(db, item_id, limit=limit, offset=offset)
-            return {
-                "item_id": item_id,
-                "count": len(reviews),
-                "reviews": [
-                    {
-                        "id": r.id,
-                        "product_id": r.product_id,
-                        "rate": r.rate,
-                        "title": r.title,
-                        "content": r.content,
-                        "date_created": r.date_created.isoformat(),
-                        "date_text": r.date_text,
-                        "reviewer_id": r.reviewer_id,
-                        "likes": r.likes,
-                        "dislikes": r.dislikes,
-                        "sentiment_score": r.sentiment_score,
-                        "sentiment_label": r.sentiment_label,
-                        "api_review_id": r.api_review_id,
-                        "source": r.source,
-                        "media": r.media,
-                    }
-                    for r in reviews
-                ],
-            }
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail=str(exc))
+    svc: ReviewCacheService = request.app.state.review_service
+    async with AsyncSession(request.app.state.engine, expire_on_commit=False) as session:
+        if refresh:
+            await svc.aensure_product(session, item_id)
+            await svc.afetch_and_store_reviews(session, item_id, limit=limit, offset=offset)
+            await session.commit()
+            # Las estadísticas salen de la vista materializada: refrescarla (con debounce) antes de vaciar la caché
+            await refresh_review_stats_debounced()
+            invalidate_response_cache()
+        reviews = await session.run_sync(svc.get_reviews_cached, item_id, limit, offset)
+    return ItemReviewsOut(
+        item_id=item_id,
+        count=len(reviews),
+        reviews=[ReviewOut.model_validate(r) for r in reviews],
+    )
@@ -0,0 +1,61 @@
+"""
+Modelos de respuesta de la API (Pydantic v2)
+
+Se validan directo desde los objetos ORM (from_attributes), así la serialización
+la hace pydantic-core en vez de armar un dict por fila en Python.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Valores aceptados en query params: validación por igualdad y enum en el OpenAPI
+Sentiment = Literal["positive", "negative", "neutral"]
+ReviewOrderBy = Literal["date_created", "rate", "sentiment_score"]
+
+
+class ItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    title: str
+    price: float
+    site_id: str
+    currency_id: str
+    sold_quantity: int
+    available_quantity: int
+    marca: str
+    modelo: str
+    caracteristicas: Optional[Dict[str, Any]] = None
+
+
+class ReviewOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    product_id: str
+    rate: int
+    title: str
+    content: str
+    date_created: datetime
+    date_text: str
+    reviewer_id: str
+    likes: int
+    dislikes: int
+    sentiment_score: float
+    sentiment_label: str
+    api_review_id: str
+    source: str
+    media: Optional[Dict[str, Any]] = None
+
+
+class ItemReviewsOut(BaseModel):
+    item_id: str
+    count: int
+    reviews: List[ReviewOut]
+
+
+class ProductIdsIn(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=500)
@@ -0,0 +1,32 @@
+import pytest
+
+from src.services.sentiment_analyzer import analyze_sentiment
+
+
+# El atajo positivo devuelve exactamente (0.95, "positive"); con la señal negada no debe aplicarse
+@pytest.mark.parametrize("text", [
+    "no es recomendable, se rompió a la semana",
+    "producto no recomendado",
+    "nada excelente, llegó roto",
+    "nunca fue buenísimo",
+])
+def test_negated_strong_positive_skips_fast_path(text):
+    assert analyze_sentiment(text) != (0.95, "positive")
+
+
+# Lo mismo para el atajo negativo (0.05, "negative")
+@pytest.mark.parametrize("text", [
+    "no es horrible",
+    "nada pésimo para el precio",
+    "nunca fue malísimo",
+])
+def test_negated_strong_negative_skips_fast_path(text):
+    assert analyze_sentiment(text) != (0.05, "negative")
+
+
+def test_strong_positive_fast_path():
+    assert analyze_sentiment("Excelente producto, muy recomendable") == (0.95, "positive")
+
+
+def test_strong_negative_fast_path():
+    assert analyze_sentiment("Pésimo, no funciona") == (0.05, "negative")